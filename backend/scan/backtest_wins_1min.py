@@ -2,8 +2,11 @@
 Backtest 1m trades for win/loss based on future candles after scan.
 """
 
-from pymongo import MongoClient
-import yfinance as yf
+from pymongo import MongoClient, UpdateOne
+from bar_store import default_store
+from mongo import ensure_indexes, flush_bulk, refresh_daily_stats
+from trade_resolver import resolve_frame, group_by_symbol, due_filter, backtest_update
+from run_report import RunReport
 from datetime import datetime, timedelta, timezone,time
 import pandas as pd
 
@@ -11,81 +14,80 @@ import pandas as pd
 client = MongoClient("mongodb://localhost:27017")
 db = client["tradesmart"]
 collection = db["scan_1m"]
+store = default_store()
+HORIZON = timedelta(hours=3)
+report = RunReport("backtest_1m").start()  # timings → store/reports/
+ensure_indexes(collection)
+updates = []  # flushed with one bulk_write after the loop
+touched = set()  # (strategy, scan_date) of updated trades → daily_stats refresh
 
 # --- Fetch trades to backtest ---
-pending_trades = list(collection.find({ "strategy": "1m_momentum", "status": "pending" }))
-no_hit_trades = list(collection.find({ "strategy": "1m_momentum", "status": "no_hit" }))
-no_data_trades=list(collection.find({"strategy":"1m_momentum","status":"no_data"}))
-all_trades = pending_trades + no_hit_trades+no_data_trades
-print(f"🟡 Found {len(all_trades),len(pending_trades),len(no_data_trades)} total 1m trades to backtest...")
-
-for trade in all_trades:
-    symbol = trade["symbol"] + ".NS"
-    entry_time = pd.to_datetime(trade["timestamp"])
-    target =float(trade["target"])
-    stop_loss =float(trade["stop_loss"])
-
-    now_utc = datetime.now(timezone.utc)
-    if (now_utc - entry_time).total_seconds() < 1800:  # less than 30 minutes
-        print(f"⏳ {trade['symbol']}: Entry too recent (<30m), skipping")
+# Only open trades that are due: not finished, and past their no_data backoff.
+# Each one resumes from its stored cursor instead of re-scanning from entry.
+now_utc = datetime.now(timezone.utc)
+with report.stage("find"):
+    open_trades = list(collection.find(due_filter("1m_momentum", now_utc)))
+print(f"🟡 Found {len(open_trades)} open 1m trade(s) due for backtest...")
+
+# Trades of the same symbol share one bar load and are resolved in one vectorized pass
+for sym, trades in group_by_symbol(open_trades).items():
+    ready = []
+    for trade in trades:
+        if (now_utc - pd.to_datetime(trade["timestamp"])).total_seconds() < 1800:  # less than 30 minutes
+            print(f"⏳ {sym}: Entry too recent (<30m), skipping")
+            report.count("skipped_too_recent")
+            continue
+        ready.append(trade)
+    if not ready:
         continue
 
     try:
-        data = yf.download(
-            symbol,
-            interval="1m",
-            start=entry_time,
-            end=entry_time + timedelta(hours=3),
-            progress=False,
-            auto_adjust=False
-        )
+        with report.symbol(sym):
+            # Bars come from the local store, which only tops up what is missing
+            with report.stage("load_bars"):
+                bars = store.load(sym, "1m", period="8d")
+            with report.stage("resolve"):
+                results = resolve_frame(ready, bars, HORIZON)
+    except Exception as e:
+        report.count("errors")
+        print(f"❌ Error processing {sym}: {e}")
+        continue
 
-        if data.empty:
-            print(f"⛔ {trade['symbol']}: No future data found.")
-            collection.update_one(
-                {"_id": trade["_id"]},
-                {"$set": { "status": "no_data" }}
-            )
+    for trade, res in zip(ready, results):
+        update = backtest_update(trade, res, now_utc, HORIZON)
+        if update is None:
+            print(f"⚠️ {sym}: No new candles since last run")
             continue
-
-        data = data.sort_index()
-
-        # Find nearest time index to entry_time
-        nearest_idx = data.index.get_indexer([entry_time], method='nearest')[0]
-        future = data.iloc[nearest_idx + 1:]  # future candles only
-
-        result = "no_hit"
-        for _, row in future.iterrows():
-            high = float(row["High"])
-            low = float(row["Low"])
-
-            if high >= target:
-                result = "win"
-                break
-            elif low <= stop_loss:
-                result = "loss"
-                break
-
-        collection.update_one(
-            {"_id": trade["_id"]},
-            {"$set": { "status": result }}
-        )
-        print(f"✅ {trade['symbol']} → {result}")
-        
-
-
-    except Exception as e:
-        print(f"❌ Error processing {trade['symbol']}: {e}")
+        touched.add((trade["strategy"], trade["scan_date"]))
+        report.count(f"outcome.{res['outcome']}")
+        updates.append(UpdateOne({"_id": trade["_id"]}, {"$set": update}))
+        if update["status"] == "no_data":
+            print(f"⛔ {sym}: No data (retry {update['backtest_retries']}"
+                  f"{', giving up' if update['backtest_done'] else ''})")
+        else:
+            print(f"✅ {trade['symbol']} → {update['status']}{'' if update['backtest_done'] else ' (open)'}")
+
+if updates:
+    with report.stage("mongo_write"):
+        round_trips = flush_bulk(collection, updates)
+    report.count("mongo_round_trips", round_trips)
+    with report.stage("daily_stats"):
+        refresh_daily_stats(collection, touched)
+    print(f"💾 {len(updates)} trade update(s) written in {round_trips} round-trip(s)")
 
 now_ist = datetime.now().astimezone().time()
 market_close = time(15, 30)
 
 if now_ist >= market_close:
-    delete_result = collection.delete_many({
-        "strategy": "1m_momentum",
-        "status": { "$in": ["pending", "no_hit","no_data"] },
-        "scan_date": datetime.now().strftime("%Y-%m-%d")
-    })
+    with report.stage("cleanup"):
+        delete_result = collection.delete_many({
+            "strategy": "1m_momentum",
+            "status": { "$in": ["pending", "no_hit","no_data"] },
+            "scan_date": datetime.now().strftime("%Y-%m-%d")
+        })
     print(f"🗑️ Deleted {delete_result.deleted_count} stale trades after 3:30 PM")
+    refresh_daily_stats(collection, {("1m_momentum", datetime.now().strftime("%Y-%m-%d"))})
 else:
-    print("⏳ Market still open — skipping cleanup")
\ No newline at end of file
+    print("⏳ Market still open — skipping cleanup")
+
+report.finish()
@@ -1,87 +1,88 @@
-from pymongo import MongoClient
-import yfinance as yf
+from pymongo import MongoClient, UpdateOne
+from bar_store import default_store
+from mongo import ensure_indexes, flush_bulk, refresh_daily_stats
+from trade_resolver import resolve_frame, group_by_symbol, due_filter, backtest_update
+from run_report import RunReport
 from datetime import datetime, timedelta, timezone,time
 import pandas as pd
 
 client = MongoClient("mongodb://localhost:27017")
 db = client["tradesmart"]
 collection = db["scan_5m"]
+store = default_store()
+HORIZON = timedelta(days=2)
+report = RunReport("backtest_5m").start()  # timings → store/reports/
+ensure_indexes(collection)
+updates = []  # flushed with one bulk_write after the loop
+touched = set()  # (strategy, scan_date) of updated trades → daily_stats refresh
 
-pending_trades = list(collection.find({ "strategy": "5m_momentum", "status": "pending" }))
-no_hit_trades=list(collection.find({"strategy": "5m_momentum", "status": "no_hit"}))
-no_data_trades=list(collection.find({"strategy": "5m_momentum", "status": "no_data"}))
-print(f"🟡 Found {len(pending_trades) ,len(no_hit_trades),len(no_data_trades)} pending trades to backtest...")
+# Only open trades that are due: not finished, and past their no_data backoff.
+# Each one resumes from its stored cursor instead of re-scanning from entry.
+now_utc = datetime.now(timezone.utc)
+with report.stage("find"):
+    open_trades = list(collection.find(due_filter("5m_momentum", now_utc)))
+print(f"🟡 Found {len(open_trades)} open 5m trade(s) due for backtest...")
 
-for trade in (pending_trades + no_hit_trades+no_data_trades):
-    symbol = trade["symbol"] + ".NS"
-    entry_time = pd.to_datetime(trade["timestamp"])
-    target =float (trade["target"])
-    stop_loss =float(trade["stop_loss"])
-
-    now_utc = datetime.now(timezone.utc)
-    if (now_utc - entry_time).total_seconds() < 3600:
-        print(f"⏳ {symbol}: Entry too recent (less than 1hr), skipping")
+# Trades of the same symbol share one bar load and are resolved in one vectorized pass
+for sym, trades in group_by_symbol(open_trades).items():
+    symbol = sym + ".NS"
+    ready = []
+    for trade in trades:
+        if (now_utc - pd.to_datetime(trade["timestamp"])).total_seconds() < 3600:
+            print(f"⏳ {symbol}: Entry too recent (less than 1hr), skipping")
+            report.count("skipped_too_recent")
+            continue
+        ready.append(trade)
+    if not ready:
         continue
 
     try:
-        data = yf.download(
-            symbol,
-            interval="5m",
-            start=entry_time,
-            end=entry_time + timedelta(days=2),
-            progress=False,
-            auto_adjust=False
-        )
-
-        if data.empty:
-            print(f"⛔ {symbol}: No data")
-            collection.update_one({"_id": trade["_id"]}, {"$set": {"status": "no_data"}})
-            continue
-
-        # Find nearest candle
-        data = data.sort_index()
-        nearest_time = data.index[data.index.get_indexer([entry_time], method='nearest')[0]]
-        start_idx = data.index.get_loc(nearest_time)
+        with report.symbol(sym):
+            # Bars come from the local store, which only tops up what is missing
+            with report.stage("load_bars"):
+                bars = store.load(sym, "5m", period="60d")
+            with report.stage("resolve"):
+                results = resolve_frame(ready, bars, HORIZON)
+    except Exception as e:
+        report.count("errors")
+        print(f"❌ Error processing {sym}: {e}")
+        continue
 
-        if start_idx + 1 >= len(data):
-            print(f"⚠️ {symbol}: No future candles after entry")
+    for trade, res in zip(ready, results):
+        update = backtest_update(trade, res, now_utc, HORIZON)
+        if update is None:
+            print(f"⚠️ {symbol}: No new candles since last run")
             continue
+        touched.add((trade["strategy"], trade["scan_date"]))
+        report.count(f"outcome.{res['outcome']}")
+        updates.append(UpdateOne({"_id": trade["_id"]}, {"$set": update}))
+        if update["status"] == "no_data":
+            print(f"⛔ {symbol}: No data (retry {update['backtest_retries']}"
+                  f"{', giving up' if update['backtest_done'] else ''})")
+        else:
+            print(f"✅ {trade['symbol']} → {update['status']}{'' if update['backtest_done'] else ' (open)'}")
 
-        future = data.iloc[start_idx + 1 :]  # All candles after entry
-
-        result = "no_hit"
-        for _, row in future.iterrows():
-            high = float(row["High"])
-            low = float(row["Low"])
-
-            if high >= target:
-                result = "win"
-                break
-            elif low <= stop_loss:
-                result = "loss"
-                break
-
-        collection.update_one(
-            {"_id": trade["_id"]},
-            {"$set": { "status": result, "backtest_time": datetime.utcnow().isoformat() }}
-        )
-        print(f"✅ {trade['symbol']} → {result}")
-              
-       
-       
-
-    except Exception as e:
-        print(f"❌ Error processing {trade['symbol']}: {e}")
+if updates:
+    with report.stage("mongo_write"):
+        round_trips = flush_bulk(collection, updates)
+    report.count("mongo_round_trips", round_trips)
+    with report.stage("daily_stats"):
+        refresh_daily_stats(collection, touched)
+    print(f"💾 {len(updates)} trade update(s) written in {round_trips} round-trip(s)")
 
 now_ist = datetime.now().astimezone().time()
 market_close = time(15, 30)
 
 if now_ist >= market_close:
-    delete_result = collection.delete_many({
-        "strategy": "5m_momentum",
-        "status": { "$in": ["pending", "no_hit","no_data"] },
-        "scan_date": datetime.now().strftime("%Y-%m-%d")
-    })
+    with report.stage("cleanup"):
+        delete_result = collection.delete_many({
+            "strategy": "5m_momentum",
+            "status": { "$in": ["pending", "no_hit","no_data"] },
+            "scan_date": datetime.now().strftime("%Y-%m-%d")
+        })
     print(f"🗑️ Deleted {delete_result.deleted_count} stale trades after 3:30 PM")
+    refresh_daily_stats(collection, {("5m_momentum", datetime.now().strftime("%Y-%m-%d"))})
 else:
-    print("⏳ Market still open — skipping cleanup")
\ No newline at end of file
+    print("⏳ Market still open — skipping cleanup")
+
+report.finish()
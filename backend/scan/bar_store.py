@@ -0,0 +1,349 @@
+"""
+bar_store.py
+
+Local Parquet store for OHLC bars, keyed by symbol and interval, with incremental top-ups.
+
+Layout:
+    store/{interval}/{SYMBOL}/base.parquet       compacted history
+    store/{interval}/{SYMBOL}/part-{n}.parquet   tails appended by top-ups
+
+A read concatenates base + parts (later rows win on duplicate timestamps, so a
+still-forming bar is replaced once it closes). A top-up fetches only the bars since the
+last stored timestamp; symbols with nothing stored get a full `period` download.
+`compact()` folds the parts into the base and applies the per-interval retention policy.
+
+The scan worker, the backtest crons and fetch_ohlc.py write the same store from separate
+processes, so every write and compaction holds an exclusive lock on the symbol's
+directory (`flock` on its `.lock` file) and reads hold a shared one. Files are written
+under a temporary name and renamed into place, so a crashed writer never leaves a
+truncated Parquet file behind.
+
+Warm 5m/15m/30m/1h symbols whose 1m bars were topped up moments ago (e.g. by the 1m
+scan in the same cycle) get their tail resampled from those 1m bars (`resample.py`)
+instead of a second provider download. Set BAR_STORE_DERIVE=0 to always download.
+
+ Usage:
+    store = BarStore()
+    for symbol, data in store.load_many(symbols, "5m", period="60d"):
+        ...
+    data = store.load("RELIANCE", "1d", period="max")
+
+    python bar_store.py compact        # compact every symbol/interval and apply retention
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): writers are only serialized within a process
+    fcntl = None
+
+import pandas as pd
+
+from ohlc_fetch import fetch_many, empty_frame, default_provider
+from resample import resample, INTERVAL_MINUTES
+import run_report
+
+DEFAULT_ROOT = os.environ.get(
+    "BAR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "store")
+)
+
+# How much history to keep per interval after compaction (None = keep everything)
+RETENTION = {
+    "1m": timedelta(days=30),
+    "5m": timedelta(days=60),
+    "15m": timedelta(days=60),
+    "1h": timedelta(days=730),
+    "1d": None,
+}
+
+# Oldest tail Yahoo will serve with start/end per interval; older stores get a full re-download
+MAX_TAIL = {
+    "1m": timedelta(days=7),
+    "5m": timedelta(days=59),
+    "15m": timedelta(days=59),
+    "1h": timedelta(days=700),
+}
+
+PERIOD_UNITS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+# Parts are folded into the base automatically once a symbol has this many
+AUTO_COMPACT_PARTS = 20
+
+# Intraday tails are resampled from 1m bars topped up within this window
+DERIVE_FROM_1M = os.environ.get("BAR_STORE_DERIVE", "1") != "0"
+DERIVE_MAX_AGE = timedelta(seconds=90)
+
+
+def period_days(period):
+    """'60d' → 60, '1y' → 366, 'max' → inf. Used to check how far back a store reaches."""
+    if period in (None, "max"):
+        return float("inf")
+    for unit, days in sorted(PERIOD_UNITS.items(), key=lambda u: -len(u[0])):
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * days
+    return float("inf")
+
+
+def write_atomic(data, path):
+    """Writes a Parquet file under a temporary name and renames it into place."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    data.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def trim_to_period(data, period):
+    """Keeps only the bars inside `period` counted back from the latest bar."""
+    days = period_days(period)
+    if data.empty or days == float("inf"):
+        return data
+    return data[data.index > data.index[-1] - timedelta(days=days)]
+
+
+class BarStore:
+    def __init__(self, root=DEFAULT_ROOT, provider=None, retention=None):
+        self.root = root
+        self.provider = provider
+        self.retention = dict(RETENTION, **(retention or {}))
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._refreshed = {}  # (symbol, interval) → when it was last topped up from the provider
+
+    # --- paths / locking ---
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.root, interval, symbol)
+
+    def _lock(self, symbol, interval):
+        with self._locks_guard:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    @contextmanager
+    def _locked(self, symbol, interval, shared=False):
+        """
+        Holds the symbol's directory lock across processes: exclusive for writers (plus
+        the in-process lock), shared for readers. The directory must exist.
+        """
+        guard = self._lock(symbol, interval) if not shared else None
+        if guard is not None:
+            guard.acquire()
+        fd = None
+        try:
+            if fcntl is not None:
+                fd = os.open(os.path.join(self._dir(symbol, interval), ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            if fd is not None:
+                os.close(fd)  # releases the flock
+            if guard is not None:
+                guard.release()
+
+    def _parts(self, symbol, interval):
+        path = self._dir(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(
+            (f for f in os.listdir(path) if f.startswith("part-") and f.endswith(".parquet")),
+            key=lambda f: int(f[5:-8]),
+        )
+
+    # --- reads / writes ---
+
+    def read(self, symbol, interval):
+        """Returns every stored bar for symbol/interval (empty frame if none)."""
+        if not os.path.isdir(self._dir(symbol, interval)):
+            return empty_frame()
+        with self._locked(symbol, interval, shared=True):
+            return self._read(symbol, interval)
+
+    def _read(self, symbol, interval):
+        path = self._dir(symbol, interval)
+        files = []
+        if os.path.exists(os.path.join(path, "base.parquet")):
+            files.append("base.parquet")
+        files += self._parts(symbol, interval)
+        if not files:
+            return empty_frame()
+
+        with run_report.stage("store_read"):
+            frames = [pd.read_parquet(os.path.join(path, f)) for f in files]
+            data = frames[0] if len(frames) == 1 else pd.concat(frames)
+            if len(frames) > 1:
+                data = data[~data.index.duplicated(keep="last")].sort_index()
+        return data
+
+    def coverage(self, symbol, interval):
+        """Longest period (in days) ever downloaded in full for symbol/interval."""
+        path = os.path.join(self._dir(symbol, interval), "coverage")
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return float(f.read().strip() or 0)
+
+    def _set_coverage(self, symbol, interval, period):
+        path = os.path.join(self._dir(symbol, interval), "coverage")
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            f.write(str(period_days(period)))
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def last_timestamp(self, symbol, interval):
+        data = self.read(symbol, interval)
+        return data.index[-1] if not data.empty else None
+
+    def append(self, symbol, interval, data):
+        """Writes new bars as a part file; compacts once enough parts pile up."""
+        if data is None or data.empty:
+            return
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._locked(symbol, interval), run_report.stage("store_write"):
+            parts = self._parts(symbol, interval)
+            n = int(parts[-1][5:-8]) + 1 if parts else 0
+            if n == 0 and not os.path.exists(os.path.join(path, "base.parquet")):
+                write_atomic(data, os.path.join(path, "base.parquet"))
+                return
+            write_atomic(data, os.path.join(path, f"part-{n}.parquet"))
+        if n + 1 >= AUTO_COMPACT_PARTS:
+            self.compact(symbol, interval)
+
+    def compact(self, symbol, interval):
+        """Merges base + parts into a single base file and drops bars past retention."""
+        if not os.path.isdir(self._dir(symbol, interval)):
+            return 0
+        with self._locked(symbol, interval):
+            data = self._read(symbol, interval)
+            if data.empty:
+                return 0
+            keep = self.retention.get(interval)
+            if keep is not None:
+                data = data[data.index >= data.index[-1] - keep]
+                if self.coverage(symbol, interval) > keep.days:
+                    self._set_coverage(symbol, interval, f"{keep.days}d")
+
+            path = self._dir(symbol, interval)
+            write_atomic(data, os.path.join(path, "base.parquet"))
+            for f in self._parts(symbol, interval):
+                os.remove(os.path.join(path, f))
+            return len(data)
+
+    def compact_all(self):
+        if not os.path.isdir(self.root):
+            return
+        for interval in sorted(os.listdir(self.root)):
+            for symbol in sorted(os.listdir(os.path.join(self.root, interval))):
+                rows = self.compact(symbol, interval)
+                print(f"🗜️ {interval}/{symbol} → {rows} bars")
+
+    # --- incremental loading ---
+
+    def load_many(self, symbols, interval, period, **fetch_kwargs):
+        """
+        Yields `(symbol, DataFrame)` with the stored history topped up to now.
+        Cold symbols (nothing stored, stored history shorter than `period`, or a tail
+        older than the provider serves) are downloaded in full; warm symbols only fetch
+        bars since their last stored timestamp (one shared start, the oldest among them).
+        Returned frames are trimmed to `period`.
+        """
+        provider = fetch_kwargs.pop("provider", None) or self.provider or default_provider()
+        stored = {symbol: self.read(symbol, interval) for symbol in dict.fromkeys(symbols)}
+
+        cold, warm = [], []
+        max_tail = MAX_TAIL.get(interval)
+        for symbol, data in stored.items():
+            if data.empty or self.coverage(symbol, interval) < period_days(period):
+                cold.append(symbol)
+                continue
+            last_ts = data.index[-1]
+            if max_tail is not None and pd.Timestamp.now(tz=last_ts.tz) - last_ts > max_tail:
+                cold.append(symbol)
+            else:
+                warm.append(symbol)
+
+        derived = {}
+        for symbol in warm:
+            tail = self._derived_tail(symbol, interval, stored[symbol].index[-1])
+            if tail is not None:
+                derived[symbol] = tail
+        for symbol, tail in derived.items():
+            yield symbol, trim_to_period(self._merge_tail(symbol, interval, stored[symbol], tail), period)
+        warm = [s for s in warm if s not in derived]
+
+        if warm:
+            start = min(stored[s].index[-1] for s in warm)
+            for symbol, tail in fetch_many(warm, interval, start=start, provider=provider, **fetch_kwargs):
+                if not tail.empty:  # a failed or empty fetch must not vouch for stale bars
+                    self._refreshed[(symbol, interval)] = pd.Timestamp.now(tz="UTC")
+                yield symbol, trim_to_period(self._merge_tail(symbol, interval, stored[symbol], tail), period)
+
+        if cold:
+            for symbol, data in fetch_many(cold, interval, period=period, provider=provider, **fetch_kwargs):
+                if not data.empty:
+                    self._replace(symbol, interval, data, period)
+                    self._refreshed[(symbol, interval)] = pd.Timestamp.now(tz="UTC")
+                yield symbol, data
+
+    def load(self, symbol, interval, period, **fetch_kwargs):
+        """Single-symbol version of `load_many`."""
+        for _, data in self.load_many([symbol], interval, period, **fetch_kwargs):
+            return data
+        return empty_frame()
+
+    def _derived_tail(self, symbol, interval, last_ts):
+        """
+        Bars from `last_ts` on resampled from 1m bars topped up within DERIVE_MAX_AGE, or
+        None if the 1m store can't serve them (not fresh, or it starts after `last_ts`).
+        """
+        if not DERIVE_FROM_1M or interval not in INTERVAL_MINUTES:
+            return None
+        refreshed = self._refreshed.get((symbol, "1m"))
+        if refreshed is None or pd.Timestamp.now(tz="UTC") - refreshed > DERIVE_MAX_AGE:
+            return None
+        base = self.read(symbol, "1m")
+        if base.empty or base.index[0] > last_ts:
+            return None
+        with run_report.stage("resample"):
+            tail = resample(base[base.index >= last_ts], interval)
+        run_report.count("tails_resampled")
+        return tail.drop(columns=["Partial", "Forming"])
+
+    def _merge_tail(self, symbol, interval, stored, tail):
+        if tail.empty:
+            return stored
+        tail = tail[tail.index >= stored.index[-1]]
+        if tail.empty:
+            return stored
+        self.append(symbol, interval, tail)
+        merged = pd.concat([stored, tail])
+        return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+    def _replace(self, symbol, interval, data, period):
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._locked(symbol, interval), run_report.stage("store_write"):
+            write_atomic(data, os.path.join(path, "base.parquet"))
+            for f in self._parts(symbol, interval):
+                os.remove(os.path.join(path, f))
+            self._set_coverage(symbol, interval, period)
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore()
+    return _default_store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        default_store().compact_all()
+        print("✅ Bar store compacted.")
+    else:
+        print("Usage: python bar_store.py compact")
@@ -0,0 +1,169 @@
+"""
+bars.py
+
+`Bars`: one symbol's bars as contiguous NumPy arrays, the container the scan conditions
+run on instead of per-symbol DataFrames.
+
+- `time` is int64 UTC epoch-nanoseconds; `open`/`high`/`low`/`close`/`volume` are float64
+- `session_starts` holds the index of the first bar of every trading day (local date of
+  the bars' timezone), so "today's open" and "yesterday's close" are O(1) lookups
+- indicators (EMAs, ATR, VWAP, RSI; see indicators.py) are computed once and kept on the
+  container; bars that know their `key` (symbol, interval) also share them process-wide
+- slicing (`trim`, `upto`, `tail`) returns views of the same arrays, no copies
+
+Rows without Open/High/Close are dropped when building from a frame, like the
+`dropna()` the scanners used to apply to their merged frames.
+
+ Usage:
+    bars = Bars.from_frame(data)
+    bars = bars.trim(60)                     # last 60 days, same as trim_to_period(data, "60d")
+    ema = bars.ema(22)
+    atr = bars.indicators(["atr14"])["atr14"]
+    bars.session_gap()                       # (today's open - yesterday's close) / yesterday's close
+"""
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+class Bars:
+    __slots__ = ("time", "open", "high", "low", "close", "volume", "tz", "index_name",
+                 "day", "session_starts", "key", "_ind")
+
+    def __init__(self, time, open_, high, low, close, volume, tz=None, index_name=None, day=None, key=None):
+        self.time = time
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.tz = tz
+        self.index_name = index_name
+        self.day = local_days(time, tz) if day is None else day
+        self.session_starts = np.flatnonzero(np.r_[True, self.day[1:] != self.day[:-1]]) \
+            if len(self.day) else np.zeros(0, dtype=np.int64)
+        self.key = key  # (symbol, interval) for the process-wide indicator memo, or None
+        self._ind = {}
+
+    # --- building ---
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Bars from an OHLCV DataFrame with a DatetimeIndex (naive indexes are taken as UTC)."""
+        if frame.empty:
+            return cls.empty(getattr(frame.index, "tz", None), frame.index.name)
+        prices = frame[["Open", "High", "Close"]].to_numpy(dtype=np.float64)
+        keep = ~np.isnan(prices).any(axis=1)
+        if not keep.all():
+            frame = frame[keep]
+        index = frame.index if frame.index.tz is not None else frame.index.tz_localize("UTC")
+        volume = frame["Volume"].to_numpy(dtype=np.float64) if "Volume" in frame.columns \
+            else np.zeros(len(frame))
+        low = frame["Low"].to_numpy(dtype=np.float64) if "Low" in frame.columns \
+            else frame[["Open", "Close"]].min(axis=1).to_numpy(dtype=np.float64)
+        return cls(
+            index.as_unit("ns").asi8, frame["Open"].to_numpy(dtype=np.float64),
+            frame["High"].to_numpy(dtype=np.float64), low,
+            frame["Close"].to_numpy(dtype=np.float64), volume, frame.index.tz, frame.index.name,
+        )
+
+    @classmethod
+    def empty(cls, tz=None, index_name=None):
+        nothing = np.zeros(0, dtype=np.float64)
+        return cls(np.zeros(0, dtype=np.int64), nothing, nothing, nothing, nothing, nothing, tz, index_name)
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {"Open": self.open, "High": self.high, "Low": self.low, "Close": self.close, "Volume": self.volume},
+            index=self.index(),
+        )
+
+    # --- access ---
+
+    def __len__(self):
+        return len(self.time)
+
+    def index(self):
+        index = pd.DatetimeIndex(self.time.view("M8[ns]"), name=self.index_name)
+        return index.tz_localize("UTC").tz_convert(self.tz)
+
+    def timestamp(self, i):
+        ts = pd.Timestamp(int(self.time[i]), unit="ns", tz="UTC")
+        return ts.tz_convert(self.tz) if self.tz is not None else ts.tz_localize(None)
+
+    def ema(self, span):
+        """Close EMA (adjust=False, like pandas `ewm(span).mean()`), computed once per span."""
+        name = f"ema{span}"
+        if name not in self._ind:
+            self.indicators([name])
+        return self._ind[name]
+
+    def indicators(self, names):
+        """{name: array} from the indicator kernel (see indicators.py), computed once each."""
+        missing = [n for n in names if n not in self._ind]
+        if missing:
+            self._ind.update(indicators.cached(self, missing, *self.key) if self.key is not None
+                             else indicators.compute(self, missing))
+        return {n: self._ind[n] for n in names}
+
+    # --- sessions ---
+
+    def session_gap(self):
+        """
+        Gap of the latest session: (its first open - the previous session's last close) /
+        that close. None with fewer than two sessions.
+        """
+        if len(self.session_starts) < 2:
+            return None
+        start = self.session_starts[-1]
+        prev_close = self.close[start - 1]
+        return (self.open[start] - prev_close) / prev_close
+
+    # --- slicing (views) ---
+
+    def slice(self, start, stop=None):
+        """Bars [start:stop] as views of these arrays (indicators are not carried over)."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(stop, start)
+        out = Bars.__new__(Bars)
+        out.time, out.open, out.high = self.time[start:stop], self.open[start:stop], self.high[start:stop]
+        out.low, out.close, out.volume = self.low[start:stop], self.close[start:stop], self.volume[start:stop]
+        out.tz, out.index_name, out.day = self.tz, self.index_name, self.day[start:stop]
+        out.key, out._ind = self.key, {}
+        if stop == start:
+            out.session_starts = self.session_starts[:0]
+            return out
+        # the session holding `start` becomes the first one, cut to begin at 0
+        first = np.searchsorted(self.session_starts, start, side="right") - 1
+        last = np.searchsorted(self.session_starts, stop, side="left")
+        out.session_starts = np.maximum(self.session_starts[first:last] - start, 0)
+        return out
+
+    def upto(self, n):
+        """The first `n` bars (what a scan would have seen after bar n-1 closed)."""
+        return self.slice(0, n)
+
+    def tail(self, n):
+        return self.slice(max(len(self) - n, 0), None)
+
+    def trim(self, days):
+        """Bars within `days` calendar days of the latest one (see bar_store.trim_to_period)."""
+        if not len(self) or days == float("inf"):
+            return self
+        cutoff = self.time[-1] - int(days * NS_PER_DAY)
+        return self.slice(int(np.searchsorted(self.time, cutoff, side="right")), None)
+
+
+def local_days(time, tz):
+    """Local calendar day of every bar as days since the epoch."""
+    if not len(time):
+        return np.zeros(0, dtype=np.int64)
+    if tz is None:
+        return time // NS_PER_DAY
+    index = pd.DatetimeIndex(time.view("M8[ns]")).tz_localize("UTC").tz_convert(tz)
+    local = index.tz_localize(None).as_unit("ns").asi8
+    return local // NS_PER_DAY
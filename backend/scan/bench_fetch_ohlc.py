@@ -0,0 +1,104 @@
+"""
+bench_fetch_ohlc.py
+
+Equivalence check + micro-benchmark for the chart payload serialization in fetch_ohlc.py.
+
+It builds a synthetic 5-minute OHLCV frame, runs the original iterrows + json.dump(indent=2)
+implementation next to the column-wise NumPy path, checks both produce the same rows and
+prints rows/sec and payload size for each output format.
+
+ Usage:
+    python bench_fetch_ohlc.py
+    python bench_fetch_ohlc.py 50000      # rows
+"""
+
+import json
+import sys
+import time
+import numpy as np
+import pandas as pd
+import fetch_ohlc
+
+
+def iterrows_ohlc(data):
+    """Original row-by-row implementation, kept as the reference."""
+    data = data.reset_index()
+    data["EMA9"] = data["Close"].ewm(span=9, adjust=False).mean()
+    data["EMA22"] = data["Close"].ewm(span=22, adjust=False).mean()
+    data["EMA44"] = data["Close"].ewm(span=44, adjust=False).mean()
+
+    ohlc = []
+    for _, row in data.iterrows():
+        timestamp = int(pd.to_datetime(row.iloc[0]).timestamp())
+        ohlc.append({
+            "time": timestamp,
+            "open": round(float(row["Open"]), 2),
+            "high": round(float(row["High"]), 2),
+            "low": round(float(row["Low"]), 2),
+            "close": round(float(row["Close"]), 2),
+            "ema9": round(float(row["EMA9"]), 2) if pd.notna(row["EMA9"]) else None,
+            "ema22": round(float(row["EMA22"]), 2) if pd.notna(row["EMA22"]) else None,
+            "ema44": round(float(row["EMA44"]), 2) if pd.notna(row["EMA44"]) else None,
+            "volume": int(row["Volume"]) if not pd.isna(row["Volume"]) else 0
+        })
+    return ohlc
+
+
+def synthetic_bars(rows, seed=7):
+    """Random-walk 5m bars (with a few missing volumes) on a UTC index."""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.002, rows)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, rows))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, rows))
+    volume = rng.integers(100, 100_000, rows).astype(float)
+    volume[rng.random(rows) < 0.01] = np.nan
+    index = pd.date_range("2024-01-01 03:45", periods=rows, freq="5min", tz="UTC")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=index)
+
+
+def timed(fn, repeat=3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = synthetic_bars(rows)
+
+    t_old, old_payload = timed(lambda: json.dumps(iterrows_ohlc(data), indent=2), repeat=1)
+    old_rows = json.loads(old_payload)
+    new_rows = fetch_ohlc.build_ohlc(data)
+
+    # np.round and round() may split exact binary ties differently: allow one cent
+    mismatches = 0
+    for a, b in zip(old_rows, new_rows):
+        for key, value in a.items():
+            other = b[key]
+            if (value is None) != (other is None) or (value is not None and abs(value - other) > 0.0101):
+                mismatches += 1
+    assert len(old_rows) == len(new_rows), "row count differs"
+    print(f"{'✅' if mismatches == 0 else '❌'} {mismatches} field(s) differ over {rows} rows")
+
+    results = [("iterrows + indent=2", t_old, len(old_payload))]
+    formats = list(fetch_ohlc.FORMATS)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        formats.remove("arrow")
+    for fmt in formats:
+        t, payload = timed(lambda: fetch_ohlc.serialize(fetch_ohlc.build_columns(data), fmt))
+        results.append((fmt, t, len(payload)))
+
+    print(f"\n{'path':<22}{'rows/s':>14}{'seconds':>10}{'bytes':>12}{'speedup':>10}")
+    for name, t, size in results:
+        print(f"{name:<22}{rows / t:>14,.0f}{t:>10.3f}{size:>12,}{t_old / t:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+bench_momentum.py
+
+Equivalence check + micro-benchmark for the vectorized momentum detector in helpers.py.
+
+It builds synthetic OHLC series (random walks with bursts of strong candles),
+runs the original nested-iloc loop implementation next to the NumPy version,
+asserts both return identical booleans, and prints the per-symbol cost of each.
+
+ Usage:
+    python bench_momentum.py
+    python bench_momentum.py 500 1500    # symbols, bars per symbol
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+import helpers as hp
+
+
+def loop_momentum_condition(df, momentum_length, required_strong_candles,
+                            body_pct=0.005, lookback=65):
+    """Original per-cell implementation, kept as the reference."""
+    for i in range(-lookback, -5):
+        window = df.iloc[i - momentum_length + 1: i + 1]
+        if len(window) < momentum_length:
+            continue
+
+        strong_candles = 0
+        for j in range(momentum_length):
+            o = window["Open"].iloc[j]
+            c = window["Close"].iloc[j]
+            prev_high = window["High"].iloc[j - 1] if j > 0 else o
+
+            if (c > o) and ((c - o) / o > body_pct) and (c > prev_high):
+                strong_candles += 1
+
+        if strong_candles >= required_strong_candles:
+            return True
+
+    return False
+
+
+def synthetic_ohlc(rng, bars):
+    """Random-walk OHLC with occasional runs of strong bullish candles."""
+    drift = rng.normal(0, 0.003, bars)
+    burst = rng.random(bars) < 0.08
+    drift[burst] += rng.uniform(0.004, 0.012, burst.sum())
+    close = 100 * np.exp(np.cumsum(drift))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.001, bars))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, bars))
+    return pd.DataFrame({"Open": open_, "High": high, "Close": close})
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bars = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = np.random.default_rng(42)
+    frames = [synthetic_ohlc(rng, int(rng.integers(5, bars))) for _ in range(n_symbols)]
+
+    cases = [
+        ("5m", dict(momentum_length=5, required_strong_candles=3, body_pct=0.005, lookback=65),
+         lambda df: hp.check_momentum_condition(df, 5, 3)),
+        ("1m", dict(momentum_length=7, required_strong_candles=4, body_pct=0.003, lookback=85),
+         lambda df: hp.check_momentum_condition_1min(df, 7, 4, body_pct=0.003)),
+    ]
+
+    for label, params, fast in cases:
+        t0 = time.perf_counter()
+        expected = [loop_momentum_condition(df, **params) for df in frames]
+        t_loop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        actual = [fast(df) for df in frames]
+        t_fast = time.perf_counter() - t0
+
+        mismatches = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+        if mismatches:
+            print(f"❌ {label}: {len(mismatches)} mismatches (first at symbol #{mismatches[0]})")
+            sys.exit(1)
+
+        print(
+            f"✅ {label}: {n_symbols} symbols identical ({sum(actual)} matched) | "
+            f"loop {t_loop / n_symbols * 1e3:.3f} ms/symbol → "
+            f"numpy {t_fast / n_symbols * 1e3:.3f} ms/symbol "
+            f"({t_loop / t_fast:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+bench_suite.py
+
+Reproducible benchmarks for the scanning and backtesting hot paths, on synthetic data
+so they need neither Yahoo nor Mongo.
+
+`synthetic_market()` builds deterministic NSE-session OHLCV bars (09:15–15:30 IST,
+weekdays) for any number of symbols: a random walk with a per-symbol trend, bursts of
+strong candles, overnight gaps and optionally missing bars. The same seed always gives
+the same bars, whatever the number of symbols.
+
+Benchmarks:
+- rising_streak    helpers.has_rising_streak on the EMA22 slice the slope check uses
+- momentum_5m      helpers.check_momentum_condition
+- momentum_1m      helpers.check_momentum_condition_1min
+- gap_up           helpers.check_gap_up_retest
+- ema_slope        helpers.check_ema_slope_condition
+- scan_universe    scan_engine.run_strategies over every symbol (fixture provider, temp bar store)
+- scan_panel       the same scan on the cross-sectional panel engine (in-memory store)
+- indicators       indicators.compute for EMA9/22/44, ATR14, RSI14 and VWAP (one kernel call)
+- resolve_trades   trade_resolver.resolve_frame on trades entered at random bars
+
+`--scaling N` also times the scan's evaluation alone (bars served from memory) with 1, 2,
+4, ... N worker processes (`run_strategies(workers=...)`) and reports the speedup over 1.
+
+Each benchmark reports the best wall time of `--repeat` runs, throughput (symbols or trades and
+bars per second) and peak Python memory (tracemalloc, measured in a separate run).
+Results are saved to `store/benchmarks/` (BENCH_DIR) tagged with the git commit;
+`--compare` prints the change against the previous result (or a given file) and exits
+with 1 when anything got slower than `--threshold`.
+
+ Usage:
+    python bench_suite.py
+    python bench_suite.py --symbols 500 --bars 3000 --only momentum_5m scan_universe
+    python bench_suite.py --compare                  # vs the last saved run
+    python bench_suite.py --symbols 1000 --bars 3000 --interval 1m --only scan_universe --scaling 8
+    python bench_suite.py --compare store/benchmarks/abc1234-20240628-101500.json
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SCAN_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.environ.get("BENCH_DIR", os.path.join(SCAN_DIR, "store", "benchmarks"))
+# keep benchmark scans from filling the real run-report directory
+os.environ.setdefault("SCAN_REPORT_DIR", os.path.join(tempfile.gettempdir(), "bench_reports"))
+
+import helpers as hp
+import indicators
+import trade_resolver
+from bars import Bars
+from bar_store import BarStore, period_days, trim_to_period
+from ohlc_fetch import FixtureProvider
+from scan_engine import run_strategies
+from strategies import STRATEGIES
+
+IST = "Asia/Kolkata"
+BAR_MINUTES = {"1m": 1, "5m": 5, "15m": 15}
+SESSION_BARS = {interval: 375 // minutes for interval, minutes in BAR_MINUTES.items()}
+INDICATOR_SET = ["ema9", "ema22", "ema44", "atr14", "rsi14", "vwap"]
+LAST_SESSION = "2024-06-28"  # fixed so the timestamps do not depend on today's date
+
+
+# --- synthetic data ---
+
+def session_index(bars, interval="5m", last_session=LAST_SESSION):
+    """The last `bars` bar timestamps of NSE sessions ending on `last_session` (IST)."""
+    if interval == "1d":
+        days = pd.bdate_range(end=last_session, periods=bars, tz=IST)
+        return pd.DatetimeIndex(days + pd.Timedelta(hours=9, minutes=15), name="Date")
+    per_session = SESSION_BARS[interval]
+    sessions = -(-bars // per_session)
+    days = pd.bdate_range(end=last_session, periods=sessions, tz=IST)
+    offsets = pd.timedelta_range(start="9h15min", periods=per_session, freq=f"{BAR_MINUTES[interval]}min")
+    stamps = (days.as_unit("ns").asi8[:, None] + offsets.as_unit("ns").asi8[None, :]).ravel()[-bars:]
+    return pd.DatetimeIndex(pd.to_datetime(stamps, utc=True).tz_convert(IST), name="Datetime")
+
+
+def synthetic_bars(bars, interval="5m", seed=42, trend=0.0002, volatility=0.002,
+                   burst_prob=0.08, gap_prob=0.15, gap_size=0.03, missing=0.0):
+    """
+    One symbol's OHLCV frame. `trend` is the mean per-bar drift, `gap_prob` the chance a
+    session opens with a gap of about ±`gap_size` (biased up), `missing` the fraction of
+    bars dropped at random.
+    """
+    rng = np.random.default_rng(seed)
+    index = session_index(bars, interval)
+    n = len(index)
+
+    drift = rng.normal(trend, volatility, n)
+    burst = rng.random(n) < burst_prob
+    drift[burst] += rng.uniform(0.004, 0.012, burst.sum())
+    gap = np.zeros(n)
+    if interval != "1d":
+        day = index.normalize().asi8
+        opens_session = np.r_[False, day[1:] != day[:-1]]
+        gaps = opens_session & (rng.random(n) < gap_prob)
+        gap[gaps] = gap_size * rng.uniform(-0.5, 1.5, gaps.sum())
+
+    close = 100 * np.exp(np.cumsum(drift + gap))
+    open_ = np.r_[close[0], close[:-1]] * np.exp(gap) * (1 + rng.normal(0, volatility / 3, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, volatility * 2, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, volatility * 2, n))
+    volume = rng.integers(1_000, 200_000, n).astype(float)
+    frame = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close,
+                          "Adj Close": close, "Volume": volume}, index=index)
+    if missing:
+        frame = frame[rng.random(n) >= missing]
+    return frame
+
+
+def synthetic_market(symbols=200, bars=1500, interval="5m", seed=42, **kwargs):
+    """{symbol: frame} for `symbols` synthetic symbols (per-symbol trend around `trend`)."""
+    trend = kwargs.pop("trend", 0.0002)
+    market = {}
+    for i in range(symbols):
+        rng = np.random.default_rng([seed, i])
+        market[f"SYM{i:04d}"] = synthetic_bars(
+            bars, interval, seed=[seed, i, 1], trend=rng.normal(trend, abs(trend) or 1e-4), **kwargs)
+    return market
+
+
+def with_ema(frame, span=22):
+    merged = frame[["Open", "High", "Close"]].copy()
+    merged[f"EMA{span}"] = frame["Close"].ewm(span=span, adjust=False).mean()
+    return merged
+
+
+def synthetic_trades(market, per_symbol=20, target_mult=1.01, stop_mult=0.995, seed=42):
+    """Trade documents entered at random bars (leaving room for them to play out)."""
+    rng = np.random.default_rng(seed)
+    trades = {}
+    for symbol, frame in market.items():
+        picks = np.sort(rng.integers(0, max(len(frame) - 50, 1), per_symbol))
+        closes = frame["Close"].to_numpy()
+        trades[symbol] = [{
+            "symbol": symbol,
+            "timestamp": frame.index[i].isoformat(),
+            "close": float(closes[i]),
+            "target": float(closes[i] * target_mult),
+            "stop_loss": float(closes[i] * stop_mult),
+        } for i in picks]
+    return trades
+
+
+# --- benchmarks ---
+
+def _quiet(fn):
+    """Runs `fn` with its prints swallowed (scan progress, per-symbol warnings)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+
+def build_benchmarks(market, interval):
+    """{name: (run, items, bars)} where `run()` does one full pass over the market."""
+    frames = list(market.values())
+    merged = [with_ema(f, 22) for f in frames]
+    ema_slices = [m["EMA22"].iloc[-60:-10].reset_index(drop=True) for m in merged]
+    total_bars = sum(len(f) for f in frames)
+    n = len(frames)
+    bars = [Bars.from_frame(f) for f in frames]
+
+    benches = {
+        "rising_streak": (lambda: [hp.has_rising_streak(s, 5, 0.001) for s in ema_slices],
+                          n, sum(len(s) for s in ema_slices)),
+        "momentum_5m": (lambda: [hp.check_momentum_condition(m, 5, 3) for m in merged], n, total_bars),
+        "momentum_1m": (lambda: [hp.check_momentum_condition_1min(m, 7, 4, body_pct=0.003) for m in merged],
+                        n, total_bars),
+        "gap_up": (lambda: _quiet(lambda: [hp.check_gap_up_retest(f, m) for f, m in zip(frames, merged)]),
+                   n, total_bars),
+        "ema_slope": (lambda: [hp.check_ema_slope_condition(m) for m in merged], n, total_bars),
+        "indicators": (lambda: [indicators.compute(b, INDICATOR_SET) for b in bars], n, total_bars),
+    }
+
+    strategies = [dataclasses.replace(s, sink=None) for s in STRATEGIES.values() if s.interval == interval]
+    if strategies:
+        fixtures = {(symbol, interval): frame for symbol, frame in market.items()}
+
+        def scan():
+            with tempfile.TemporaryDirectory() as root:
+                store = BarStore(root, provider=FixtureProvider(fixtures))
+                return _quiet(lambda: run_strategies(strategies, symbols=list(market), store=store))
+
+        benches["scan_universe"] = (scan, n, total_bars)
+        memory = MemoryStore(market)
+        benches["scan_panel"] = (
+            lambda: _quiet(lambda: run_strategies(strategies, symbols=list(market), store=memory, engine="panel")),
+            n, total_bars,
+        )
+
+    horizon = strategies[0].horizon if strategies else pd.Timedelta(days=2)
+    trades = synthetic_trades(market)
+    n_trades = sum(len(t) for t in trades.values())
+    benches["resolve_trades"] = (
+        lambda: [trade_resolver.resolve_frame(trades[s], market[s], horizon) for s in market],
+        n_trades, total_bars,
+    )
+    return benches
+
+
+class MemoryStore:
+    """Serves the synthetic market straight from memory, so a scan measures evaluation only."""
+
+    def __init__(self, market):
+        self.market = market
+
+    def load_many(self, symbols, interval, period, **fetch_kwargs):
+        for symbol in symbols:
+            yield symbol, trim_to_period(self.market[symbol], period)
+
+
+def scaling(market, interval, max_workers, repeat):
+    """{workers: {"seconds", "speedup"}} for scans on 1, 2, 4, ... `max_workers` processes."""
+    strategies = [dataclasses.replace(s, sink=None) for s in STRATEGIES.values() if s.interval == interval]
+    if not strategies:
+        print(f"⚠️ No strategy scans {interval} bars; skipping the scaling run.")
+        return {}
+    store = MemoryStore(market)
+    counts = sorted({1, max_workers, *(2 ** k for k in range(1, max_workers.bit_length()) if 2 ** k < max_workers)})
+    print(f"\n🧵 Scan evaluation scaling ({', '.join(s.name for s in strategies)}, "
+          f"{max(period_days(s.period) for s in strategies):g}d of bars):")
+    out, reference, base = {}, None, None
+    for workers in counts:
+        run = lambda: _quiet(lambda: run_strategies(strategies, symbols=list(market), store=store, workers=workers))
+        found = run()
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - t0)
+        if reference is None:
+            reference, base = found, best
+        elif found != reference:
+            print(f"❌ {workers} workers returned different matches than 1 worker")
+        out[workers] = {"seconds": round(best, 6), "speedup": round(base / best, 2)}
+        print(f"   {workers:>3} worker(s) {best * 1e3:>10.2f} ms  {base / best:>6.2f}x")
+    return out
+
+
+def measure(run, repeat):
+    """(best wall seconds, peak traced bytes) of `run`."""
+    run()  # warm-up: imports, caches, first-call allocations
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(symbols, bars, interval, seed, repeat, only=None):
+    market = synthetic_market(symbols, bars, interval, seed)
+    results = {}
+    for name, (run, items, total_bars) in build_benchmarks(market, interval).items():
+        if only and name not in only:
+            continue
+        seconds, peak = measure(run, repeat)
+        results[name] = {
+            "seconds": round(seconds, 6),
+            "items": items,
+            "items_per_s": round(items / seconds, 1),
+            "bars_per_s": round(total_bars / seconds, 1),
+            "peak_mb": round(peak / 2**20, 3),
+        }
+        print(f"⏱️  {name:<16}{seconds * 1e3:>10.2f} ms  {items / seconds:>12,.0f} items/s  "
+              f"{total_bars / seconds:>14,.0f} bars/s  peak {peak / 2**20:>8.2f} MB")
+    return results
+
+
+# --- saving / comparing ---
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCAN_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=SCAN_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip() != ""
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def save(record, bench_dir=BENCH_DIR):
+    os.makedirs(bench_dir, exist_ok=True)
+    path = os.path.join(bench_dir, f"{record['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    return path
+
+
+def latest_result(bench_dir=BENCH_DIR, exclude=None):
+    paths = [p for p in glob.glob(os.path.join(bench_dir, "*.json")) if p != exclude]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(record, baseline, threshold):
+    """Prints per-benchmark time changes; returns the names that regressed beyond `threshold`."""
+    if baseline["config"] != record["config"]:
+        print(f"⚠️ Baseline ran with a different config: {baseline['config']}")
+    print(f"\nvs {baseline['commit']}{' (dirty)' if baseline.get('dirty') else ''} "
+          f"from {baseline['timestamp']}:")
+    regressed = []
+    for name, now in record["results"].items():
+        then = baseline["results"].get(name)
+        if then is None:
+            print(f"   {name:<16}(new)")
+            continue
+        change = now["seconds"] / then["seconds"] - 1
+        memory = now["peak_mb"] - then["peak_mb"]
+        mark = "❌" if change > threshold else "✅" if change < -threshold else "  "
+        if change > threshold:
+            regressed.append(name)
+        print(f"{mark} {name:<16}{change:>+8.1%} time  {memory:>+9.2f} MB peak")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan and backtest hot paths on synthetic data")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=1500, help="bars per symbol")
+    parser.add_argument("--interval", default="5m", choices=[*BAR_MINUTES, "1d"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--compare", nargs="?", const="latest", help="compare with the last run or a result file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression (0.10 = 10%%)")
+    parser.add_argument("--scaling", type=int, metavar="N", help="also time the scan on 1..N worker processes")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    baseline_path = None
+    if args.compare:
+        baseline_path = latest_result() if args.compare == "latest" else args.compare
+        if baseline_path is None:
+            print("⚠️ No saved benchmark results to compare with yet.")
+
+    config = {"symbols": args.symbols, "bars": args.bars, "interval": args.interval,
+              "seed": args.seed, "repeat": args.repeat}
+    print(f"📈 Benchmarking {args.symbols} symbols × {args.bars} {args.interval} bars (seed {args.seed})")
+    results = run_suite(args.symbols, args.bars, args.interval, args.seed, args.repeat, args.only)
+    scaled = None
+    if args.scaling:
+        market = synthetic_market(args.symbols, args.bars, args.interval, args.seed)
+        scaled = scaling(market, args.interval, args.scaling, args.repeat)
+
+    commit, dirty = git_commit()
+    record = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "config": config,
+        "results": results,
+    }
+    if scaled:
+        record["scaling"] = scaled
+    if not args.no_save:
+        print(f"\n✅ Saved to {save(record)}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressed = compare(record, json.load(f), args.threshold)
+        if regressed:
+            print(f"\n❌ Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
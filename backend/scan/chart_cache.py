@@ -0,0 +1,171 @@
+"""
+chart_cache.py
+
+In-memory cache for chart payloads (the JSON `fetch_ohlc.py` produces), keyed by
+(symbol, timeframe, window) and used by the scan worker.
+
+- An entry stays fresh until the next bar of its timeframe closes (plus a few seconds
+  for Yahoo to publish it): the next 1m / 5m boundary of the NSE session, or the next
+  session close for 1d. Outside market hours intraday entries live until the first bar
+  of the next session.
+- Entries are evicted least-recently-used first once the cached payloads exceed the
+  memory bound (CHART_CACHE_MB, default 64).
+- Concurrent requests for the same chart share one load (single-flight); only the first
+  caller builds it, the others wait for its result.
+- `counters()` reports hits, misses, coalesced waits, expirations and evictions.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo("Asia/Kolkata")
+SESSION_OPEN = (9, 15)
+SESSION_CLOSE = (15, 30)
+BAR_MINUTES = {"1m": 1, "5m": 5}
+SETTLE_SECONDS = 5
+MAX_BYTES = int(float(os.environ.get("CHART_CACHE_MB", 64)) * 1024 * 1024)
+
+
+def _at(day, hour_minute):
+    return day.replace(hour=hour_minute[0], minute=hour_minute[1], second=0, microsecond=0)
+
+
+def _next_weekday(day):
+    day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def next_bar_close(interval, now=None):
+    """Next time (IST datetime) a new bar of `interval` closes after `now`."""
+    local = (now or datetime.now(IST)).astimezone(IST)
+    session_open, session_close = _at(local, SESSION_OPEN), _at(local, SESSION_CLOSE)
+    trading_day = local.weekday() < 5
+
+    if interval in BAR_MINUTES:
+        step = timedelta(minutes=BAR_MINUTES[interval])
+        if trading_day and session_open <= local < session_close:
+            bars_done = (local - session_open) // step
+            return min(session_open + (bars_done + 1) * step, session_close)
+        day = local if trading_day and local < session_open else _next_weekday(local)
+        return _at(day, SESSION_OPEN) + step
+
+    # daily (and anything coarser): the bar changes at the session close
+    if trading_day and local < session_close:
+        return session_close
+    return _at(_next_weekday(local), SESSION_CLOSE)
+
+
+def expires_at(interval, now_ts):
+    """Epoch seconds after which a chart built at `now_ts` is stale."""
+    close = next_bar_close(interval, datetime.fromtimestamp(now_ts, IST))
+    return close.timestamp() + SETTLE_SECONDS
+
+
+WINDOW_KEYS = ("start", "end", "limit", "points")
+
+
+def build_payload(symbol, interval, **window):
+    """Chart rows for one symbol (optionally windowed / downsampled) as compact JSON bytes."""
+    import fetch_ohlc
+
+    data = fetch_ohlc.load_bars(symbol, interval)
+    if data.empty:
+        raise LookupError(f"No chart data for {symbol} ({interval})")
+    columns = fetch_ohlc.chart_columns(data, symbol=symbol, interval=interval, **window)
+    return fetch_ohlc.serialize(columns).encode()
+
+
+class ChartCache:
+    def __init__(self, loader=build_payload, max_bytes=MAX_BYTES, clock=time.time):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (symbol, interval, window) → (payload, expires_at)
+        self.bytes = 0
+        self.in_flight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0}
+
+    def get(self, symbol, interval, **window):
+        """
+        Cached payload for (symbol, interval) and an optional window
+        (start / end / limit / points, see fetch_ohlc.chart_columns), loading it if missing or stale.
+        """
+        window = tuple((k, window[k]) for k in WINDOW_KEYS if window.get(k) is not None)
+        key = (symbol.strip().upper(), interval, window)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > self.clock():
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                self.stats["expired"] += 1
+                self._drop(key)
+
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            started = self.clock()
+            payload = self.loader(key[0], interval, **dict(window))
+        except Exception as e:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self._put(key, payload, expires_at(key[1], started))
+            self.in_flight.pop(key, None)
+        future.set_result(payload)
+        return payload
+
+    def _put(self, key, payload, expires):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        while self.entries and self.bytes + size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+        self.entries[key] = (payload, expires)
+        self.bytes += size
+
+    def _drop(self, key):
+        payload, _ = self.entries.pop(key)
+        self.bytes -= len(payload)
+
+    def invalidate(self, symbol=None, interval=None):
+        """Drops matching entries (all of them without arguments)."""
+        with self.lock:
+            for key in [k for k in self.entries
+                        if (symbol is None or k[0] == symbol.upper())
+                        and (interval is None or k[1] == interval)]:
+                self._drop(key)
+
+    def counters(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,8 +1,8 @@
-from pymongo import MongoClient
 from datetime import datetime, timedelta
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["tradesmart"]
+from mongo import get_db, status_counts_group, refresh_daily_stats
+
+db = get_db()
 
 def summarize_strategy(collection_name, strategy_name):
     collection = db[collection_name]
@@ -11,23 +11,24 @@ def summarize_strategy(collection_name, strategy_name):
     # Get this week's Monday and Friday
     this_monday = today - timedelta(days=today.weekday())  # Monday of current week
     this_friday = this_monday + timedelta(days=4)          # Friday of current week
-
-    # Filter only this week's data (Monday to Friday)
-    trades = list(collection.find({
+    week = {
         "strategy": strategy_name,
         "scan_date": {
             "$gte": this_monday.strftime("%Y-%m-%d"),
             "$lte": this_friday.strftime("%Y-%m-%d")
         }
-    }))
+    }
+
+    # Count this week's (Monday to Friday) trades per status on the server
+    counts = next(collection.aggregate([{"$match": week}, status_counts_group(None)]), None)
 
-    if not trades:
+    if not counts:
         print(f"ℹ️ No trades to summarize for {strategy_name}")
         return
 
-    total = len(trades)
-    wins = sum(1 for t in trades if t.get("status") == "win")
-    losses = sum(1 for t in trades if t.get("status") == "loss")
+    total = counts["total"]
+    wins = counts["win"]
+    losses = counts["loss"]
 
     win_rate = round((wins / (wins + losses)) * 100, 2) if (wins + losses) else 0.0
     loss_rate = round((losses / (wins + losses)) * 100, 2) if (wins + losses) else 0.0
@@ -40,6 +41,7 @@ def summarize_strategy(collection_name, strategy_name):
         "total_trades": total,
         "wins": wins,
         "losses": losses,
+        "no_hits": counts["no_hit"],
         "win_rate": win_rate,
         "loss_rate": loss_rate,
         "created_at": datetime.utcnow()
@@ -47,14 +49,12 @@ def summarize_strategy(collection_name, strategy_name):
 
     print(f"✅ Weekly summary saved for {strategy_name} — {win_rate}% win")
 
+    # Freeze the week's daily stats before the trades behind them are deleted
+    days = [(this_monday + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(5)]
+    refresh_daily_stats(collection, {(strategy_name, day) for day in days})
+
     # Delete this week's trades
-    deleted = collection.delete_many({
-        "strategy": strategy_name,
-        "scan_date": {
-            "$gte": this_monday.strftime("%Y-%m-%d"),
-            "$lte": this_friday.strftime("%Y-%m-%d")
-        }
-    })
+    deleted = collection.delete_many(week)
     print(f"🗑️ Deleted {deleted.deleted_count} trades from this week ({strategy_name})")
 
 # Run for both strategies
@@ -3,20 +3,28 @@ fetch_ohlc.py
 
 This script fetches historical intraday OHLC data for a given NSE stock symbol using the yfinance API and saves it as a JSON file.
 
-It supports both 5-minute and 1-minute intervals and automatically calculates the appropriate EMA:
-- **EMA22** for 5-minute interval
-- **EMA9** for 1-minute interval
+It supports 5-minute, 1-minute and daily intervals and calculates EMA9, EMA22 and EMA44 for each.
 
  How it works:
 1. Takes the stock symbol (without ".NS") and optional interval ("5m" or "1m") from command line arguments.
-2. Downloads the past 7 days of data from Yahoo Finance.
-3. Calculates the selected EMA on the "Close" price.
-4. Converts the data into a list of dictionaries (time, open, high, low, close, ema, volume).
+2. Loads history from the local bar store (`bar_store.py`), fetching only the missing tail from Yahoo Finance.
+3. Calculates EMA9/22/44 on the "Close" price with the shared indicator kernel (indicators.py).
+4. Converts the data into a list of dictionaries (time, open, high, low, close, ema9, ema22, ema44, volume).
 5. Saves the result as a JSON file to `scan/data/{SYMBOL}_{INTERVAL}.json`.
 
+ Rows are built column-wise with NumPy (rounding, NaN → null) and written as compact JSON.
+ `--format columnar` writes {"time": [...], "open": [...], ...} instead, `--format arrow`
+ an Arrow IPC stream, and `--stdout` streams the payload instead of writing a file.
+
+ Long histories (1d loads the whole listing) can be cut down with `--from` / `--to` /
+ `--limit` and aggregated to at most `--points` OHLC buckets; EMAs are computed on the
+ full history before windowing so they match the unwindowed chart.
+
  Usage:
     python fetch_ohlc.py RELIANCE 5m
     python fetch_ohlc.py INFY 1m
+    python fetch_ohlc.py INFY 1d --format columnar --stdout
+    python fetch_ohlc.py INFY 1d --from 2015-01-01 --points 1500 --stdout
 
  Output Example:
 [
@@ -26,89 +34,235 @@ It supports both 5-minute and 1-minute intervals and automatically calculates th
     "high": 2731.5,
     "low": 2719.8,
     "close": 2730.1,
+    "ema9": 2728.12,
     "ema22": 2725.43,
+    "ema44": 2719.9,
     "volume": 38420
   },
   ...
 ]
 """
 
-
-import yfinance as yf
+import argparse
+import numpy as np
 import pandas as pd
 import sys
 import json
 import os
+import re
+from bar_store import default_store
+from bars import Bars
 
-if len(sys.argv) < 2:
-    print("Error: No stock symbol provided. Usage: python fetch_ohlc.py SYMBOL [INTERVAL]")
-    sys.exit(1)
-
-symbol_raw = sys.argv[1].strip().upper()
-symbol = symbol_raw + ".NS"
-interval = sys.argv[2] if len(sys.argv) > 2 else '5m'
-
-# Choose EMA logic based on timeframe
-if interval == "5m":
-    period="60d"
-    ema_col = "EMA22"
-    ema_span = 22
-elif interval == "1m":
-    period="8d"
-    ema_col = "EMA9"
-    ema_span = 9
-elif interval == "1d":
-    period="max"
-    ema_col = "EMA44"
-    ema_span = 44
-else:
-    period="60d"
-    ema_col = "EMA"
-    ema_span = 20
-
-try:
-    data = yf.download(symbol, interval=interval, period=period, auto_adjust=False, progress=False)
-except Exception as e:
-    print(f"Error fetching data for {symbol}: {e}")
-    sys.exit(1)
-
-if data.empty:
-    print(f"No data returned for {symbol}.")
-    sys.exit(1)
-
-# Flatten multi-index columns if needed
-if isinstance(data.columns, pd.MultiIndex):
-    if symbol in data.columns.levels[1]:
-        data = data.xs(symbol, axis=1, level=1)
-    else:
-        print(f"Error: '{symbol}' not found in downloaded data columns.")
-        sys.exit(1)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# History to load per timeframe
+PERIODS = {"5m": "60d", "1m": "8d", "1d": "max"}
+
+# NSE symbols as listed (M&M, BAJAJ-AUTO, ...); they end up in store paths
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9&-]+$")
+
+EMA_SPANS = (9, 22, 44)
+FORMATS = ("rows", "columnar", "arrow")
+
+
+def check_request(symbol_raw, interval):
+    """Normalized symbol of a chart request; ValueError for an unknown symbol format or timeframe."""
+    symbol = str(symbol_raw).strip().upper()
+    if not SYMBOL_PATTERN.match(symbol):
+        raise ValueError(f"invalid symbol '{symbol_raw}'")
+    if interval not in PERIODS:
+        raise ValueError(f"invalid timeframe '{interval}' (one of {', '.join(PERIODS)})")
+    return symbol
+
+
+def load_bars(symbol_raw, interval):
+    """Reads from the local bar store, topping up only the bars since the last run."""
+    return default_store().load(check_request(symbol_raw, interval), interval, PERIODS[interval])
+
+
+def build_columns(data, symbol=None, interval=None):
+    """
+    Chart columns as NumPy arrays: time (epoch seconds), OHLC rounded to 2 decimals,
+    ema9/ema22/ema44 (NaN where undefined) and volume (0 where missing). The EMAs come from
+    the indicator kernel in one call, memoized per bar set when `symbol` and `interval` are given.
+    """
+    index = pd.DatetimeIndex(data.index)
+    close = data["Close"].to_numpy(dtype=np.float64)
+    volume = data["Volume"].to_numpy(dtype=np.float64)
+    utc = index if index.tz is not None else index.tz_localize("UTC")
+    bars = Bars(utc.as_unit("ns").asi8, data["Open"].to_numpy(dtype=np.float64),
+                data["High"].to_numpy(dtype=np.float64), data["Low"].to_numpy(dtype=np.float64),
+                close, volume, index.tz, key=(symbol, interval) if symbol and interval else None)
+    emas = bars.indicators([f"ema{span}" for span in EMA_SPANS])
+    columns = {
+        "time": index.as_unit("s").asi8,
+        "open": np.round(data["Open"].to_numpy(dtype=np.float64), 2),
+        "high": np.round(data["High"].to_numpy(dtype=np.float64), 2),
+        "low": np.round(data["Low"].to_numpy(dtype=np.float64), 2),
+        "close": np.round(close, 2),
+    }
+    for span in EMA_SPANS:
+        columns[f"ema{span}"] = np.round(emas[f"ema{span}"], 2)
+    columns["volume"] = np.where(np.isnan(volume), 0, volume).astype(np.int64)
+    return columns
+
+
+def parse_time(value):
+    """Epoch seconds from epoch seconds or an ISO date/datetime (IST unless it has a zone)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or str(value).lstrip("-").isdigit():
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tz is None:
+        ts = ts.tz_localize("Asia/Kolkata")
+    return int(ts.timestamp())
+
+
+def select_window(columns, start=None, end=None, limit=None):
+    """Bars with start <= time <= end (epoch seconds), keeping only the last `limit` of them."""
+    times = columns["time"]
+    lo = np.searchsorted(times, start, side="left") if start is not None else 0
+    hi = np.searchsorted(times, end, side="right") if end is not None else len(times)
+    if limit:
+        lo = max(lo, hi - int(limit))
+    return {name: values[lo:hi] for name, values in columns.items()}
+
+
+def downsample(columns, points):
+    """
+    Aggregates into at most `points` buckets of consecutive bars: first open, max high,
+    min low, last close, summed volume, and the EMAs as of the bucket's last bar. Buckets
+    are aligned to the newest bar (only the oldest one can be partial) and stamped with
+    the time of their first bar.
+    """
+    n = len(columns["time"])
+    if not points or n <= points:
+        return columns
+    size = -(-n // int(points))
+    buckets = -(-n // size)
+    starts = np.maximum(n - size * np.arange(buckets, 0, -1), 0)
+    ends = np.r_[starts[1:], n] - 1
+
+    out = {
+        "time": columns["time"][starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+    }
+    for span in EMA_SPANS:
+        out[f"ema{span}"] = columns[f"ema{span}"][ends]
+    out["volume"] = np.add.reduceat(columns["volume"], starts)
+    return out
+
+
+def to_json_rows(columns):
+    """Compact JSON array of {time, open, ..., volume} objects (NaN → null)."""
+    return pd.DataFrame(columns).to_json(orient="records", double_precision=2)
 
-data = data.reset_index()
-data["EMA9"] = data["Close"].ewm(span=9, adjust=False).mean()
-data["EMA22"] = data["Close"].ewm(span=22, adjust=False).mean()
-data["EMA44"] = data["Close"].ewm(span=44, adjust=False).mean()
-# data[ema_col] = data["Close"].ewm(span=ema_span, adjust=False).mean()
-
-ohlc = []
-for _, row in data.iterrows():
-    timestamp = int(pd.to_datetime(row.iloc[0]).timestamp())
-    ohlc.append({
-        "time": timestamp,
-        "open": round(float(row["Open"]), 2),
-        "high": round(float(row["High"]), 2),
-        "low": round(float(row["Low"]), 2),
-        "close": round(float(row["Close"]), 2),
-       "ema9": round(float(row["EMA9"]), 2) if pd.notna(row["EMA9"]) else None,
-    "ema22": round(float(row["EMA22"]), 2) if pd.notna(row["EMA22"]) else None,
-    "ema44": round(float(row["EMA44"]), 2) if pd.notna(row["EMA44"]) else None,
-        "volume": int(row["Volume"]) if not pd.isna(row["Volume"]) else 0
+
+def to_json_columnar(columns):
+    """Compact JSON object of column arrays: {"time": [...], "open": [...], ...} (NaN → null)."""
+    parts = [f'"{name}":{pd.Series(values).to_json(orient="values", double_precision=2)}'
+             for name, values in columns.items()]
+    return "{" + ",".join(parts) + "}"
+
+
+def to_arrow(columns):
+    """Arrow IPC stream bytes (needs pyarrow)."""
+    import pyarrow as pa
+
+    table = pa.table({
+        name: pa.array(values, from_pandas=True) for name, values in columns.items()
     })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def serialize(columns, fmt="rows"):
+    if fmt == "rows":
+        return to_json_rows(columns)
+    if fmt == "columnar":
+        return to_json_columnar(columns)
+    if fmt == "arrow":
+        return to_arrow(columns)
+    raise ValueError(f"unknown format '{fmt}'")
+
+
+def build_ohlc(data):
+    """OHLC rows with EMA9/EMA22/EMA44 for the chart, as a list of dicts."""
+    return json.loads(to_json_rows(build_columns(data)))
+
+
+def chart_columns(data, start=None, end=None, limit=None, points=None, symbol=None, interval=None):
+    """
+    Chart columns for a window of `data`. EMAs are computed over the full history first,
+    so a window or a downsampled view shows the same EMA values as the full chart.
+    """
+    columns = select_window(build_columns(data, symbol, interval), parse_time(start), parse_time(end), limit)
+    return downsample(columns, points)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Export chart OHLC + EMA data for a symbol")
+    parser.add_argument("symbol")
+    parser.add_argument("interval", nargs="?", default="5m")
+    parser.add_argument("--format", choices=FORMATS, default="rows",
+                        help="rows (default, what the chart reads), columnar JSON or Arrow IPC")
+    parser.add_argument("--stdout", action="store_true", help="write to stdout instead of scan/data/")
+    parser.add_argument("--from", dest="start", help="first bar (epoch seconds or ISO date, IST)")
+    parser.add_argument("--to", dest="end", help="last bar (epoch seconds or ISO date, IST)")
+    parser.add_argument("--limit", type=int, help="keep only the last N bars of the range")
+    parser.add_argument("--points", type=int, help="aggregate into at most N OHLC buckets")
+    if len(argv) < 1:
+        print("Error: No stock symbol provided. Usage: python fetch_ohlc.py SYMBOL [INTERVAL]")
+        sys.exit(1)
+    args = parser.parse_args(argv)
+
+    interval = args.interval
+    try:
+        symbol_raw = check_request(args.symbol, interval)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    symbol = symbol_raw + ".NS"
+
+    try:
+        data = load_bars(symbol_raw, interval)
+    except Exception as e:
+        print(f"Error fetching data for {symbol}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if data.empty:
+        print(f"No data returned for {symbol}.", file=sys.stderr)
+        sys.exit(1)
+
+    columns = chart_columns(data, args.start, args.end, args.limit, args.points, symbol_raw, interval)
+    payload = serialize(columns, args.format)
+
+    if args.stdout:
+        if isinstance(payload, bytes):
+            sys.stdout.buffer.write(payload)
+        else:
+            sys.stdout.write(payload)
+        return
+
+    # Save file
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ext = "arrow" if args.format == "arrow" else "json"
+    suffix = "" if args.format == "rows" else f"_{args.format}"
+    output_path = os.path.join(DATA_DIR, f"{symbol_raw}_{interval}{suffix}.{ext}")
+    # Write-then-rename so a concurrent run for the same chart never leaves a torn file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb" if isinstance(payload, bytes) else "w") as f:
+        f.write(payload)
+    os.replace(tmp_path, output_path)
+
+    print(f"✅ Data saved: {output_path}")
 
-# Save file
-os.makedirs("data", exist_ok=True)
-output_path = f"data/{symbol_raw}_{interval}.json"
-with open(output_path, "w") as f:
-    json.dump(ohlc, f, indent=2)
 
-print(f"✅ Data saved: {output_path}")
+if __name__ == "__main__":
+    main(sys.argv[1:])
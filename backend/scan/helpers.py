@@ -5,6 +5,12 @@ This module provides reusable utility functions to evaluate technical conditions
 used in the strategy
 
 """
+import numpy as np
+import pandas as pd
+
+from bars import Bars
+
+
 def has_rising_streak(series, streak_required=5, min_step=0.001):
     """
     Checks for a rising streak in a series where each increase is ≥ min_step (e.g., 0.1%).
@@ -23,74 +29,89 @@ def has_rising_streak(series, streak_required=5, min_step=0.001):
     return False
 
 
-def check_momentum_condition(merged, momentum_length=5, required_strong_candles=3):
+def strong_candle_counts(open_, high, close, momentum_length=5, body_pct=0.005):
     """
-    Scans for at least N strong bullish candles within a sliding window of recent data.
+    Counts strong bullish candles in every window of `momentum_length` bars.
+    Element k holds the count for the window ending at bar k (0 before a full window).
+    A strong candle = close > open, body > body_pct and close > previous high;
+    the first candle of a window is compared against its own open, as in the loop version.
     """
-    
-    for i in range(-65, -5):
-        window = merged.iloc[i - momentum_length + 1: i + 1]
-        if len(window) < momentum_length:
-            continue
-
-        strong_candles = 0
-        for j in range(momentum_length):
-            o = window["Open"].iloc[j]
-            c = window["Close"].iloc[j]
-            prev_high = window["High"].iloc[j - 1] if j > 0 else o
-
-            if (c > o) and ((c - o) / o > 0.005) and (c > prev_high):
-                strong_candles += 1
-
-        if strong_candles >= required_strong_candles:
-            return True
-
-    return False
-
-
-def check_gap_up_retest(data, merged, ema_percent=0.005):
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+    n = len(c)
+    counts = np.zeros(n, dtype=np.int64)
+    if n < momentum_length:
+        return counts
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first_ok = (c > o) & ((c - o) / o > body_pct)
+    strong = first_ok.copy()
+    strong[1:] &= c[1:] > h[:-1]
+    strong[0] = False
+
+    csum = np.cumsum(strong)
+    end = np.arange(momentum_length - 1, n)
+    start = end - momentum_length + 1
+    counts[end] = csum[end] - csum[start] + first_ok[start]
+    return counts
+
+
+def momentum_in_lookback(open_, high, close, momentum_length, required_strong_candles,
+                          body_pct, lookback):
     """
-    Checks for gap-up > 2% and if price comes close to EMA shortly after the gap.
+    True if any window ending between `lookback` and 6 bars before the latest bar
+    holds at least `required_strong_candles` strong candles.
     """
-    try:
-        df_reset = data.reset_index()
-        df_reset["Date"] = df_reset["Datetime"].dt.date
-        grouped = df_reset.groupby("Date")
-        dates = sorted(grouped.groups.keys())
+    n = len(close)
+    counts = strong_candle_counts(open_, high, close, momentum_length, body_pct)
+    first_end = max(n - lookback, momentum_length - 1)
+    last_end = n - 6
+    if last_end < first_end:
+        return False
+    return bool((counts[first_end:last_end + 1] >= required_strong_candles).any())
 
-        if len(dates) < 2:
-            return False
 
-        yesterday = grouped.get_group(dates[-2])
-        today = grouped.get_group(dates[-1])
-        y_close = (yesterday["Close"].iloc[-1].item())
-        o_today = (today["Open"].iloc[0].item())
-        gap = (o_today - y_close) / y_close
+def _prices(bars, open_col="Open", high_col="High", close_col="Close"):
+    """Open/High/Close arrays of a Bars container or an OHLC DataFrame."""
+    if isinstance(bars, Bars):
+        return bars.open, bars.high, bars.close
+    return bars[open_col].to_numpy(), bars[high_col].to_numpy(), bars[close_col].to_numpy()
 
-        if gap > 0.03:
-            return True
-          
-                  
 
-    except Exception as e:
-        print(f"Gap up check failed: {e}")
+def check_momentum_condition(merged, momentum_length=5, required_strong_candles=3):
+    """
+    Scans for at least N strong bullish candles within a sliding window of recent data.
+    """
+    return momentum_in_lookback(
+        *_prices(merged), momentum_length, required_strong_candles, body_pct=0.005, lookback=65
+    )
 
-    return False
 
+def check_gap_up_retest(data, merged=None, ema_percent=0.005):
+    """
+    Checks for a gap-up > 3% at the open of the latest session.
+    `data` is a Bars container or an OHLC DataFrame; the gap is read off its session index.
+    """
+    bars = data if isinstance(data, Bars) else Bars.from_frame(data)
+    gap = bars.session_gap()
+    return gap is not None and gap > 0.03
 
 
 def check_ema_slope_condition(merged, ema_percent=0.005):
     """
     Checks if EMA22 was rising steadily and the current price is near EMA22.
+    `merged` is a Bars container or a frame with Close and EMA22 columns.
     """
     try:
-        ema_past = merged["EMA22"].iloc[-60:-10].reset_index(drop=True)
-        if has_rising_streak(ema_past, streak_required=5, min_step=0.001):
-            latest_close = merged["Close"].iloc[-1]
-            latest_ema = merged["EMA22"].iloc[-1]
-            if abs(latest_close - latest_ema) / latest_ema < ema_percent:
+        if isinstance(merged, Bars):
+            ema, close = merged.ema(22), merged.close
+        else:
+            ema, close = merged["EMA22"].to_numpy(), merged["Close"].to_numpy()
+        if abs(close[-1] - ema[-1]) / ema[-1] < ema_percent:
+            if has_rising_streak(ema[-60:-10], streak_required=5, min_step=0.001):
                 return True
-    except:
+    except (KeyError, IndexError):
         pass
 
     return False
@@ -106,23 +127,78 @@ def check_momentum_condition_1min(
     Detects recent bullish momentum based on a sliding window.
     A strong candle = close > open + body% and close > prev high.
     """
-    for i in range(-85, -5):
-        window = df.iloc[i - momentum_length + 1 : i + 1]
-        if len(window) < momentum_length:
-            continue
-
-        strong_candles = 0
-        for j in range(momentum_length):
-            c = window[close_col].iloc[j]
-            o = window[open_col].iloc[j]
-            prev_high = window[high_col].iloc[j - 1] if j > 0 else o
+    return momentum_in_lookback(
+        *_prices(df, open_col, high_col, close_col),
+        momentum_length, required_strong_candles, body_pct=body_pct, lookback=85
+    )
 
-            if (c > o) and ((c - o) / o > body_pct) and (c > prev_high):
-                strong_candles += 1
-
-        if strong_candles >= required_strong_candles:
-            return True
-
-    return False
 
+# Bar-by-bar (walk-forward) versions: element t is what the check above returns
+# when given only the bars up to and including t.
 
+def momentum_signal(open_, high, close, momentum_length, required_strong_candles,
+                    body_pct=0.005, lookback=65, counts=None):
+    """
+    Vectorized momentum_in_lookback evaluated at every bar.
+    `counts` can pass in a precomputed strong_candle_counts result for the same length/body.
+    """
+    n = len(close)
+    if counts is None:
+        counts = strong_candle_counts(open_, high, close, momentum_length, body_pct)
+    hit = np.zeros(n + 1, dtype=np.int64)
+    hit[1:] = np.cumsum(counts >= required_strong_candles)
+
+    t = np.arange(n)
+    first_end = np.maximum(t + 1 - lookback, momentum_length - 1)
+    last_end = t - 5
+    ok = last_end >= first_end
+    lo = np.clip(first_end, 0, n)
+    hi = np.clip(last_end + 1, 0, n)
+    return ok & (hit[hi] - hit[lo] > 0)
+
+
+def gap_up_signal(timestamps, open_, close, min_gap=0.03):
+    """Vectorized check_gap_up_retest: the session of bar t opened > min_gap above the prior close."""
+    dates = np.asarray(pd.DatetimeIndex(timestamps).normalize().asi8)
+    n = len(dates)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    new_session = np.r_[True, dates[1:] != dates[:-1]]
+    session_start = np.maximum.accumulate(np.where(new_session, np.arange(n), 0))
+    open_ = np.asarray(open_, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_idx = session_start - 1
+    has_prev = prev_idx >= 0
+    y_close = close[np.maximum(prev_idx, 0)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = (open_[session_start] - y_close) / y_close
+    return has_prev & (gap > min_gap)
+
+
+def rising_streak_signal(ema, ema_percent_close, streak_required=5, min_step=0.001,
+                         start=60, stop=10):
+    """
+    Vectorized check_ema_slope_condition: a rising streak inside ema[t-start+1 : t-stop+1]
+    and the close at t within ema_percent of the EMA (`ema_percent_close` = that boolean).
+    """
+    ema = np.asarray(ema, dtype=np.float64)
+    n = len(ema)
+    step_ok = np.zeros(n, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        step_ok[1:] = (ema[1:] - ema[:-1]) / ema[:-1] >= min_step
+
+    # run length of consecutive qualifying steps ending at k
+    idx = np.arange(n)
+    last_break = np.maximum.accumulate(np.where(step_ok, -1, idx))
+    run = idx - last_break
+
+    long_run = np.zeros(n + 1, dtype=np.int64)
+    long_run[1:] = np.cumsum(run >= streak_required)
+    t = idx
+    window_start = np.maximum(t + 1 - start, 0)
+    lo = window_start + streak_required
+    hi = t + 1 - stop  # exclusive
+    ok = hi > lo
+    streak = ok & (long_run[np.clip(hi, 0, n)] - long_run[np.clip(lo, 0, n)] > 0)
+    return streak & ema_percent_close
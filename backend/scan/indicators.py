@@ -0,0 +1,210 @@
+"""
+indicators.py
+
+Indicator kernel shared by the chart export, the scans and the backtests: computes a
+requested set of indicators over contiguous bar arrays in one call.
+
+Names:
+    ema{span}    close EMA (adjust=False, as everywhere else in the scanners)
+    atr{n}       Wilder ATR of the true range (NaN for the first n-1 bars)
+    rsi{n}       Wilder RSI of close-to-close changes (NaN for the first n bars)
+    vwap         volume-weighted typical price, reset at every session start
+                 (the typical price itself while a session has no volume)
+
+Every recursive indicator is an exponential smoothing, so the kernel groups the series
+to smooth by smoothing constant and runs one pandas `ewm` pass per group over a 2-D
+block (e.g. atr14 + rsi14 smooth true range, gains and losses together). Intermediates
+(previous close, true range, typical price, session starts) are computed once per call.
+Arrays run along axis 0 and can be 1-D (one symbol's bars) or 2-D (a panel in bar
+space, one column per symbol, NaN past a symbol's last bar).
+
+`cached()` memoizes a symbol's results per (symbol, interval, first bar, last bar and
+its OHLCV) in a process-wide LRU bounded by INDICATOR_CACHE_MB (default 64), so within
+one process (the scan worker, the scheduler) a chart, a scan and a backtest over the
+same bars compute them once per new bar. `Bars.indicators()` goes through it when the
+bars know their symbol and interval.
+
+ Usage:
+    values = compute(bars, ["ema9", "ema22", "ema44", "atr14", "vwap", "rsi14"])
+    values = cached(bars, ["ema22", "atr14"], "INFY", "5m")
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MAX_BYTES = int(float(os.environ.get("INDICATOR_CACHE_MB", 64)) * 1024 * 1024)
+
+_NAME = re.compile(r"^(ema|atr|rsi)(\d+)$")
+
+
+@lru_cache(maxsize=None)
+def parse(name):
+    """'ema22' → ("ema", 22), 'vwap' → ("vwap", None). ValueError for anything else."""
+    if name == "vwap":
+        return "vwap", None
+    match = _NAME.match(name)
+    if match is None or int(match.group(2)) < 1:
+        raise ValueError(f"unknown indicator '{name}' (ema<n>, atr<n>, rsi<n> or vwap)")
+    return match.group(1), int(match.group(2))
+
+
+def kernel(open_, high, low, close, volume, day, names):
+    """{name: array} for `names` over OHLCV arrays and session days along axis 0."""
+    parsed = {name: parse(name) for name in dict.fromkeys(names)}
+    shared = {}
+
+    def once(key, compute):
+        if key not in shared:
+            shared[key] = compute()
+        return shared[key]
+
+    def prev_close():
+        return once("prev_close", lambda: np.concatenate([np.full_like(close[:1], np.nan), close[:-1]]))
+
+    def true_range():
+        return once("true_range", lambda: np.fmax(
+            high - low, np.fmax(np.abs(high - prev_close()), np.abs(low - prev_close()))))
+
+    def change():
+        return once("change", lambda: close - prev_close())
+
+    # ewm smoothing (span for EMAs, Wilder's alpha = 1/n otherwise) → {series name: values}
+    groups = {}
+    for name, (kind, n) in parsed.items():
+        if kind == "ema":
+            groups.setdefault(_ema_smoothing(n), {})["close"] = close
+        elif kind == "atr":
+            groups.setdefault(_wilder_smoothing(n), {})["true_range"] = true_range()
+        elif kind == "rsi":
+            group = groups.setdefault(_wilder_smoothing(n), {})
+            group["gain"] = np.clip(change(), 0, None)
+            group["loss"] = np.clip(-change(), 0, None)
+
+    smoothed = {}
+    for smoothing, parts in groups.items():
+        keys = list(parts)
+        if len(keys) == 1 and close.ndim == 1:  # a Series skips the DataFrame overhead
+            series = pd.Series(parts[keys[0]]).ewm(adjust=False, **dict(smoothing)).mean().to_numpy()
+            smoothed[smoothing, keys[0]] = series
+            continue
+        block = np.stack([parts[k] for k in keys], axis=-1).reshape(len(close), -1)
+        block = pd.DataFrame(block).ewm(adjust=False, **dict(smoothing)).mean().to_numpy()
+        for i, key in enumerate(keys):
+            smoothed[smoothing, key] = block[:, i::len(keys)].reshape(close.shape)
+
+    out = {}
+    for name, (kind, n) in parsed.items():
+        if kind == "ema":
+            out[name] = smoothed[_ema_smoothing(n), "close"]
+        elif kind == "atr":
+            out[name] = smoothed[_wilder_smoothing(n), "true_range"]
+        elif kind == "rsi":
+            gain, loss = smoothed[_wilder_smoothing(n), "gain"], smoothed[_wilder_smoothing(n), "loss"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[name] = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100 - 100 / (1 + gain / loss))
+            out[name][np.isnan(gain) | np.isnan(loss)] = np.nan
+        else:
+            out[name] = _vwap(high, low, close, volume, day)
+    return out
+
+
+def _ema_smoothing(span):
+    return ("span", span), ("min_periods", 0)
+
+
+def _wilder_smoothing(n):
+    return ("alpha", 1.0 / n), ("min_periods", n)
+
+
+def _vwap(high, low, close, volume, day):
+    typical = (high + low + close) / 3
+    volume = np.nan_to_num(volume)
+    rows = np.arange(len(close)).reshape((-1,) + (1,) * (close.ndim - 1))
+    new_session = np.ones(day.shape, dtype=bool)
+    new_session[1:] = day[1:] != day[:-1]
+    start = np.maximum.accumulate(np.where(new_session, rows, 0), axis=0)
+
+    def session_sum(x):
+        total = np.cumsum(np.nan_to_num(x), axis=0)
+        return total - np.take_along_axis(total - np.nan_to_num(x), start, axis=0)
+
+    traded = session_sum(volume)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = session_sum(typical * volume) / traded
+    return np.where(traded > 0, vwap, typical)
+
+
+def compute(bars, names):
+    """Indicators over a `bars.Bars` container."""
+    return kernel(bars.open, bars.high, bars.low, bars.close, bars.volume, bars.day, names)
+
+
+class IndicatorCache:
+    """LRU of {name: array} per bar-set key, bounded by the arrays' total size."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, names, compute_missing):
+        """{name: array} for `names`, computing only the ones not cached under `key`."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            missing = [n for n in names if entry is None or n not in entry]
+            self.stats["hits" if not missing else "misses"] += 1
+        if missing:
+            computed = compute_missing(missing)
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is None:
+                    entry = self.entries[key] = {}
+                for name, values in computed.items():
+                    if name not in entry:
+                        entry[name] = values
+                        self.bytes += values.nbytes
+                self._evict()
+            entry = dict(entry, **computed)
+        return {name: entry[name] for name in names}
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, dropped = self.entries.popitem(last=False)
+            self.bytes -= sum(v.nbytes for v in dropped.values())
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+_default_cache = IndicatorCache()
+
+
+def default_cache():
+    return _default_cache
+
+
+def cached(bars, names, symbol, interval, cache=None):
+    """
+    `compute` memoized per (symbol, interval, first bar, last bar and its OHLCV). A still
+    forming last bar changes its high, low or volume without moving the close, and each
+    of those feeds ATR / RSI / VWAP, so all of them are part of the key.
+    """
+    if not len(bars):
+        return compute(bars, names)
+    last = tuple(float(np.nan_to_num(f[-1], nan=-1.0))
+                 for f in (bars.open, bars.high, bars.low, bars.close, bars.volume))
+    key = (symbol, interval, len(bars), int(bars.time[0]), int(bars.time[-1])) + last
+    return (cache or _default_cache).get(key, names, lambda missing: compute(bars, missing))
@@ -0,0 +1,133 @@
+"""
+Shared MongoDB connection for the scan scripts.
+One client per process, created on first use.
+
+Also maintains `daily_stats`: per strategy and scan_date trade counts by status, refreshed
+by the scan sinks and backtests for the days they touch.
+
+ Usage:
+    python mongo.py rebuild-stats      # backfill daily_stats from scan_5m / scan_1m
+"""
+
+import os
+import sys
+from pymongo import MongoClient
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = "tradesmart"
+
+_client = None
+
+
+def get_db():
+    global _client
+    if _client is None:
+        _client = MongoClient(MONGO_URI)
+    return _client[DB_NAME]
+
+
+def get_collection(name):
+    return get_db()[name]
+
+
+_indexed = set()
+
+
+def ensure_indexes(collection):
+    """
+    Creates the indexes the scan/backtest queries rely on (once per process per collection):
+    - (symbol, scan_date, strategy) → the upsert key for scan results
+    - (strategy, status, backtest_next_try) → backtest pickup of open trades that are due
+    - (strategy, timestamp)         → /api/history/* and /api/summary week filters
+    - (strategy, scan_date)         → daily stats refresh and the weekly summary
+    """
+    if collection.name in _indexed:
+        return
+    collection.create_index([("symbol", 1), ("scan_date", 1), ("strategy", 1)])
+    collection.create_index([("strategy", 1), ("status", 1), ("backtest_next_try", 1)])
+    collection.create_index([("strategy", 1), ("timestamp", -1)])
+    collection.create_index([("strategy", 1), ("scan_date", 1)])
+    _indexed.add(collection.name)
+
+
+def flush_bulk(collection, ops, chunk_size=500):
+    """Sends queued write operations with unordered bulk_write in chunks. Returns round-trips."""
+    round_trips = 0
+    for i in range(0, len(ops), chunk_size):
+        collection.bulk_write(ops[i:i + chunk_size], ordered=False)
+        round_trips += 1
+    return round_trips
+
+
+# --- Materialized per-day stats ---
+
+DAILY_STATS = "daily_stats"
+STATUS_FIELDS = ["win", "loss", "no_hit", "no_data"]
+
+
+def status_counts_group(group_id):
+    """$group stage counting trades per status (anything else, incl. missing, is pending)."""
+    stage = {"_id": group_id, "total": {"$sum": 1}}
+    for status in STATUS_FIELDS:
+        stage[status] = {"$sum": {"$cond": [{"$eq": ["$status", status]}, 1, 0]}}
+    stage["pending"] = {"$sum": {"$cond": [{"$in": [{"$ifNull": ["$status", "pending"]}, STATUS_FIELDS]}, 0, 1]}}
+    return {"$group": stage}
+
+
+def refresh_daily_stats(collection, keys):
+    """
+    Recomputes the `daily_stats` rows (one per strategy and scan_date) for the given
+    (strategy, scan_date) pairs of a scan collection and upserts them with $merge, so
+    dashboards read one document per day instead of every trade.
+    """
+    dates = {}
+    for strategy, scan_date in keys:
+        dates.setdefault(strategy, set()).add(scan_date)
+    if not dates:
+        return
+
+    stats = get_collection(DAILY_STATS)
+    if DAILY_STATS not in _indexed:
+        stats.create_index([("strategy", 1), ("scan_date", 1)], unique=True)
+        stats.create_index([("collection", 1), ("scan_date", 1)])
+        _indexed.add(DAILY_STATS)
+
+    for strategy, days in dates.items():
+        # Days with no trades left (e.g. after the end-of-day delete) lose their row
+        remaining = collection.distinct("scan_date", {"strategy": strategy, "scan_date": {"$in": sorted(days)}})
+        gone = sorted(days - set(remaining))
+        if gone:
+            stats.delete_many({"strategy": strategy, "scan_date": {"$in": gone}})
+
+        collection.aggregate([
+            {"$match": {"strategy": strategy, "scan_date": {"$in": sorted(days)}}},
+            status_counts_group({"strategy": "$strategy", "scan_date": "$scan_date"}),
+            {"$project": {
+                "_id": 0,
+                "strategy": "$_id.strategy",
+                "scan_date": "$_id.scan_date",
+                "collection": {"$literal": collection.name},
+                "total": 1, **{f: 1 for f in STATUS_FIELDS}, "pending": 1,
+                "updated_at": "$$NOW",
+            }},
+            {"$merge": {"into": DAILY_STATS, "on": ["strategy", "scan_date"],
+                        "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ])
+
+
+def rebuild_daily_stats(collection_names=("scan_5m", "scan_1m")):
+    """Recomputes every daily_stats row from the scan collections (one-off backfill)."""
+    for name in collection_names:
+        collection = get_collection(name)
+        keys = {(k["strategy"], k["scan_date"])
+                for k in collection.aggregate([{"$group": {"_id": {"strategy": "$strategy", "scan_date": "$scan_date"}}},
+                                               {"$replaceWith": "$_id"}])}
+        refresh_daily_stats(collection, keys)
+        print(f"📊 {name}: daily stats rebuilt for {len(keys)} day(s)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-stats":
+        rebuild_daily_stats()
+    else:
+        print("Usage: python mongo.py rebuild-stats")
@@ -0,0 +1,211 @@
+"""
+ohlc_fetch.py
+
+Shared OHLC fetch layer for the scanners.
+
+Instead of one `yf.download` per ticker, symbols are split into multi-ticker batches
+that are downloaded by a bounded thread pool, retried with exponential backoff when the
+provider fails (not when it simply has no data for a symbol) and handed back to the
+caller as soon as each batch lands:
+
+    for symbol, data in fetch_many(symbols, interval="5m", period="60d"):
+        ...
+
+`data` is a flat OHLCV DataFrame (Open, High, Low, Close, Adj Close, Volume) indexed by
+timestamp, or an empty DataFrame when the provider had nothing for that symbol.
+
+Providers are pluggable: anything with a `download(symbols, interval, period=None,
+start=None, end=None)` method returning `{symbol: DataFrame}` works. `YahooProvider`
+talks to Yahoo Finance, `FixtureProvider` serves frames from memory or CSV files.
+
+Concurrency can be tuned per call or with the FETCH_BATCH_SIZE, FETCH_MAX_WORKERS,
+FETCH_RETRIES and FETCH_BACKOFF environment variables.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import run_report
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", 25))
+DEFAULT_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 4))
+DEFAULT_RETRIES = int(os.environ.get("FETCH_RETRIES", 2))
+DEFAULT_BACKOFF = float(os.environ.get("FETCH_BACKOFF", 1.0))
+
+
+def empty_frame():
+    return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+
+def _clean(frame):
+    """Flattens a single-symbol frame and drops rows with no prices."""
+    if frame is None or frame.empty:
+        return empty_frame()
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.droplevel(-1, axis=1) if frame.columns.nlevels > 1 else frame
+    frame = frame[[c for c in OHLCV_COLUMNS if c in frame.columns]]
+    return frame.dropna(how="all", subset=[c for c in PRICE_COLUMNS if c in frame.columns])
+
+
+class YahooProvider:
+    """
+    Yahoo Finance via yfinance multi-ticker downloads.
+    yfinance keeps per-call results in module-level state, so batches are serialized
+    with a lock and each batch uses yfinance's own `threads` pool for concurrency.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, suffix=".NS", threads=DEFAULT_MAX_WORKERS):
+        self.suffix = suffix
+        self.threads = threads
+
+    def download(self, symbols, interval, period=None, start=None, end=None):
+        import yfinance as yf
+
+        tickers = {symbol + self.suffix: symbol for symbol in symbols}
+        with self._lock:
+            data = yf.download(
+                tickers=list(tickers),
+                interval=interval,
+                period=period,
+                start=start,
+                end=end,
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+                threads=self.threads,
+            )
+
+        frames = {}
+        if data is None or data.empty:
+            if len(tickers) > 1:  # nothing for a whole batch is an outage, not delistings
+                raise RuntimeError("empty response for the whole batch")
+            return frames
+        for ticker, symbol in tickers.items():
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                frame = data[ticker]
+            else:
+                frame = data
+            frame = _clean(frame)
+            if not frame.empty:
+                frames[symbol] = frame
+        return frames
+
+
+class FixtureProvider:
+    """
+    Serves OHLC frames from a dict `{(symbol, interval): DataFrame}` or from CSV files
+    named `{SYMBOL}_{interval}.csv` in a directory. Useful as a stand-in for Yahoo.
+    """
+
+    def __init__(self, frames=None, directory=None):
+        self.frames = frames or {}
+        self.directory = directory
+        self.calls = 0
+
+    def download(self, symbols, interval, period=None, start=None, end=None):
+        self.calls += 1
+        frames = {}
+        for symbol in symbols:
+            frame = self.frames.get((symbol, interval))
+            if frame is None and self.directory:
+                path = os.path.join(self.directory, f"{symbol}_{interval}.csv")
+                if os.path.exists(path):
+                    frame = pd.read_csv(path, index_col=0, parse_dates=True)
+            if frame is None:
+                continue
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            if end is not None:
+                frame = frame[frame.index < pd.Timestamp(end)]
+            frame = _clean(frame)
+            if not frame.empty:
+                frames[symbol] = frame
+        return frames
+
+
+_default_provider = None
+
+
+def default_provider():
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = YahooProvider()
+    return _default_provider
+
+
+def download_with_retry(provider, symbols, interval, period=None, start=None, end=None,
+                        retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    Downloads one batch. A failed download (provider exception) and frames missing price
+    columns are retried with exponential backoff; symbols the provider simply has nothing
+    for (delisted, suspended) are not, so they cost no sleep.
+    Returns `{symbol: DataFrame}` for the symbols that succeeded.
+    """
+    pending = list(symbols)
+    frames = {}
+    empty = 0
+    for attempt in range(retries + 1):
+        if attempt:
+            run_report.count("download_retries")
+        try:
+            with run_report.stage("download"):
+                got = provider.download(pending, interval, period=period, start=start, end=end)
+        except Exception as e:
+            print(f"⚠️ Batch download failed ({len(pending)} symbols, attempt {attempt + 1}): {e}")
+            got = None
+        if got is not None:
+            broken = [s for s, f in got.items() if not set(PRICE_COLUMNS) <= set(f.columns)]
+            frames.update((s, f) for s, f in got.items() if s not in broken)
+            empty += sum(s not in got for s in pending)
+            pending = broken
+        if not pending or attempt == retries:
+            break
+        time.sleep(backoff * (2 ** attempt))
+    run_report.count("download_batches")
+    if empty:
+        run_report.count("download_empty", empty)
+    if pending:
+        run_report.count("download_missing", len(pending))
+    return frames
+
+
+def fetch_many(symbols, interval, period=None, start=None, end=None, provider=None,
+               batch_size=DEFAULT_BATCH_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+               retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """
+    Yields `(symbol, DataFrame)` for every symbol, batch by batch as downloads complete.
+    Symbols with no data are yielded with an empty frame so callers can log and skip them.
+    """
+    provider = provider or default_provider()
+    symbols = list(dict.fromkeys(symbols))
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(run_report.bind(download_with_retry), provider, batch, interval, period, start, end,
+                        retries, backoff): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            frames = future.result()
+            for symbol in futures[future]:
+                yield symbol, frames.get(symbol, empty_frame())
+
+
+def fetch_one(symbol, interval, period=None, start=None, end=None, provider=None,
+              retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Single-symbol convenience wrapper around `download_with_retry`."""
+    provider = provider or default_provider()
+    frames = download_with_retry(provider, [symbol], interval, period, start, end, retries, backoff)
+    return frames.get(symbol, empty_frame())
@@ -0,0 +1,227 @@
+"""
+panel.py
+
+Cross-sectional panel: a whole universe's bars as aligned 2-D arrays (time × symbol),
+one per OHLCV field, with a `valid` mask instead of dropped or filled rows, so missing
+bars and symbols listed later than the rest simply show up as masked cells.
+
+Indicators are computed for every symbol at once:
+- indicators(names)                      any set of indicators.py names (EMA, ATR, VWAP, RSI)
+                                         through the shared kernel
+- ema(span)                              EMA over each symbol's own bars (gaps skipped)
+- ema_distance(span, relative_to)        |close - EMA| / close (or / EMA)
+- session_gap()                          gap of each bar's session: its first open vs the
+                                         symbol's previous session close
+- strong_candle_counts(length, body_pct) strong bullish candles in each symbol's last
+                                         `length` bars (see helpers.strong_candle_counts)
+
+Rolling and recursive indicators run in "bar space": every column restacked so the
+symbol's valid bars come first, in time order (row k = its k-th bar). A window of N bars
+is then a plain row range, exactly as in the per-symbol helpers; `to_time` scatters the
+result back onto the time axis (NaN where masked).
+
+`screen(strategy)` evaluates a strategy at every symbol's latest bar through the panel
+twins of its conditions (strategies.PANEL_CONDITIONS); `run_strategies(engine="panel")`
+uses it.
+
+ Usage:
+    panel = Panel.from_frames(frames).trim(120)          # [(symbol, DataFrame)], last 120 days
+    ema = panel.to_time(panel.ema(44))                   # time × symbol EMA44
+    matched = panel.screen(DAILY_44EMA)                  # bool per symbol
+"""
+
+import numpy as np
+import pandas as pd
+
+import indicators
+from bars import Bars, NS_PER_DAY, local_days
+
+
+class Panel:
+    def __init__(self, symbols, time, open_, high, low, close, volume, valid, tz=None, index_name=None):
+        self.symbols = list(symbols)
+        self.time = time                  # (T,) int64 UTC epoch-ns, union of every symbol's bars
+        self.open, self.high, self.low, self.close, self.volume = open_, high, low, close, volume
+        self.valid = valid                # (T, S) bool
+        self.tz = tz
+        self.index_name = index_name
+        self.counts = valid.sum(axis=0)   # bars per symbol
+        self.order = np.argsort(~valid, axis=0, kind="stable")  # bar space → time rows
+        self._cache = {}
+
+    # --- building ---
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Panel from [(symbol, DataFrame or Bars)] on a common (UTC) time axis."""
+        frames = [(s, d if isinstance(d, Bars) else Bars.from_frame(d)) for s, d in frames]
+        tz = next((b.tz for _, b in frames if len(b)), None)
+        name = next((b.index_name for _, b in frames if len(b)), None)
+        time = np.unique(np.concatenate([b.time for _, b in frames])) if frames else np.zeros(0, np.int64)
+        shape = (len(time), len(frames))
+        fields = [np.full(shape, np.nan) for _ in range(5)]
+        valid = np.zeros(shape, dtype=bool)
+        for col, (_, bars) in enumerate(frames):
+            rows = np.searchsorted(time, bars.time)
+            for field, values in zip(fields, (bars.open, bars.high, bars.low, bars.close, bars.volume)):
+                field[rows, col] = values
+            valid[rows, col] = True
+        return cls([s for s, _ in frames], time, *fields, valid, tz, name)
+
+    def trim(self, days):
+        """Masks every symbol's bars older than `days` before its own latest bar."""
+        if days == float("inf") or not len(self.time):
+            return self
+        last = self.time[np.maximum(self.latest_row(), 0)]
+        keep = self.valid & (self.time[:, None] > (last - int(days * NS_PER_DAY))[None, :])
+        fields = [np.where(keep, f, np.nan) for f in (self.open, self.high, self.low, self.close, self.volume)]
+        return Panel(self.symbols, self.time, *fields, keep, self.tz, self.index_name)
+
+    # --- layout ---
+
+    def bar_space(self, x):
+        """(T, S) time-aligned array → bar space (rows past a symbol's bar count are junk)."""
+        return np.take_along_axis(x, self.order, axis=0)
+
+    def to_time(self, x, fill=np.nan):
+        """Bar-space array → time-aligned array, `fill` where masked."""
+        out = np.empty(x.shape, dtype=np.result_type(x, type(fill)))
+        np.put_along_axis(out, self.order, x, axis=0)
+        out[~self.valid] = fill
+        return out
+
+    def latest_row(self):
+        """Time row of each symbol's latest bar (-1 without bars)."""
+        return np.where(self.counts > 0, self.order[np.maximum(self.counts - 1, 0), np.arange(len(self.symbols))], -1)
+
+    def latest(self, x, ago=0):
+        """Value of a bar-space array `ago` bars before each symbol's latest bar (NaN if none)."""
+        if not len(x):
+            return np.full(len(self.symbols), np.nan)
+        values = x[np.maximum(self.counts - 1 - ago, 0), np.arange(len(self.symbols))].astype(np.float64)
+        return np.where(self.counts > ago, values, np.nan)
+
+    def latest_mean(self, x, n):
+        """Mean of a bar-space array over each symbol's last `n` bars (fewer if it has fewer)."""
+        csum = np.zeros((len(x) + 1, len(self.symbols)))
+        csum[1:] = np.cumsum(np.where(self._in_bars(), x, 0.0), axis=0)
+        cols = np.arange(len(self.symbols))
+        start = np.maximum(self.counts - n, 0)
+        with np.errstate(invalid="ignore"):
+            return (csum[self.counts, cols] - csum[start, cols]) / (self.counts - start)
+
+    def timestamp(self, col):
+        ts = pd.Timestamp(int(self.time[self.latest_row()[col]]), unit="ns", tz="UTC")
+        return ts.tz_convert(self.tz) if self.tz is not None else ts.tz_localize(None)
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def bar(self, field):
+        """A field (open, high, low, close, volume) in bar space."""
+        return self._memo(("bar", field), lambda: self.bar_space(getattr(self, field)))
+
+    def _in_bars(self):
+        """(T, S) bool: row k holds one of the symbol's bars."""
+        return self._memo("in_bars", lambda: np.arange(len(self.time))[:, None] < self.counts[None, :])
+
+    # --- indicators (bar space) ---
+
+    def day(self):
+        """Local session day of every bar, in bar space."""
+        return self._memo("day", lambda: local_days(self.time, self.tz)[self.order])
+
+    def indicators(self, names):
+        """{name: bar-space array} from the indicator kernel (see indicators.py)."""
+        missing = [n for n in names if ("ind", n) not in self._cache]
+        if missing:
+            computed = indicators.kernel(self.bar("open"), self.bar("high"), self.bar("low"), self.bar("close"),
+                                         self.bar("volume"), self.day(), missing)
+            self._cache.update({("ind", n): values for n, values in computed.items()})
+        return {n: self._cache[("ind", n)] for n in names}
+
+    def ema(self, span):
+        """Close EMA per symbol (adjust=False, as pandas `ewm(span).mean()` on its own bars)."""
+        return self.indicators([f"ema{span}"])[f"ema{span}"]
+
+    def ema_distance(self, span, relative_to="close"):
+        close, ema = self.bar("close"), self.ema(span)
+        return np.abs(close - ema) / (close if relative_to == "close" else ema)
+
+    def session_gap(self):
+        """Gap of the session each bar belongs to (NaN for a symbol's first session)."""
+        def compute():
+            n = len(self.time)
+            day = self.day()
+            rows = np.arange(n)[:, None]
+            new_session = np.ones(day.shape, dtype=bool)
+            new_session[1:] = day[1:] != day[:-1]
+            open_, close = self.bar("open"), self.bar("close")
+            prev_close = np.full(close.shape, np.nan)
+            prev_close[1:] = close[:-1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                gap = np.where(new_session & (rows > 0), (open_ - prev_close) / prev_close, np.nan)
+            start = np.maximum.accumulate(np.where(new_session, rows, 0), axis=0)
+            return np.take_along_axis(gap, start, axis=0)
+        return self._memo("session_gap", compute)
+
+    def strong_candle_counts(self, length=5, body_pct=0.005):
+        """Strong bullish candles in the window of `length` bars ending at each bar."""
+        def compute():
+            o, h, c = self.bar("open"), self.bar("high"), self.bar("close")
+            counts = np.zeros(c.shape, dtype=np.int64)
+            if len(c) < length:
+                return counts
+            with np.errstate(divide="ignore", invalid="ignore"):
+                first_ok = (c > o) & ((c - o) / o > body_pct)
+            strong = first_ok.copy()
+            strong[1:] &= c[1:] > h[:-1]
+            strong[0] = False
+            csum = np.cumsum(strong, axis=0)
+            counts[length - 1:] = csum[length - 1:] - csum[:len(c) - length + 1] + first_ok[:len(c) - length + 1]
+            return counts
+        return self._memo(("strong", length, body_pct), compute)
+
+    # --- screens at each symbol's latest bar ---
+
+    def momentum_in_lookback(self, length, required, body_pct, lookback):
+        """helpers.momentum_in_lookback for every symbol at once."""
+        hit = (self.strong_candle_counts(length, body_pct) >= required) & self._in_bars()
+        csum = np.zeros((len(hit) + 1, hit.shape[1]), dtype=np.int64)
+        csum[1:] = np.cumsum(hit, axis=0)
+        first_end = np.maximum(self.counts - lookback, length - 1)
+        last_end = self.counts - 6
+        cols = np.arange(len(self.symbols))
+        total = csum[np.clip(last_end + 1, 0, len(hit)), cols] - csum[np.clip(first_end, 0, len(hit)), cols]
+        return (last_end >= first_end) & (total > 0)
+
+    def rising_streak(self, span=22, streak_required=5, min_step=0.001, start=60, stop=10):
+        """
+        helpers.has_rising_streak over ema[-start:-stop] of every symbol: `streak_required`
+        consecutive steps of at least `min_step` inside that window.
+        """
+        ema = self.ema(span)
+        rows = np.arange(len(ema))[:, None]
+        step_ok = np.zeros(ema.shape, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step_ok[1:] = (ema[1:] - ema[:-1]) / ema[:-1] >= min_step
+        last_break = np.maximum.accumulate(np.where(step_ok, -1, rows), axis=0)
+        long_run = np.zeros((len(ema) + 1, ema.shape[1]), dtype=np.int64)
+        long_run[1:] = np.cumsum((rows - last_break) >= streak_required, axis=0)
+        lo = np.maximum(self.counts - start, 0) + streak_required
+        hi = np.maximum(self.counts - stop, 0)  # exclusive
+        cols = np.arange(len(self.symbols))
+        found = long_run[np.clip(hi, 0, len(ema)), cols] - long_run[np.clip(lo, 0, len(ema)), cols] > 0
+        return (hi > lo) & found
+
+    def screen(self, strategy):
+        """Bool per symbol: does `strategy` match at the symbol's latest bar."""
+        from strategies import PANEL_CONDITIONS
+
+        ema = self.ema(strategy.ema_span)
+        matched = np.zeros(len(self.symbols), dtype=bool)
+        for cond in strategy.conditions:
+            matched |= PANEL_CONDITIONS[cond](self, ema, strategy.params)
+        return matched & (self.counts >= strategy.min_bars)
@@ -0,0 +1,97 @@
+"""
+prefilter.py
+
+Cheap first stage for the intraday scans: prunes a universe on daily bars before the
+expensive intraday download and evaluation. Daily bars come from the bar store (a top-up
+there is one small request per batch, and its latest bar is today's forming bar, i.e.
+the latest quote) and are screened for every symbol at once on a panel (see panel.py):
+
+- gap        today's open more than `min_gap` above yesterday's close (as in check_gap_up_retest)
+- trend      close above its daily EMA, and the EMA higher than `trend_days` sessions ago
+- liquidity  average volume of the last `volume_days` sessions at least `min_volume`
+
+A symbol survives when it is liquid and shows a gap or a trend; with `max_symbols` only
+the most traded survivors (average close × volume) are kept. Symbols without daily bars
+are kept, as there is nothing to judge them on.
+
+This is a heuristic, not an exact bound: a pruned symbol could still have matched on
+its intraday bars (e.g. intraday momentum with no gap and no daily trend). It is off by
+default; strategies opt in with `Strategy.prefilter` and runs with
+`run_strategies(prefilter=True)` / SCAN_PREFILTER=1 / `--prefilter`.
+
+ Usage:
+    panel = load_daily(symbols, store, "120d")
+    kept, pruned = prune(symbols, panel, Prefilter())     # pruned = {reason: [symbols]}
+    python scan_engine.py 5m 1m --prefilter
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from bar_store import period_days
+from panel import Panel
+
+
+@dataclass(frozen=True)
+class Prefilter:
+    period: str = "120d"          # daily history to load
+    min_gap: float = 0.03
+    trend_span: int = 20
+    trend_days: int = 5
+    volume_days: int = 20
+    min_volume: float = 100_000
+    max_symbols: Optional[int] = None
+
+
+def load_daily(symbols, store, period):
+    """Panel of the symbols' daily bars (symbols without any are left out)."""
+    frames = [(symbol, data) for symbol, data in store.load_many(symbols, "1d", period)
+              if not data.empty and "Close" in data.columns]
+    return Panel.from_frames(frames)
+
+
+def screen(panel, spec):
+    """{"gap", "trend", "liquid", "turnover"}: one array per criterion, a value per symbol."""
+    panel = panel.trim(period_days(spec.period))
+    close, volume = panel.bar("close"), panel.bar("volume")
+    ema = panel.ema(spec.trend_span)
+    with np.errstate(invalid="ignore"):
+        gap = panel.latest(panel.session_gap()) > spec.min_gap
+        trend = (panel.latest(close) > panel.latest(ema)) & \
+            (panel.latest(ema) > panel.latest(ema, ago=spec.trend_days))
+        liquid = panel.latest_mean(volume, spec.volume_days) >= spec.min_volume
+    return {
+        "gap": gap,
+        "trend": trend,
+        "liquid": liquid,
+        "turnover": np.nan_to_num(panel.latest_mean(close * volume, spec.volume_days)),
+    }
+
+
+def prune(symbols, panel, spec):
+    """
+    Splits `symbols` by `spec`. Returns (kept symbols in their original order,
+    {reason: [pruned symbols]}) with reasons "illiquid", "no_setup" and "ranked_out".
+    """
+    found = screen(panel, spec)
+    column = {symbol: i for i, symbol in enumerate(panel.symbols)}
+    passed, pruned = [], {"illiquid": [], "no_setup": [], "ranked_out": []}
+    for symbol in symbols:
+        i = column.get(symbol)
+        if i is None:
+            passed.append(symbol)
+        elif not found["liquid"][i]:
+            pruned["illiquid"].append(symbol)
+        elif not (found["gap"][i] or found["trend"][i]):
+            pruned["no_setup"].append(symbol)
+        else:
+            passed.append(symbol)
+
+    if spec.max_symbols is not None and len(passed) > spec.max_symbols:
+        turnover = {s: found["turnover"][column[s]] if s in column else np.inf for s in passed}
+        ranked = set(sorted(passed, key=lambda s: -turnover[s])[:spec.max_symbols])
+        pruned["ranked_out"] = [s for s in passed if s not in ranked]
+        passed = [s for s in passed if s in ranked]
+    return passed, pruned
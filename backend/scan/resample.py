@@ -0,0 +1,102 @@
+"""
+resample.py
+
+Builds coarser intraday bars (5m, 15m, 30m, 1h) from 1m bars, aligned to the NSE
+session (09:15–15:30 IST) the same way Yahoo stamps its own intraday bars: buckets start
+at 09:15 and every `step` minutes after, the last one is cut at 15:30, and each bar is
+stamped with its bucket start.
+
+Every output bar carries two flags:
+- `Partial`: built from fewer 1m bars than the minutes its bucket spans (e.g. a minute
+  with no trades, or a store that starts mid-bucket)
+- `Forming`: its bucket has not closed yet at `now`, i.e. the current still-forming bar
+
+`BarStore.load_many` uses this to top up warm 5m symbols from the 1m bars it has just
+stored instead of asking the provider a second time.
+
+ Usage:
+    python resample.py check INFY          # resampled 1m vs stored 5m bars for INFY
+    python resample.py check INFY 15m
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+IST = "Asia/Kolkata"
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=15)
+SESSION_CLOSE = pd.Timedelta(hours=15, minutes=30)
+INTERVAL_MINUTES = {"5m": 5, "15m": 15, "30m": 30, "1h": 60}
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def resample(bars, interval="5m", now=None):
+    """
+    1m OHLCV bars → `interval` bars with `Partial` and `Forming` columns.
+    Bars outside the session are dropped. The index keeps the input's timezone.
+    """
+    step = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+    if bars.empty:
+        return pd.DataFrame(columns=OHLCV + ["Partial", "Forming"], index=bars.index[:0])
+
+    index = pd.DatetimeIndex(bars.index)
+    naive = index.tz is None
+    local = (index.tz_localize("UTC") if naive else index).tz_convert(IST)
+    day = local.normalize()
+    since_open = local - (day + SESSION_OPEN)
+    in_session = (since_open >= pd.Timedelta(0)) & (since_open < SESSION_CLOSE - SESSION_OPEN)
+
+    bars = bars.loc[in_session, OHLCV]
+    day, since_open = day[in_session], since_open[in_session]
+    bucket = day + SESSION_OPEN + (since_open // step) * step
+
+    grouped = bars.groupby(bucket)
+    out = grouped.agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+    starts = pd.DatetimeIndex(out.index)
+    ends = np.minimum(starts + step, starts.normalize() + SESSION_CLOSE)
+    expected = (ends - starts) // pd.Timedelta(minutes=1)
+
+    now = pd.Timestamp.now(tz=IST) if now is None else pd.Timestamp(now)
+    if now.tz is None:
+        now = now.tz_localize(IST)
+    out["Partial"] = grouped.size().to_numpy() < np.asarray(expected)
+    out["Forming"] = np.asarray(ends > now)
+
+    out.index = starts.tz_convert("UTC").tz_localize(None) if naive else starts.tz_convert(index.tz)
+    out.index.name = bars.index.name
+    return out
+
+
+def check(symbol, interval="5m", store=None):
+    """
+    Compares 1m bars resampled to `interval` with the provider's own `interval` bars in the
+    bar store over the range both cover. Returns (bars compared, OHLC mismatches, volume
+    mismatches beyond 1%).
+    """
+    from bar_store import default_store
+
+    store = store or default_store()
+    base, provider = store.read(symbol, "1m"), store.read(symbol, interval)
+    if base.empty or provider.empty:
+        return 0, 0, 0
+    derived = resample(base, interval)
+    derived = derived[~derived["Forming"]]
+    common = derived.index.intersection(provider.index)
+    ours, theirs = derived.loc[common], provider.loc[common]
+
+    ohlc = ["Open", "High", "Low", "Close"]
+    ohlc_bad = ~np.isclose(ours[ohlc].to_numpy(float), theirs[ohlc].to_numpy(float), rtol=1e-5).all(axis=1)
+    volume_bad = ~np.isclose(ours["Volume"].to_numpy(float), theirs["Volume"].to_numpy(float), rtol=0.01)
+    return len(common), int(ohlc_bad.sum()), int(volume_bad.sum())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "check":
+        interval = sys.argv[3] if len(sys.argv) > 3 else "5m"
+        compared, ohlc_bad, volume_bad = check(sys.argv[2].strip().upper(), interval)
+        mark = "✅" if compared and ohlc_bad == 0 else "❌"
+        print(f"{mark} {compared} {interval} bar(s) compared: {ohlc_bad} OHLC mismatch(es), "
+              f"{volume_bad} volume mismatch(es) > 1%")
+    else:
+        print("Usage: python resample.py check SYMBOL [INTERVAL]")
@@ -0,0 +1,83 @@
+"""
+Output sinks for scan results.
+
+A sink receives one document per matched symbol through `add(doc)` and is
+`flush()`ed once the run is over.
+- MongoSink → queues upserts and bulk-writes them into a scan collection (scan_5m / scan_1m),
+              then refreshes the daily_stats rows of the days it touched
+- JsonSink  → writes the list of matches to a JSON file (results_44_daily.json)
+"""
+
+import json
+
+from pymongo import UpdateOne
+
+from mongo import get_collection, ensure_indexes, flush_bulk, refresh_daily_stats
+from trade_resolver import OPEN_STATUSES, BACKTEST_FIELDS
+import run_report
+
+
+class MongoSink:
+    """
+    Upserts keyed on (symbol, scan_date, strategy), sent with one bulk_write on flush.
+    The update is a pipeline so an already-evaluated status (win/loss/...) is kept
+    without reading the document first; new documents start as "pending". An open trade
+    matched again with a different entry (timestamp or close) is a new trade: its
+    backtest progress (cursor, excursions, retries, done flag) is cleared and it goes
+    back to "pending", so the backtest evaluates it from the new entry.
+    """
+
+    def __init__(self, collection_name):
+        self.collection_name = collection_name
+        self.ops = []
+        self.days = set()  # (strategy, scan_date) pairs whose daily stats need a refresh
+
+    def add(self, doc):
+        key = {
+            "symbol": doc["symbol"],
+            "scan_date": doc["scan_date"],
+            "strategy": doc["strategy"],
+        }
+        # every expression sees the stored document, before this $set applies
+        status = {"$ifNull": ["$status", "pending"]}
+        new_entry = {"$and": [
+            {"$in": [status, OPEN_STATUSES]},
+            {"$or": [{"$ne": ["$timestamp", {"$literal": doc["timestamp"]}]},
+                     {"$ne": ["$close", {"$literal": doc["close"]}]}]},
+        ]}
+        fields = {k: {"$literal": v} for k, v in doc.items() if k != "status"}
+        fields["status"] = {"$cond": [new_entry, "pending", status]}  # preserve evaluated status
+        for name in BACKTEST_FIELDS:
+            fields[name] = {"$cond": [new_entry, "$$REMOVE", f"${name}"]}
+        self.ops.append(UpdateOne(key, [{"$set": fields}], upsert=True))
+        self.days.add((doc["strategy"], doc["scan_date"]))
+        print(f"✅ {doc['symbol']} → queued for DB")
+
+    def flush(self):
+        if not self.ops:
+            return
+        collection = get_collection(self.collection_name)
+        ensure_indexes(collection)
+        with run_report.stage("mongo_write"):
+            round_trips = flush_bulk(collection, self.ops)
+        run_report.count("mongo_round_trips", round_trips)
+        with run_report.stage("daily_stats"):
+            refresh_daily_stats(collection, self.days)
+        print(f"💾 {len(self.ops)} result(s) written to {self.collection_name} in {round_trips} round-trip(s)")
+        self.ops = []
+        self.days = set()
+
+
+class JsonSink:
+    def __init__(self, path):
+        self.path = path
+        self.docs = []
+
+    def add(self, doc):
+        self.docs.append(doc)
+        print(f"✅ {doc['symbol']} matched | Close: {doc['close']}")
+
+    def flush(self):
+        with open(self.path, "w") as f:
+            json.dump(self.docs, f, indent=2)
+        self.docs = []
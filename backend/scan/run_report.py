@@ -0,0 +1,265 @@
+"""
+run_report.py
+
+Structured timing for scan and backtest runs.
+
+A `RunReport` is opened around a run and collects:
+- per-stage wall and CPU time plus call counts (`stage("download")`, `stage("ema")`, ...);
+  stages run in worker threads (downloads) are summed, so they can add up to more than
+  the run's wall time
+- per-symbol latency (p50/p90/p99/max, a millisecond histogram and the slowest symbols)
+- counters such as symbols matched / skipped / errored
+- free-form sections a stage reports on itself (e.g. what the prefilter pruned)
+
+On exit it is written as JSON to `store/reports/{run}-{timestamp}-{pid}-{n}.json`
+(SCAN_REPORT_DIR); only the newest SCAN_REPORT_KEEP reports (default 200) of each run
+are kept.
+With `profile=True` (or SCAN_PROFILE=1) the run's thread is also profiled with cProfile and
+the stats are saved next to it as `.prof` (open with `python -m pstats` or snakeviz).
+
+Instrumented code calls the module-level `stage()` / `count()`, which do nothing when no
+report is active in the current thread; `bind(fn)` carries the active report into a
+worker thread.
+
+ Usage:
+    with RunReport("scan_5m", meta={"strategies": ["5m"]}) as report:
+        with report.symbol("INFY"):
+            with stage("ema"):
+                ...
+        count("matched")
+"""
+
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+REPORT_DIR = os.environ.get(
+    "SCAN_REPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "store", "reports")
+)
+PROFILE_DEFAULT = os.environ.get("SCAN_PROFILE", "0") == "1"
+REPORT_KEEP = int(os.environ.get("SCAN_REPORT_KEEP", 200))
+HISTOGRAM_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+SLOWEST = 10
+
+_local = threading.local()
+_saved = itertools.count(1)  # per-process suffix: same-second runs never share a file name
+
+
+def current():
+    """The report active in this thread, if any."""
+    return getattr(_local, "report", None)
+
+
+@contextmanager
+def stage(name):
+    report = current()
+    if report is None:
+        yield
+        return
+    with report.stage(name):
+        yield
+
+
+def count(key, n=1):
+    report = current()
+    if report is not None:
+        report.count(key, n)
+
+
+def bind(fn):
+    """Wraps `fn` so it runs with the caller's active report (for thread pools)."""
+    report = current()
+    if report is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        previous = current()
+        _local.report = report
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.report = previous
+
+    return bound
+
+
+class RunReport:
+    def __init__(self, run, meta=None, profile=None, report_dir=REPORT_DIR, keep=REPORT_KEEP):
+        self.run = run
+        self.meta = meta or {}
+        self.profile = PROFILE_DEFAULT if profile is None else profile
+        self.report_dir = report_dir
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counts = {}
+        self.latencies = {}
+        self.sections = {}
+        self.path = None
+        self._profiler = None
+        self._previous = None
+
+    # --- collection ---
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            with self.lock:
+                entry = self.stages.setdefault(name, [0.0, 0.0, 0])
+                entry[0] += wall
+                entry[1] += cpu
+                entry[2] += 1
+
+    @contextmanager
+    def symbol(self, symbol):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency(symbol, time.perf_counter() - started)
+
+    def latency(self, symbol, seconds):
+        """Adds `seconds` to a symbol's latency (for time measured elsewhere, e.g. a worker)."""
+        with self.lock:
+            self.latencies[symbol] = self.latencies.get(symbol, 0.0) + seconds
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def section(self, name, data):
+        """Attaches a JSON-serializable summary under `sections[name]`."""
+        with self.lock:
+            self.sections[name] = data
+
+    def timed_iter(self, iterable, name):
+        """Iterates `iterable`, charging the time spent waiting on it to stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    # --- lifecycle ---
+
+    def start(self):
+        """Activates the report in this thread (same as entering the `with` block)."""
+        self.started_at = datetime.now()
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+        self._previous = current()
+        _local.report = self
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def finish(self, exc=None):
+        """Stops timing, saves the report and deactivates it. Returns the report path."""
+        if self._profiler is not None:
+            self._profiler.disable()
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = time.process_time() - self._cpu
+        self.error = repr(exc) if exc is not None else None
+        _local.report = self._previous
+        try:
+            self.save()
+            print(f"📊 Run report ({self.wall:.2f}s): {self.path}")
+        except OSError as e:
+            print(f"⚠️ Could not save run report: {e}")
+        return self.path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    # --- output ---
+
+    def latency_summary(self):
+        if not self.latencies:
+            return {"symbols": 0}
+        ms = np.array(list(self.latencies.values())) * 1000
+        edges = HISTOGRAM_MS + [np.inf]
+        counts, _ = np.histogram(ms, bins=[0] + edges)
+        slowest = sorted(self.latencies.items(), key=lambda kv: -kv[1])[:SLOWEST]
+        return {
+            "symbols": len(ms),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p90_ms": round(float(np.percentile(ms, 90)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "histogram_ms": {f"<{e}" if np.isfinite(e) else f">={HISTOGRAM_MS[-1]}": int(c)
+                             for e, c in zip(edges, counts)},
+            "slowest": [{"symbol": s, "ms": round(t * 1000, 3)} for s, t in slowest],
+        }
+
+    def to_dict(self):
+        return {
+            "run": self.run,
+            "meta": self.meta,
+            "started_at": self.started_at.isoformat(),
+            "wall_s": round(self.wall, 4),
+            "cpu_s": round(self.cpu, 4),
+            "error": self.error,
+            "stages": {
+                name: {"wall_s": round(w, 4), "cpu_s": round(c, 4), "calls": n}
+                for name, (w, c, n) in sorted(self.stages.items(), key=lambda kv: -kv[1][0])
+            },
+            "counts": dict(sorted(self.counts.items())),
+            "latency": self.latency_summary(),
+            "sections": self.sections,
+        }
+
+    def save(self):
+        os.makedirs(self.report_dir, exist_ok=True)
+        stamp = f"{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}-{next(_saved)}"
+        base = os.path.join(self.report_dir, f"{self.run}-{stamp}")
+        report = self.to_dict()
+        if self._profiler is not None:
+            self._profiler.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(25)
+            report["profile"] = {"path": base + ".prof", "top": out.getvalue().splitlines()[:60]}
+        self.path = base + ".json"
+        with open(self.path, "w") as f:
+            json.dump(report, f, indent=2)
+        self.prune()
+        return self.path
+
+    def prune(self):
+        """Deletes all but the newest `keep` reports (and their .prof) of this run."""
+        if self.keep is None:
+            return
+        prefix = f"{self.run}-"
+        reports = sorted(
+            (e for e in os.scandir(self.report_dir)
+             # "{run}-{timestamp}...": not the reports of a run named "{run}-something"
+             if e.name.startswith(prefix) and e.name[len(prefix):][:1].isdigit()
+             and e.name.endswith(".json")),
+            key=lambda e: (e.stat().st_mtime, e.name), reverse=True,
+        )
+        for entry in reports[self.keep:]:
+            base = entry.path[:-len(".json")]
+            for path in (entry.path, base + ".prof"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # pruned concurrently by another run
@@ -0,0 +1,457 @@
+"""
+scan_engine.py
+
+Runs one or more strategies (see `strategies.py`) in a single process over one shared
+data load. Strategies on the same interval share the bar download and every indicator
+computed for a symbol, so the 5m, 1m and daily scans no longer need separate processes.
+
+ Usage:
+    python scan_engine.py 5m 1m        # intraday momentum scans
+    python scan_engine.py daily        # 44 EMA daily scan
+    python scan_engine.py              # everything
+    python scan_engine.py 5m --universe "futures&finserv"
+    python scan_engine.py 5m 1m --profile    # + cProfile dump next to the run report
+    python scan_engine.py 1m --universe EQUITY_L --workers 8    # evaluate on 8 processes
+    python scan_engine.py daily --engine panel                   # whole universe as one panel
+    python scan_engine.py 5m 1m --prefilter     # prune on daily bars before the intraday load
+"""
+
+import argparse
+import dataclasses
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bar_store import default_store, period_days
+from bars import Bars
+from panel import Panel
+from prefilter import load_daily, prune
+from strategies import STRATEGIES
+from universes import default_registry
+from run_report import RunReport
+import run_report
+
+DEFAULT_UNIVERSE = "Nifty 500"
+DEFAULT_WORKERS = int(os.environ.get("SCAN_WORKERS", 1))
+ENGINES = ("symbol", "panel")
+DEFAULT_ENGINE = os.environ.get("SCAN_ENGINE", "symbol")
+DEFAULT_PREFILTER = os.environ.get("SCAN_PREFILTER", "0") == "1"
+BATCH_SYMBOLS = int(os.environ.get("SCAN_BATCH_SYMBOLS", 64))
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def load_symbols(universe=DEFAULT_UNIVERSE):
+    """Symbols of a universe expression (see universes.py) or of a CSV with a SYMBOL column."""
+    if universe.lower().endswith(".csv") and os.path.exists(universe):
+        df = pd.read_csv(universe)
+        return list(df["SYMBOL"].dropna().unique())
+    return default_registry().select(universe)
+
+
+class SymbolContext:
+    """
+    Bars for one symbol as a `Bars` container; trimmed views per period and their EMAs
+    are built once and shared by every strategy.
+    """
+
+    def __init__(self, symbol, data, interval=None):
+        self.symbol = symbol
+        self.data = data if isinstance(data, Bars) else Bars.from_frame(data)
+        if interval is not None:
+            self.data.key = (symbol, interval)
+        self._bars = {}
+
+    def bars(self, period):
+        if period not in self._bars:
+            self._bars[period] = self.data.trim(period_days(period))
+        return self._bars[period]
+
+    def ema(self, span, period):
+        return self.bars(period).ema(span)
+
+
+def evaluate(strategy, ctx, scan_date):
+    """Returns the result document if `strategy` matches `ctx`, else None."""
+    bars = ctx.bars(strategy.period)
+    if len(bars) < strategy.min_bars:
+        return None
+    with run_report.stage("indicators"):
+        ema = bars.ema(strategy.ema_span)
+
+    for cond in strategy.conditions:
+        with run_report.stage(f"cond.{cond.__name__}"):
+            matched = cond(bars, ema, strategy.params)
+        if matched:
+            break
+    else:
+        return None
+
+    atr = bars.indicators([strategy.atr_name])[strategy.atr_name][-1] if strategy.atr_name else None
+    return build_doc(
+        strategy, ctx.symbol, bars.close[-1], ema[-1], bars.volume[-1], bars.timestamp(-1), scan_date, atr,
+    )
+
+
+def build_doc(strategy, symbol, close, ema, volume, timestamp, scan_date, atr=None):
+    """
+    Result document for a match, with target/stop when the strategy defines them (ATR
+    exits fall back to the fixed multiples while the ATR is still undefined).
+    """
+    entry = float(close)
+    atr = float(atr) if atr is not None and np.isfinite(atr) else None
+    doc = {
+        "symbol": symbol,
+        "close": round(entry, 2),
+        strategy.ema_col.lower(): round(float(ema), 2),
+        "volume": int(volume),
+        "timestamp": timestamp.isoformat(),
+        "scan_date": scan_date,
+        "strategy": strategy.name,
+    }
+    if atr is not None:
+        doc["atr"] = round(atr, 2)
+    if strategy.target_mult is not None or (atr is not None and strategy.target_atr is not None):
+        target, stop = strategy.exits(entry, atr)
+        doc["target"] = round(target, 2)
+        doc["stop_loss"] = round(stop, 2)
+    return doc
+
+
+def evaluate_symbol(strategies, symbol, data, scan_date):
+    """
+    Runs `strategies` against one symbol's bars, sharing indicators between them.
+    Returns ([(strategy name, doc)], {counter: n}).
+    """
+    ctx = SymbolContext(symbol, data, strategies[0].interval if strategies else None)
+    matches, counts = [], {}
+    for strategy in strategies:
+        counts[f"evaluated.{strategy.name}"] = 1
+        try:
+            doc = evaluate(strategy, ctx, scan_date)
+        except Exception as e:
+            counts[f"errors.{strategy.name}"] = 1
+            print(f"❌ Error with {symbol} ({strategy.name}): {e}")
+            continue
+        if doc is not None:
+            counts[f"matched.{strategy.name}"] = 1
+            matches.append((strategy.name, doc))
+    return matches, counts
+
+
+def _usable(symbol, data, interval, report):
+    if data.empty or "Close" not in data.columns:
+        print(f"⚠️ Skipping {symbol}: No {interval} data.")
+        report.count("skipped_no_data")
+        return False
+    return True
+
+
+def _record(report, symbol, interval, counts, seconds):
+    report.latency(f"{symbol}:{interval}", seconds)
+    for key, n in counts.items():
+        report.count(key, n)
+
+
+def _scan_serial(group, loaded, universes, interval, scan_date, report):
+    """Evaluates symbols in this process as their bars arrive. Yields (symbol, matches)."""
+    for symbol, data in loaded:
+        if not _usable(symbol, data, interval, report):
+            continue
+        strategies = [s for s in group if not universes or symbol in universes[s.name]]
+        started = time.perf_counter()
+        matches, counts = evaluate_symbol(strategies, symbol, data, scan_date)
+        _record(report, symbol, interval, counts, time.perf_counter() - started)
+        yield symbol, matches
+
+
+# --- parallel evaluation ---
+# Bars are handed to worker processes as memory-mapped .npy files (on /dev/shm when
+# available, i.e. plain shared memory) instead of pickled DataFrames: one int64 array of
+# UTC timestamps and one 5 × bars float64 OHLCV array per batch of symbols, plus
+# (symbol, start, stop) offsets into them. Workers wrap slices of the maps in `Bars`
+# without copying them.
+
+def pack_batch(frames, prefix):
+    """
+    Writes [(symbol, frame or Bars)] to `{prefix}.time.npy` / `{prefix}.ohlcv.npy`.
+    Returns the (symbol, start, stop) offsets.
+    """
+    packed = [(symbol, data if isinstance(data, Bars) else Bars.from_frame(data)) for symbol, data in frames]
+    offsets, start = [], 0
+    for symbol, bars in packed:
+        offsets.append((symbol, start, start + len(bars)))
+        start += len(bars)
+    times = np.empty(start, dtype=np.int64)
+    values = np.empty((5, start), dtype=np.float64)
+    for (_, lo, hi), (_, bars) in zip(offsets, packed):
+        times[lo:hi] = bars.time
+        values[:, lo:hi] = (bars.open, bars.high, bars.low, bars.close, bars.volume)
+    np.save(prefix + ".time.npy", times)
+    np.save(prefix + ".ohlcv.npy", values)
+    return offsets
+
+
+def unpack_bars(times, values, lo, hi, tz, index_name):
+    return Bars(times[lo:hi], *values[:, lo:hi], tz=tz, index_name=index_name)
+
+
+def _evaluate_batch(job):
+    """Worker: evaluates a packed batch. Returns [(symbol, matches, counts, seconds)] in batch order."""
+    prefix, entries, tz, index_name, strategies, scan_date = job
+    times = np.load(prefix + ".time.npy", mmap_mode="r")
+    values = np.load(prefix + ".ohlcv.npy", mmap_mode="r")
+    out = []
+    for symbol, lo, hi, picked in entries:
+        started = time.perf_counter()
+        bars = unpack_bars(times, values, lo, hi, tz, index_name)
+        matches, counts = evaluate_symbol([strategies[i] for i in picked], symbol, bars, scan_date)
+        out.append((symbol, matches, counts, time.perf_counter() - started))
+    return out
+
+
+def _start_pool(workers):
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError) as e:
+        print(f"⚠️ No process pool ({e}); evaluating in-process.")
+        return None
+
+
+def _scan_parallel(group, loaded, universes, interval, scan_date, report, workers):
+    """
+    Packs symbols into batches of BATCH_SYMBOLS as their bars arrive and evaluates the
+    batches on a pool of `workers` processes while loading continues. Yields
+    (symbol, matches) batch by batch, in the order the batches were formed. A batch whose
+    worker fails (broken pool, unpicklable strategy, ...) is evaluated in-process instead.
+    """
+    strategies = [dataclasses.replace(s, sink=None) for s in group]  # sinks stay in this process
+    workdir = tempfile.mkdtemp(prefix="scan_", dir=SHARED_DIR)
+    pool = _start_pool(workers)
+    jobs, batch = [], []
+
+    def submit():
+        with report.stage("pack"):
+            first = batch[0][1].index
+            offsets = pack_batch([(symbol, data) for symbol, data, _ in batch],
+                                 os.path.join(workdir, str(len(jobs))))
+        entries = [(symbol, lo, hi, picked) for (symbol, lo, hi), (_, _, picked) in zip(offsets, batch)]
+        job = (os.path.join(workdir, str(len(jobs))), entries, first.tz, first.name, strategies, scan_date)
+        jobs.append((job, pool.submit(_evaluate_batch, job) if pool is not None else None))
+        report.count("parallel_batches")
+        batch.clear()
+
+    try:
+        for symbol, data in loaded:
+            if not _usable(symbol, data, interval, report):
+                continue
+            picked = [i for i, s in enumerate(group) if not universes or symbol in universes[s.name]]
+            batch.append((symbol, data, picked))
+            if len(batch) >= BATCH_SYMBOLS:
+                submit()
+        if batch:
+            submit()
+
+        for job, future in jobs:
+            done = None
+            if future is not None:
+                try:
+                    with report.stage("evaluate_wait"):
+                        done = future.result()
+                except Exception as e:
+                    print(f"⚠️ Worker batch failed ({e!r}); evaluating it in-process.")
+                    report.count("parallel_fallbacks")
+            if done is None:
+                with report.stage("evaluate_local"):
+                    done = _evaluate_batch(job)
+            for symbol, matches, counts, seconds in done:
+                _record(report, symbol, interval, counts, seconds)
+                yield symbol, matches
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _scan_panel(group, loaded, universes, interval, scan_date, report):
+    """
+    Collects every symbol's bars into one Panel (per period) and screens each strategy over
+    the whole universe with matrix operations. Yields (symbol, matches) in load order.
+    """
+    frames = [(symbol, data) for symbol, data in loaded if _usable(symbol, data, interval, report)]
+    with report.stage("panel_build"):
+        full = Panel.from_frames(frames)
+    panels = {}
+    matches = {symbol: [] for symbol, _ in frames}
+    for strategy in group:
+        days = period_days(strategy.period)
+        if days not in panels:
+            with report.stage("panel_build"):
+                panels[days] = full.trim(days)
+        panel = panels[days]
+        with report.stage(f"panel.{strategy.name}"):
+            matched = panel.screen(strategy)
+            ema = panel.latest(panel.ema(strategy.ema_span))
+            close, volume = panel.latest(panel.bar("close")), panel.latest(panel.bar("volume"))
+            atr = panel.latest(panel.indicators([strategy.atr_name])[strategy.atr_name]) \
+                if strategy.atr_name else np.full(len(panel.symbols), np.nan)
+        for col, symbol in enumerate(panel.symbols):
+            if universes and symbol not in universes[strategy.name]:
+                continue
+            report.count(f"evaluated.{strategy.name}")
+            if matched[col]:
+                report.count(f"matched.{strategy.name}")
+                matches[symbol].append((strategy.name, build_doc(
+                    strategy, symbol, close[col], ema[col], volume[col], panel.timestamp(col), scan_date,
+                    atr[col])))
+    yield from matches.items()
+
+
+def _prefilter(strategies, symbols, members, store, report):
+    """
+    Prunes the universe of every strategy with a `prefilter` on daily bars (see prefilter.py).
+    Returns ({strategy name: surviving symbols}, summary for the run report).
+    """
+    specs = {s.name: s.prefilter for s in strategies if s.prefilter is not None}
+    if not specs:
+        return {}, None
+    pools = {name: symbols if symbols is not None else members[name] for name in specs}
+    everyone = list(dict.fromkeys(sym for pool in pools.values() for sym in pool))
+    period = max((spec.period for spec in specs.values()), key=period_days)
+
+    started = time.perf_counter()
+    scopes, summary = {}, {}
+    with report.stage("prefilter"):
+        panel = load_daily(everyone, store, period)
+        for name, spec in specs.items():
+            kept, pruned = prune(pools[name], panel, spec)
+            scopes[name] = set(kept)
+            summary[name] = {"universe": len(pools[name]), "kept": len(kept), "pruned": pruned}
+            report.count(f"prefilter.kept.{name}", len(kept))
+            report.count(f"prefilter.pruned.{name}", len(pools[name]) - len(kept))
+            print(f"🔎 Prefilter kept {len(kept)}/{len(pools[name])} symbols for {name} "
+                  f"({', '.join(f'{len(v)} {k}' for k, v in pruned.items() if v) or 'nothing pruned'}).")
+    return scopes, {"seconds": round(time.perf_counter() - started, 4), "daily_symbols": len(panel.symbols),
+                    "strategies": summary, "intervals": {}}
+
+
+def run_strategies(strategies, symbols=None, store=None, scan_date=None, profile=None, workers=None,
+                   engine=None, prefilter=None):
+    """
+    Loads bars once per interval (for the longest period any strategy needs) and runs
+    every strategy on that interval against each symbol as its bars arrive.
+    Without `symbols`, each strategy scans its own universe; a symbol in several of them
+    is still loaded and evaluated once per interval. Returns `{strategy_name: [docs]}`,
+    each list in universe (symbol list) order whatever order the bars arrived in.
+    `workers` > 1 evaluates on a process pool (default SCAN_WORKERS, 1 = in-process).
+    `engine="panel"` (default SCAN_ENGINE) instead waits for the whole universe and screens
+    it at once on a time × symbol panel (see panel.py).
+    `prefilter=True` (default SCAN_PREFILTER) first prunes the universe of strategies that
+    define a `prefilter` on daily bars; symbols pruned for every strategy on an interval
+    are not loaded at all. The run report's "prefilter" section lists what was pruned and
+    estimates the time saved (pruned symbols × the interval's load + evaluation time per
+    loaded symbol, minus the prefilter's own time).
+    Every run writes a RunReport (see run_report.py); `profile=True` adds a cProfile dump.
+    """
+    workers = DEFAULT_WORKERS if workers is None else max(1, workers)
+    engine = engine or DEFAULT_ENGINE
+    prefilter = DEFAULT_PREFILTER if prefilter is None else prefilter
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine '{engine}', choose from {ENGINES}")
+    names = [s.name for s in strategies]
+    with RunReport("scan_" + "+".join(names), meta={"strategies": names, "workers": workers, "engine": engine,
+                                                   "prefilter": prefilter},
+                   profile=profile) as report:
+        with report.stage("universe"):
+            members = {} if symbols is not None else {s.name: load_symbols(s.universe) for s in strategies}
+            universes = {name: set(syms) for name, syms in members.items()}
+        store = store or default_store()
+        scopes, pruning = _prefilter(strategies, symbols, members, store, report) if prefilter else ({}, None)
+        scan_date = scan_date or datetime.now().strftime("%Y-%m-%d")
+        results = {s.name: [] for s in strategies}
+
+        by_interval = {}
+        for strategy in strategies:
+            by_interval.setdefault(strategy.interval, []).append(strategy)
+
+        # 1m first: intraday intervals topped up afterwards are resampled from those 1m bars
+        for interval, group in sorted(by_interval.items(), key=lambda item: item[0] != "1m"):
+            period = max((s.period for s in group), key=period_days)
+            wanted = symbols if symbols is not None else list(dict.fromkeys(
+                sym for s in group for sym in members[s.name]))
+            scope, pruned = universes, []
+            if any(s.name in scopes for s in group):
+                scope = {s.name: scopes.get(s.name, universes[s.name] if universes else set(wanted))
+                         for s in group}
+                pruned = [sym for sym in wanted if not any(sym in scope[s.name] for s in group)]
+                wanted = [sym for sym in wanted if any(sym in scope[s.name] for s in group)]
+
+            started = time.perf_counter()
+            loaded = report.timed_iter(store.load_many(wanted, interval, period), f"load.{interval}")
+            if engine == "panel":
+                scanned = _scan_panel(group, loaded, scope, interval, scan_date, report)
+            elif workers > 1:
+                scanned = _scan_parallel(group, loaded, scope, interval, scan_date, report, workers)
+            else:
+                scanned = _scan_serial(group, loaded, scope, interval, scan_date, report)
+
+            found = []
+            for symbol, matches in scanned:
+                found.extend((symbol, name, doc) for name, doc in matches)
+            if pruning is not None and pruned:
+                per_symbol = (time.perf_counter() - started) / max(len(wanted), 1)
+                pruning["intervals"][interval] = {
+                    "loaded": len(wanted), "pruned": len(pruned),
+                    "seconds_per_symbol": round(per_symbol, 6),
+                    "estimated_saved_s": round(per_symbol * len(pruned), 4),
+                }
+            order = {symbol: i for i, symbol in enumerate(wanted)}
+            found.sort(key=lambda item: order.get(item[0], len(order)))
+
+            sinks = {s.name: s.sink for s in group}
+            for _, name, doc in found:
+                results[name].append(doc)
+                if sinks[name] is not None:
+                    with report.stage("sink_add"):
+                        sinks[name].add(doc)
+
+        if pruning is not None:
+            saved = sum(i["estimated_saved_s"] for i in pruning["intervals"].values()) - pruning["seconds"]
+            pruning["estimated_saved_s"] = round(saved, 4)
+            report.section("prefilter", pruning)
+            print(f"⏩ Prefilter saved ~{saved:.1f}s (net of its own {pruning['seconds']:.1f}s).")
+
+        for strategy in strategies:
+            if strategy.sink is not None:
+                with report.stage("sink_flush"):
+                    strategy.sink.flush()
+            print(f"\n✅ {strategy.name} scan complete. {len(results[strategy.name])} stock(s) matched.")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scan strategies over a shared data load")
+    parser.add_argument("strategies", nargs="*", help=f"any of {list(STRATEGIES)} (default: all)")
+    parser.add_argument("--universe", help="universe expression or CSV for every strategy, e.g. 'it|finserv'")
+    parser.add_argument("--profile", action="store_true", help="also write a cProfile dump of the run")
+    parser.add_argument("--workers", type=int, default=None, help="evaluation processes (1 = in-process)")
+    parser.add_argument("--engine", choices=ENGINES, help="per-symbol evaluation or one cross-sectional panel")
+    parser.add_argument("--prefilter", action="store_true", help="prune the universe on daily bars first")
+    args = parser.parse_args()
+    args.strategies = args.strategies or list(STRATEGIES)
+    unknown = [n for n in args.strategies if n not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategy {unknown}. Choose from {list(STRATEGIES)}")
+    symbols = load_symbols(args.universe) if args.universe else None
+    run_strategies([STRATEGIES[n] for n in args.strategies], symbols, profile=args.profile or None,
+                    workers=args.workers, engine=args.engine, prefilter=args.prefilter or None)
+
+
+if __name__ == "__main__":
+    main()
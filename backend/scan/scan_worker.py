@@ -0,0 +1,310 @@
+"""
+scan_worker.py
+
+Long-running Python worker for the Node API.
+
+Instead of `exec("python3 scan_*.py")` per HTTP request (interpreter start, pandas /
+yfinance import and a new Mongo connection every time), server.js talks to this process
+over local HTTP + JSON. Libraries, the Mongo client and the bar store stay warm between
+requests, and identical requests that arrive while a job is still running are attached to
+that job instead of starting a second full-universe scan.
+
+ Endpoints:
+    POST /jobs              {"type": "scan", "strategies": ["5m", "1m"]}
+                            {"type": "scan", "strategies": ["5m"], "universe": "it|finserv"}
+                            {"type": "ohlc", "symbol": "INFY", "tf": "5m"}
+                            → 202 {"id", "status", ...}   (an identical in-flight job is reused)
+    GET  /jobs/<id>         → {"id", "status": queued|running|done|failed, "result", "error", timings}
+    GET  /ohlc/<SYMBOL>?tf=&from=&to=&limit=&points=
+                            → chart rows (JSON), served from the chart cache (chart_cache.py)
+    GET  /latest[/<strategy>]
+                            → results of the scheduled bar-close scans (SCAN_SCHEDULER=1, see
+                              scheduler.py): {"scheduler": status, "fresh": {name: bool},
+                              "results": {name: {"bar_close", "finished_at", "docs", ...}}}
+    GET  /health            → {"ok": true, "jobs": {...}, "chart_cache": {hits, misses, ...},
+                               "scheduler": status or null}
+
+ Usage:
+    python scan_worker.py            # listens on 127.0.0.1:5001 (SCAN_WORKER_PORT)
+    SCAN_SCHEDULER=1 python scan_worker.py    # + scans on every bar close
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from chart_cache import ChartCache
+
+HOST = os.environ.get("SCAN_WORKER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("SCAN_WORKER_PORT", 5001))
+MAX_CONCURRENT_JOBS = int(os.environ.get("SCAN_WORKER_JOBS", 2))
+KEEP_FINISHED = 200
+
+CHART_CACHE = ChartCache()
+SCHEDULER = None   # scheduler.Scheduler when SCAN_SCHEDULER=1
+
+
+# --- Job handlers ---
+
+# Strategy sinks are shared objects, so scans run one at a time (different scans still
+# queue behind each other; identical ones are merged before they get here)
+_scan_lock = threading.Lock()
+
+
+def run_scan(args):
+    from scan_engine import run_strategies
+    from strategies import STRATEGIES
+
+    names = args.get("strategies") or ["5m", "1m"]
+    unknown = [n for n in names if n not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"unknown strategy {unknown}")
+    symbols = None
+    if args.get("universe"):
+        from scan_engine import load_symbols
+        symbols = load_symbols(args["universe"])
+    with _scan_lock:
+        results = run_strategies([STRATEGIES[n] for n in names], symbols)
+    return {name: len(docs) for name, docs in results.items()}
+
+
+def run_scheduled(keys):
+    """Scheduler runner: the same scan, queued behind on-demand ones by the scan lock."""
+    from scan_engine import run_strategies
+    from strategies import STRATEGIES
+
+    with _scan_lock:
+        return run_strategies([STRATEGIES[k] for k in keys])
+
+
+def latest_view(name=None):
+    names = [name] if name else list(SCHEDULER.names.values())
+    results = SCHEDULER.latest()
+    return {
+        "scheduler": SCHEDULER.status(),
+        "fresh": {n: SCHEDULER.fresh(n) for n in names},
+        "results": {n: results[n] for n in names if n in results},
+    }
+
+
+def chart_window(args):
+    """start/end/limit/points from a request ("from"/"to" are accepted as aliases)."""
+    window = {
+        "start": args.get("start", args.get("from")),
+        "end": args.get("end", args.get("to")),
+        "limit": args.get("limit"),
+        "points": args.get("points"),
+    }
+    for key in ("limit", "points"):
+        if window[key] is not None:
+            window[key] = int(window[key])
+    return window
+
+
+def check_ohlc(args):
+    from fetch_ohlc import check_request
+    check_request(args.get("symbol", ""), args.get("tf", "5m"))
+
+
+def run_ohlc(args):
+    return json.loads(CHART_CACHE.get(args["symbol"], args.get("tf", "5m"), **chart_window(args)))
+
+
+HANDLERS = {
+    "scan": run_scan,
+    "ohlc": run_ohlc,
+}
+
+# Checks run before a job is queued (ValueError → 400)
+VALIDATORS = {
+    "ohlc": check_ohlc,
+}
+
+
+# --- Job registry ---
+
+class JobManager:
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.in_flight = {}
+
+    @staticmethod
+    def key(job_type, args):
+        return json.dumps([job_type, args], sort_keys=True)
+
+    def submit(self, job_type, args):
+        """Starts a job, or returns the identical one already queued/running."""
+        if job_type not in HANDLERS:
+            raise ValueError(f"unknown job type '{job_type}'")
+        if job_type in VALIDATORS:
+            VALIDATORS[job_type](args)
+        key = self.key(job_type, args)
+        with self.lock:
+            if key in self.in_flight:
+                job = self.jobs[self.in_flight[key]]
+                job["deduplicated"] += 1
+                return job
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "type": job_type,
+                "args": args,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "deduplicated": 0,
+            }
+            self.jobs[job["id"]] = job
+            self.in_flight[key] = job["id"]
+            self._trim()
+        self.pool.submit(self._run, job, key)
+        return job
+
+    def _run(self, job, key):
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            job["result"] = HANDLERS[job["type"]](job["args"])
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+            print(f"❌ Job {job['id']} ({job['type']}) failed: {e}")
+        finally:
+            job["finished_at"] = time.time()
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def _trim(self):
+        finished = [i for i, j in self.jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in finished[: max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def counts(self):
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+
+def job_view(job, include_result=True):
+    view = {k: v for k, v in job.items() if k != "result" or include_result}
+    if job["finished_at"] and job["started_at"]:
+        view["run_seconds"] = round(job["finished_at"] - job["started_at"], 3)
+    return view
+
+
+# --- HTTP ---
+
+class Handler(BaseHTTPRequestHandler):
+    manager = None
+
+    def _send(self, code, body):
+        self._send_raw(code, json.dumps(body).encode())
+
+    def _send_raw(self, code, payload):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path == "/health":
+            return self._send(200, {"ok": True, "jobs": self.manager.counts(),
+                                    "chart_cache": CHART_CACHE.counters(),
+                                    "scheduler": SCHEDULER.status() if SCHEDULER else None})
+        if path == "/latest" or path.startswith("/latest/"):
+            return self._send_latest(path[len("/latest/"):] or None)
+        if path.startswith("/ohlc/"):
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            return self._send_chart(path.split("/")[-1], query)
+        if path.startswith("/jobs/"):
+            job = self.manager.get(path.split("/")[-1])
+            if job is None:
+                return self._send(404, {"error": "unknown job"})
+            return self._send(200, job_view(job))
+        self._send(404, {"error": "not found"})
+
+    def _send_latest(self, name):
+        if SCHEDULER is None:
+            return self._send(404, {"error": "scheduler not running"})
+        if name is not None and name not in SCHEDULER.names.values():
+            return self._send(404, {"error": f"strategy '{name}' is not scheduled"})
+        # result docs can carry Mongo ids and dates once the sinks have stored them
+        self._send_raw(200, json.dumps(latest_view(name), default=str).encode())
+
+    def _send_chart(self, symbol, query):
+        tf = query.get("tf", "5m")
+        try:
+            check_ohlc({"symbol": symbol, "tf": tf})
+            payload = CHART_CACHE.get(symbol, tf, **chart_window(query))
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except LookupError as e:
+            return self._send(404, {"error": str(e)})
+        except Exception as e:
+            print(f"❌ Chart data failed for {symbol} ({tf}): {e}")
+            return self._send(500, {"error": "Chart data fetch failed"})
+        self._send_raw(200, payload)
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job_type = body.pop("type")
+            job = self.manager.submit(job_type, body)
+        except (KeyError, ValueError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(202, job_view(job, include_result=False))
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(host=HOST, port=PORT):
+    # Warm up the heavy imports once, before the first request pays for them
+    import pandas  # noqa: F401
+    import scan_engine  # noqa: F401
+    import fetch_ohlc  # noqa: F401
+    import yfinance  # noqa: F401
+    from mongo import get_db
+    get_db()
+
+    Handler.manager = JobManager()
+    if os.environ.get("SCAN_SCHEDULER") == "1":
+        global SCHEDULER
+        from scheduler import Scheduler
+        SCHEDULER = Scheduler(runner=run_scheduled)
+        SCHEDULER.start()
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"🚀 Scan worker listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if SCHEDULER is not None:
+            SCHEDULER.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,333 @@
+"""
+scheduler.py
+
+Runs the intraday strategies right after every NSE bar close, so results are ready
+before anyone asks for them.
+
+- At each 1m / 5m bar close (+ SCHEDULER_SETTLE seconds, default 20, for the provider
+  to publish the bar) the strategies whose bars just closed run together in one
+  `run_strategies` call; at 10:00 that is 1m and 5m, at 10:01 only 1m.
+- Market hours only: the first bar closes of a session are 09:16 (1m) / 09:20 (5m), the
+  last ones 15:30; weekends are skipped (see chart_cache.next_bar_close; exchange
+  holidays are not known, a holiday run simply finds no new bars).
+- Once per trading day before the 09:15 open (at SCHEDULER_PREWARM, default 09:00) the
+  bar store is topped up for every strategy's universe and the indicator memo
+  (indicators.py) filled, so the first run of the day only fetches the new bars.
+- Runs never overlap: scans run in the scheduler's own thread, and bar closes that pass
+  while one is running are skipped (and counted), not queued.
+- The latest results per strategy are kept in memory (`latest()`, `status()`);
+  scan_worker.py serves them on GET /latest, and `fresh()` tells whether they cover the
+  most recent bar close.
+
+All time comes from an injectable clock (`now()` + `wait(event, seconds)`):
+`SimulatedClock` replays a day in no time, e.g. with a runner that only pretends to scan.
+
+ Usage:
+    python scheduler.py                      # run 5m + 1m on every bar close (Ctrl-C to stop)
+    python scheduler.py 1m --settle 30
+    python scheduler.py --simulate 2024-06-28 --run-seconds 75    # dry run of a day
+    SCAN_SCHEDULER=1 python scan_worker.py   # inside the worker, results on GET /latest
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from chart_cache import IST, SESSION_OPEN, SESSION_CLOSE, BAR_MINUTES, next_bar_close
+
+SETTLE_SECONDS = float(os.environ.get("SCHEDULER_SETTLE", 20))
+PREWARM_AT = tuple(int(x) for x in os.environ.get("SCHEDULER_PREWARM", "09:00").split(":"))
+DEFAULT_STRATEGIES = ("5m", "1m")
+
+
+class SystemClock:
+    def now(self):
+        return datetime.now(IST)
+
+    def wait(self, event, seconds):
+        """Sleeps up to `seconds`; returns True if `event` was set meanwhile."""
+        return event.wait(max(seconds, 0))
+
+
+class SimulatedClock:
+    """Clock that only moves when waited on (or `advance`d), starting at `start`."""
+
+    def __init__(self, start):
+        self.current = start if start.tzinfo else start.replace(tzinfo=IST)
+
+    def now(self):
+        return self.current
+
+    def advance(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+    def wait(self, event, seconds):
+        self.advance(max(seconds, 0))
+        return event.is_set()
+
+
+def previous_bar_close(interval, now):
+    """Most recent close (IST datetime) of an `interval` bar at or before `now`."""
+    local = now.astimezone(IST)
+    step = timedelta(minutes=BAR_MINUTES[interval])
+    day = local
+    while True:
+        if day.weekday() < 5:
+            session_open = day.replace(hour=SESSION_OPEN[0], minute=SESSION_OPEN[1], second=0, microsecond=0)
+            session_close = day.replace(hour=SESSION_CLOSE[0], minute=SESSION_CLOSE[1], second=0, microsecond=0)
+            if day.date() < local.date() or local >= session_close:
+                return session_close
+            if local >= session_open + step:
+                return session_open + ((local - session_open) // step) * step
+        day = (day - timedelta(days=1)).replace(hour=23, minute=59)
+
+
+def run_scan(keys):
+    """Default runner: `run_strategies` over the strategies named by `keys`."""
+    from scan_engine import run_strategies
+    from strategies import STRATEGIES
+
+    return run_strategies([STRATEGIES[k] for k in keys])
+
+
+def prewarm(keys):
+    """
+    Tops up the bar store for every strategy's universe and period and computes its
+    indicators into the process-wide memo (plus the daily bars its prefilter reads).
+    """
+    from bar_store import default_store
+    from bars import Bars
+    from prefilter import load_daily
+    from scan_engine import load_symbols
+    from strategies import STRATEGIES
+
+    store = default_store()
+    for key in keys:
+        strategy = STRATEGIES[key]
+        symbols = load_symbols(strategy.universe)
+        names = [f"ema{strategy.ema_span}"] + ([strategy.atr_name] if strategy.atr_name else [])
+        warmed = 0
+        for symbol, data in store.load_many(symbols, strategy.interval, strategy.period):
+            if data.empty or "Close" not in data.columns:
+                continue
+            bars = Bars.from_frame(data)
+            bars.key = (symbol, strategy.interval)
+            bars.indicators(names)
+            warmed += 1
+        if strategy.prefilter is not None:
+            load_daily(symbols, store, strategy.prefilter.period)
+        print(f"🔥 Pre-warmed {warmed} symbol(s) for {strategy.name}.")
+
+
+class Scheduler:
+    def __init__(self, strategies=DEFAULT_STRATEGIES, settle=SETTLE_SECONDS, prewarm_at=PREWARM_AT,
+                 clock=None, runner=run_scan, prewarmer=prewarm):
+        from strategies import STRATEGIES
+
+        self.keys = list(strategies)
+        self.intervals = {key: STRATEGIES[key].interval for key in self.keys}
+        self.names = {key: STRATEGIES[key].name for key in self.keys}
+        unsupported = {i for i in self.intervals.values() if i not in BAR_MINUTES}
+        if unsupported:
+            raise ValueError(f"only {list(BAR_MINUTES)} bars can be scheduled, not {sorted(unsupported)}")
+        self.settle = timedelta(seconds=settle)
+        self.prewarm_at = prewarm_at
+        self.clock = clock or SystemClock()
+        self.runner = runner
+        self.prewarmer = prewarmer
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.cursors = {}          # strategy key → last bar close handled
+        self.prewarmed = None      # trading day of the last pre-warm
+        self.current = None        # bar close being scanned
+        self.results = {}          # strategy name → latest published run
+        self.stats = {"runs": 0, "failed": 0, "skipped": 0, "prewarms": 0}
+
+    # --- schedule ---
+
+    def _prewarm_time(self, now):
+        """Pre-warm time of the next trading day not yet warmed whose open is still ahead."""
+        day = now.astimezone(IST)
+        while True:
+            opens = day.replace(hour=SESSION_OPEN[0], minute=SESSION_OPEN[1], second=0, microsecond=0)
+            if day.weekday() < 5 and self.prewarmed != day.date() and now < opens:
+                return day.replace(hour=self.prewarm_at[0], minute=self.prewarm_at[1], second=0, microsecond=0)
+            day = (day + timedelta(days=1)).replace(hour=0, minute=0)
+
+    def _latest_closes(self, now):
+        """{key: most recent settled bar close}; the first call starts every strategy there."""
+        latest = {key: previous_bar_close(interval, now - self.settle) for key, interval in self.intervals.items()}
+        for key, close in latest.items():
+            self.cursors.setdefault(key, close)
+        return latest
+
+    def next_event(self):
+        """When the scheduler next has something to do (IST datetime)."""
+        now = self.clock.now()
+        self._latest_closes(now)
+        at = min(next_bar_close(self.intervals[key], cursor) for key, cursor in self.cursors.items()) + self.settle
+        return min(at, self._prewarm_time(now))
+
+    def step(self):
+        """Does whatever is due now (pre-warm, one scan). Returns True if anything ran."""
+        now = self.clock.now()
+        if now >= self._prewarm_time(now):
+            self._prewarm(now)
+            return True
+
+        latest = self._latest_closes(now)
+        due = {key: close for key, close in latest.items() if close > self.cursors[key]}
+        if not due:
+            return False
+        # closes that went by during the previous run (or a pause) are skipped, not replayed:
+        # a strategy that fell behind runs once, on its latest close
+        for key, close in due.items():
+            missed = self.cursors[key]
+            while (missed := next_bar_close(self.intervals[key], missed)) < close:
+                self._skip(missed, key)
+            self.cursors[key] = close
+        self._run(due)
+        return True
+
+    def run(self, until=None):
+        """Loops until `stop()` (or the clock reaches `until`)."""
+        print(f"⏰ Scheduler started for {', '.join(self.names.values())} "
+              f"(settle {self.settle.total_seconds():g}s, pre-warm {self.prewarm_at[0]:02d}:{self.prewarm_at[1]:02d}).")
+        while not self.stop_event.is_set():
+            if until is not None and self.clock.now() >= until:
+                break
+            if self.step():
+                continue
+            wake = self.next_event()
+            if until is not None:
+                wake = min(wake, until)
+            if self.clock.wait(self.stop_event, (wake - self.clock.now()).total_seconds()):
+                break
+
+    def start(self):
+        """Runs the loop in a daemon thread."""
+        thread = threading.Thread(target=self.run, name="scan-scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    # --- actions ---
+
+    def _prewarm(self, now):
+        self.prewarmed = now.astimezone(IST).date()
+        started = time.perf_counter()
+        try:
+            self.prewarmer(self.keys)
+            self.stats["prewarms"] += 1
+        except Exception as e:
+            print(f"❌ Pre-warm failed: {e}")
+        print(f"🔥 Pre-warm done in {time.perf_counter() - started:.1f}s.")
+
+    def _skip(self, close, key):
+        self.stats["skipped"] += 1
+        print(f"⏭️ Skipped the {key} scan for the {close:%H:%M} close: previous run still going.")
+
+    def _run(self, due):
+        """Runs the strategies in `due` ({key: bar close}) together and publishes their results."""
+        keys, close = list(due), max(due.values())
+        started, wall = self.clock.now(), time.perf_counter()
+        self.current = close
+        try:
+            results = self.runner(keys)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"❌ Scheduled {'+'.join(keys)} scan for the {close:%H:%M} close failed: {e}")
+            return
+        finally:
+            self.current = None
+        self.stats["runs"] += 1
+        finished = self.clock.now()
+        published = {self.names[key]: (results or {}).get(self.names[key], []) for key in keys}
+        with self.lock:
+            for key, docs in zip(keys, published.values()):
+                self.results[self.names[key]] = {
+                    "bar_close": due[key].isoformat(),
+                    "started_at": started.isoformat(),
+                    "finished_at": finished.isoformat(),
+                    "seconds": round(time.perf_counter() - wall, 3),
+                    "docs": docs,
+                }
+        matched = ", ".join(f"{name}: {len(docs)}" for name, docs in published.items())
+        print(f"🕒 {'+'.join(keys)} scan for the {close:%H:%M} close published ({matched}).")
+
+    # --- published state ---
+
+    def fresh(self, name, now=None):
+        """Do the published results of strategy `name` cover its most recent settled bar close?"""
+        key = next((k for k, n in self.names.items() if n == name), None)
+        with self.lock:
+            published = self.results.get(name)
+        if key is None or published is None:
+            return False
+        now = now or self.clock.now()
+        return published["bar_close"] == previous_bar_close(self.intervals[key], now - self.settle).isoformat()
+
+    def latest(self, name=None):
+        """Published run of one strategy (or {name: run} for all), docs included."""
+        with self.lock:
+            return dict(self.results.get(name) or {}) if name else {n: dict(r) for n, r in self.results.items()}
+
+    def status(self):
+        with self.lock:
+            published = {name: {k: v for k, v in run.items() if k != "docs"} | {"matches": len(run["docs"])}
+                         for name, run in self.results.items()}
+        return {
+            "strategies": list(self.names.values()),
+            "running": self.current.isoformat() if self.current else None,
+            "handled": {self.names[k]: close.isoformat() for k, close in self.cursors.items()},
+            "next_event": self.next_event().isoformat(),
+            "prewarmed": self.prewarmed.isoformat() if self.prewarmed else None,
+            "fresh": {name: self.fresh(name) for name in self.names.values()},
+            "published": published,
+            **self.stats,
+        }
+
+
+def simulate(day, keys, run_seconds, settle):
+    """Replays one trading day on a simulated clock with a runner that only takes time."""
+    clock = SimulatedClock(datetime.fromisoformat(day).replace(hour=8, minute=30, tzinfo=IST))
+    runs = []
+
+    def fake_run(run_keys):
+        runs.append((clock.now(), run_keys))
+        clock.advance(run_seconds)
+        return {}
+
+    scheduler = Scheduler(keys, settle=settle, clock=clock, runner=fake_run, prewarmer=lambda _: clock.advance(120))
+    scheduler.run(until=clock.now().replace(hour=16))
+    per_key = {k: sum(k in r for _, r in runs) for k in keys}
+    print(f"📅 {day}: {len(runs)} run(s) {per_key}, {scheduler.stats['skipped']} skipped, "
+          f"first {runs[0][0]:%H:%M:%S} {runs[0][1]}, last {runs[-1][0]:%H:%M:%S} {runs[-1][1]}" if runs
+          else f"📅 {day}: no runs (not a trading day?)")
+    return scheduler, runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run intraday scans right after every bar close")
+    parser.add_argument("strategies", nargs="*", default=list(DEFAULT_STRATEGIES), help="e.g. 5m 1m")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS, help="seconds to wait after a bar closes")
+    parser.add_argument("--simulate", metavar="DATE", help="dry-run a day on a simulated clock")
+    parser.add_argument("--run-seconds", type=float, default=30, help="simulated scan duration (with --simulate)")
+    args = parser.parse_args()
+
+    if args.simulate:
+        simulate(args.simulate, args.strategies, args.run_seconds, args.settle)
+        return
+    scheduler = Scheduler(args.strategies, settle=args.settle)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
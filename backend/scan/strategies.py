@@ -0,0 +1,278 @@
+"""
+strategies.py
+
+Declarative definitions of the scan strategies run by `scan_engine.py`.
+
+A Strategy says which bars it needs (interval, period), which EMA it trades around,
+which conditions make a match (any one is enough; they are tried in order, cheapest first,
+and the first match ends the check), how to place target/stop and where the matches go.
+An optional `prefilter` (see prefilter.py) prunes the universe on daily bars first.
+Exits are fixed multiples of the entry (`target_mult` / `stop_mult`) or, with
+`target_atr` / `stop_atr`, that many ATRs (`atr_period`, from indicators.py) away from it.
+ATR exits are opt-in: none of the strategies below set them, so they keep their fixed
+multiples.
+
+Conditions are plain functions `condition(bars, ema, params) -> bool` where `bars` is a
+`bars.Bars` container and `ema` the strategy's EMA array over it.
+
+Each condition also has a walk-forward twin in VECTORIZED_CONDITIONS, taking
+`(merged, data, params, cache)` frames (merged = Open/High/Close/EMA columns) and
+returning a boolean array: element t is what the condition returns when given only the
+bars up to t. `walkforward.py` uses these to replay history in one pass.
+PANEL_CONDITIONS holds a third version evaluating a whole universe at once on a
+`panel.Panel` (see `run_strategies(engine="panel")`).
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+import numpy as np
+
+import helpers as hp
+from prefilter import Prefilter
+from result_sinks import MongoSink, JsonSink
+
+SCAN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class Strategy:
+    name: str
+    interval: str
+    period: str
+    ema_span: int
+    min_bars: int
+    conditions: List[Callable]
+    params: dict = field(default_factory=dict)
+    target_mult: Optional[float] = None
+    stop_mult: Optional[float] = None
+    target_atr: Optional[float] = None  # target = entry + target_atr × ATR (overrides target_mult)
+    stop_atr: Optional[float] = None    # stop = entry - stop_atr × ATR
+    atr_period: int = 14
+    horizon: timedelta = timedelta(days=2)  # how long a trade is followed when backtesting
+    sink: object = None
+    universe: str = "Nifty 500"  # universe expression, see universes.py
+    prefilter: Optional[Prefilter] = None  # daily-bar pruning for `run_strategies(prefilter=True)`
+
+    @property
+    def ema_col(self):
+        return f"EMA{self.ema_span}"
+
+    @property
+    def atr_name(self):
+        """Indicator name of the exit ATR, or None with fixed-multiple exits."""
+        return f"atr{self.atr_period}" if self.target_atr is not None else None
+
+    def exits(self, entry, atr=None):
+        """(target, stop) for `entry` (scalar or array): ATR multiples when set, else fixed multiples."""
+        if self.target_atr is not None and atr is not None:
+            return entry + self.target_atr * atr, entry - self.stop_atr * atr
+        return entry * self.target_mult, entry * self.stop_mult
+
+
+# --- Conditions ---
+
+def _ema_distance(bars, ema):
+    close = bars.close[-1]
+    return abs(close - ema[-1]) / close
+
+
+def momentum_near_ema(bars, ema, params):
+    """Strong-candle momentum in the lookback window + close within ema_percent of the EMA."""
+    if _ema_distance(bars, ema) >= params["ema_percent"]:
+        return False
+    return hp.momentum_in_lookback(
+        bars.open, bars.high, bars.close,
+        params["momentum_length"], params["required_strong_candles"],
+        body_pct=params["body_pct"], lookback=params["lookback"],
+    )
+
+
+def gap_up_near_ema(bars, ema, params):
+    """Gap-up on the latest session + close within ema_percent of the EMA."""
+    return _ema_distance(bars, ema) < params["ema_percent"] and hp.check_gap_up_retest(bars)
+
+
+def ema_slope_near_ema(bars, ema, params):
+    """EMA22 rising steadily and close near it."""
+    return hp.check_ema_slope_condition(bars, params["ema_percent"])
+
+
+def above_and_near_ema(bars, ema, params):
+    """Close at or above the EMA and within ema_percent of it (daily pullback)."""
+    if bars.close[-1] - ema[-1] < 0:
+        return False
+    return _ema_distance(bars, ema) < params["ema_percent"]
+
+
+# --- Walk-forward (vectorized) twins ---
+# `cache` is an optional per-symbol dict; pieces shared between parameter sets
+# (EMA distance, strong-candle counts, gap flags, EMA streaks) are computed once in it.
+
+def _memo(cache, key, compute):
+    if cache is None:
+        return compute()
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _arrays(merged):
+    return (merged["Open"].to_numpy(), merged["High"].to_numpy(),
+            merged["Close"].to_numpy(), merged.iloc[:, 3].to_numpy())
+
+
+def _ema_distance_series(merged, relative_to="close", cache=None):
+    def compute():
+        _, _, close, ema = _arrays(merged)
+        return np.abs(close - ema) / (close if relative_to == "close" else ema)
+    return _memo(cache, ("ema_distance", relative_to), compute)
+
+
+def momentum_near_ema_series(merged, data, params, cache=None):
+    open_, high, close, _ = _arrays(merged)
+    length, body = params["momentum_length"], params["body_pct"]
+    counts = _memo(cache, ("strong_counts", length, body),
+                   lambda: hp.strong_candle_counts(open_, high, close, length, body))
+    found = _memo(
+        cache, ("momentum", length, body, params["required_strong_candles"], params["lookback"]),
+        lambda: hp.momentum_signal(
+            open_, high, close, length, params["required_strong_candles"],
+            body_pct=body, lookback=params["lookback"], counts=counts,
+        ),
+    )
+    return found & (_ema_distance_series(merged, cache=cache) < params["ema_percent"])
+
+
+def gap_up_near_ema_series(merged, data, params, cache=None):
+    open_, _, close, _ = _arrays(merged)
+    gap = _memo(cache, ("gap_up",), lambda: hp.gap_up_signal(merged.index, open_, close))
+    return gap & (_ema_distance_series(merged, cache=cache) < params["ema_percent"])
+
+
+def ema_slope_near_ema_series(merged, data, params, cache=None):
+    ema = merged.iloc[:, 3].to_numpy()
+    streak = _memo(cache, ("ema_streak",),
+                   lambda: hp.rising_streak_signal(ema, np.ones(len(ema), dtype=bool)))
+    return streak & (_ema_distance_series(merged, "ema", cache) < params["ema_percent"])
+
+
+def above_and_near_ema_series(merged, data, params, cache=None):
+    _, _, close, ema = _arrays(merged)
+    return (close - ema >= 0) & (_ema_distance_series(merged, cache=cache) < params["ema_percent"])
+
+
+VECTORIZED_CONDITIONS = {
+    momentum_near_ema: momentum_near_ema_series,
+    gap_up_near_ema: gap_up_near_ema_series,
+    ema_slope_near_ema: ema_slope_near_ema_series,
+    above_and_near_ema: above_and_near_ema_series,
+}
+
+
+# --- Panel (cross-sectional) twins ---
+# The same conditions over a whole universe at once: `panel` is a panel.Panel and `ema`
+# the strategy's EMA in its bar space; each returns a bool per symbol, evaluated at the
+# symbol's latest bar.
+
+def _panel_distance(panel, ema, relative_to="close"):
+    close, latest_ema = panel.latest(panel.bar("close")), panel.latest(ema)
+    return np.abs(close - latest_ema) / (close if relative_to == "close" else latest_ema)
+
+
+def momentum_near_ema_panel(panel, ema, params):
+    found = panel.momentum_in_lookback(params["momentum_length"], params["required_strong_candles"],
+                                       params["body_pct"], params["lookback"])
+    return found & (_panel_distance(panel, ema) < params["ema_percent"])
+
+
+def gap_up_near_ema_panel(panel, ema, params):
+    with np.errstate(invalid="ignore"):
+        gap_up = panel.latest(panel.session_gap()) > 0.03
+    return gap_up & (_panel_distance(panel, ema) < params["ema_percent"])
+
+
+def ema_slope_near_ema_panel(panel, ema, params):
+    return panel.rising_streak(22) & (_panel_distance(panel, panel.ema(22), "ema") < params["ema_percent"])
+
+
+def above_and_near_ema_panel(panel, ema, params):
+    above = panel.latest(panel.bar("close")) - panel.latest(ema) >= 0
+    return above & (_panel_distance(panel, ema) < params["ema_percent"])
+
+
+PANEL_CONDITIONS = {
+    momentum_near_ema: momentum_near_ema_panel,
+    gap_up_near_ema: gap_up_near_ema_panel,
+    ema_slope_near_ema: ema_slope_near_ema_panel,
+    above_and_near_ema: above_and_near_ema_panel,
+}
+
+
+# --- Strategies ---
+
+MOMENTUM_5M = Strategy(
+    name="5m_momentum",
+    interval="5m",
+    period="60d",
+    ema_span=22,
+    min_bars=60,
+    conditions=[gap_up_near_ema, momentum_near_ema, ema_slope_near_ema],
+    params={
+        "momentum_length": 5,
+        "required_strong_candles": 3,
+        "body_pct": 0.005,
+        "lookback": 65,
+        "ema_percent": 0.0035,  # 0.35%
+    },
+    target_mult=1.01,
+    stop_mult=0.995,
+    sink=MongoSink("scan_5m"),
+    prefilter=Prefilter(),
+)
+
+MOMENTUM_1M = Strategy(
+    name="1m_momentum",
+    interval="1m",
+    period="8d",
+    ema_span=9,
+    min_bars=80,
+    conditions=[momentum_near_ema],
+    params={
+        "momentum_length": 7,
+        "required_strong_candles": 4,
+        "body_pct": 0.003,
+        "lookback": 85,
+        "ema_percent": 0.002,
+    },
+    target_mult=1.005,
+    stop_mult=0.995,
+    horizon=timedelta(hours=3),
+    sink=MongoSink("scan_1m"),
+    prefilter=Prefilter(),
+)
+
+DAILY_44EMA = Strategy(
+    name="44ema_daily",
+    interval="1d",
+    period="120d",
+    ema_span=44,
+    min_bars=50,
+    conditions=[above_and_near_ema],
+    params={"ema_percent": 0.01},  # 1% proximity
+    # Same swing levels the chart draws for 1d. Unlike the original daily scan, each match
+    # in results_44_daily.json therefore carries `target` / `stop_loss`; walkforward.py
+    # and sweep.py need them for their default exits.
+    target_mult=1.15,
+    stop_mult=0.92,
+    horizon=timedelta(days=30),
+    sink=JsonSink(os.path.join(SCAN_DIR, "results_44_daily.json")),
+)
+
+STRATEGIES = {
+    "5m": MOMENTUM_5M,
+    "1m": MOMENTUM_1M,
+    "daily": DAILY_44EMA,
+}
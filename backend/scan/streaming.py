@@ -0,0 +1,329 @@
+"""
+streaming.py
+
+Incremental (streaming) indicator and condition state for live intraday scanning.
+
+`SymbolState` keeps everything the strategy conditions need for one symbol and updates it
+in O(1) per new bar:
+- the EMA value (same recurrence as `ewm(span, adjust=False)`)
+- the strong-candle window (flags + running sum) and the momentum look-back window
+- the EMA rising-streak run length and its look-back window
+- the session open / prior session close for gap-up detection
+- Wilder's ATR (`atr_period`) for strategies with ATR exits, so streamed matches get the
+  same target/stop as the batch engines
+
+Feeding bars one at a time gives exactly the same signals as recomputing the
+walk-forward conditions over the same bars. `StreamingScanner` keeps one state per
+symbol, applies only bars newer than what it has seen (a re-sent, still-forming last bar
+is rolled back and re-applied) and checkpoints all states to a JSON file (without the
+still-forming bar, which is re-applied after a restart), so a scan cycle
+is a small update per symbol instead of a recomputation over 60 days of bars.
+
+`StreamingScanner` is standalone: the scan worker and the bar-close scheduler run the
+batch engines (`run_strategies`), and this module only runs from its own CLI.
+test_streaming.py checks the states against the walk-forward twins bar by bar.
+
+ Usage:
+    python streaming.py 1m 5m       # streaming scan cycle, state in store/state/
+"""
+
+import json
+import os
+import sys
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from bar_store import default_store
+from run_report import RunReport
+from scan_engine import build_doc, load_symbols
+import strategies as st
+
+GAP_UP = 0.03
+STREAK_REQUIRED, STREAK_MIN_STEP, STREAK_START, STREAK_STOP = 5, 0.001, 60, 10
+
+
+class _DelayedWindow:
+    """
+    Running count of True flags among items pushed between `delay + size` and `delay + 1`
+    pushes ago (i.e. a look-back window that excludes the newest `delay` items).
+    """
+
+    def __init__(self, delay, size):
+        self.delay = delay
+        self.size = max(size, 0)
+        self.recent = deque()
+        self.older = deque()
+        self.count = 0
+
+    def push(self, flag):
+        self.recent.append(bool(flag))
+        if len(self.recent) > self.delay:
+            moved = self.recent.popleft()
+            if self.size:
+                self.older.append(moved)
+                self.count += moved
+                if len(self.older) > self.size:
+                    self.count -= self.older.popleft()
+
+    def any(self):
+        return self.count > 0
+
+    def to_dict(self):
+        return {"recent": list(self.recent), "older": list(self.older)}
+
+    def load(self, d):
+        self.recent = deque(d["recent"])
+        self.older = deque(d["older"])
+        self.count = sum(self.older)
+
+
+class SymbolState:
+    def __init__(self, strategy):
+        p = strategy.params
+        self.span = strategy.ema_span
+        self.alpha = 2 / (strategy.ema_span + 1)
+        self.length = p.get("momentum_length", 0)
+        self.body_pct = p.get("body_pct", 0.0)
+        self.required = p.get("required_strong_candles", 0)
+        lookback = p.get("lookback", 0)
+        self.atr_period = strategy.atr_period if strategy.atr_name else None
+
+        self.n = 0
+        self.last_ts = None
+        self.ema = None
+        self.prev_ema = None
+        self.open = self.high = self.low = self.close = self.volume = None
+        # Wilder ATR: smoothed true range (as ewm(alpha=1/n, adjust=False)) over `atr_bars` bars
+        self.atr_smoothed = None
+        self.atr_bars = 0
+        self.session = None
+        self.session_gap = False
+        # strong-candle window: (strong vs previous high, bullish body) for the last `length` bars
+        self.candles = deque()
+        self.strong_sum = 0
+        # momentum: window ends from t+1-lookback to t-5
+        self.momentum = _DelayedWindow(5, lookback - 5)
+        # EMA rising streak: run ends from t+1-START+REQUIRED to t-STOP
+        self.run = 0
+        self.streak = _DelayedWindow(STREAK_STOP, STREAK_START - STREAK_STOP - STREAK_REQUIRED)
+        self._undo = None
+
+    # --- updates ---
+
+    def update(self, ts, open_, high, low, close, volume=0):
+        """Applies one closed bar."""
+        o, h, l, c = float(open_), float(high), float(low), float(close)
+
+        # gap-up: first bar of a new session vs previous session's last close
+        day = pd.Timestamp(ts).normalize()
+        if day != self.session:
+            prev_close = self.close
+            self.session_gap = prev_close is not None and prev_close != 0 and \
+                (o - prev_close) / prev_close > GAP_UP
+            self.session = day
+
+        # strong candles
+        bullish = c > o and o != 0 and (c - o) / o > self.body_pct
+        strong = bullish and self.high is not None and c > self.high
+        if self.length:
+            self.candles.append((strong, bullish))
+            self.strong_sum += strong
+            if len(self.candles) > self.length:
+                self.strong_sum -= self.candles.popleft()[0]
+            if len(self.candles) == self.length:
+                count = self.strong_sum - self.candles[0][0] + self.candles[0][1]
+                self.momentum.push(count >= self.required)
+            else:
+                self.momentum.push(False)
+
+        # EMA + rising streak
+        self.prev_ema = self.ema
+        self.ema = c if self.ema is None else self.alpha * c + (1 - self.alpha) * self.ema
+        if self.prev_ema is not None and self.prev_ema != 0 and \
+                (self.ema - self.prev_ema) / self.prev_ema >= STREAK_MIN_STEP:
+            self.run += 1
+        else:
+            self.run = 0
+        self.streak.push(self.run >= STREAK_REQUIRED)
+
+        # ATR (true range of the first bar is its high - low, as in the indicator kernel)
+        if self.atr_period:
+            tr = h - l if self.close is None else max(h - l, abs(h - self.close), abs(l - self.close))
+            alpha = 1.0 / self.atr_period
+            self.atr_smoothed = tr if self.atr_smoothed is None else \
+                (1 - alpha) * self.atr_smoothed + alpha * tr
+            self.atr_bars += 1
+
+        self.open, self.high, self.low, self.close, self.volume = o, h, l, c, float(volume)
+        self.last_ts = pd.Timestamp(ts)
+        self.n += 1
+
+    def feed(self, data):
+        """
+        Applies the bars of `data` newer than the last one seen. If the last seen bar is
+        re-sent (it was still forming), its earlier version is rolled back first.
+        Returns the number of bars applied.
+        """
+        if data.empty:
+            return 0
+        if self._undo is not None and self._undo[1] in data.index:
+            committed, _ = self._undo
+            self.load(committed)
+        if self.last_ts is not None:
+            data = data[data.index > self.last_ts]
+        if data.empty:
+            return 0
+
+        rows = list(zip(data.index, data["Open"].to_numpy(), data["High"].to_numpy(), data["Low"].to_numpy(),
+                        data["Close"].to_numpy(), data["Volume"].to_numpy()))
+        for row in rows[:-1]:
+            self.update(*row)
+        # The newest bar may still be forming: remember the state without it
+        committed = self.to_dict()
+        self.update(*rows[-1])
+        self._undo = (committed, self.last_ts)
+        return len(rows)
+
+    def committed(self):
+        """State without a possibly still-forming last bar (what gets checkpointed)."""
+        return self._undo[0] if self._undo is not None else self.to_dict()
+
+    # --- signals ---
+
+    @property
+    def atr(self):
+        """ATR at the last bar (None without ATR exits or before `atr_period` bars)."""
+        if not self.atr_period or self.atr_bars < self.atr_period:
+            return None
+        return self.atr_smoothed
+
+    def ema_distance(self, relative_to="close"):
+        return abs(self.close - self.ema) / (self.close if relative_to == "close" else self.ema)
+
+    def signals(self, params):
+        """Current value of every condition, matching the walk-forward twins."""
+        pct = params.get("ema_percent", 0)
+        near_close = self.ema_distance() < pct
+        return {
+            st.momentum_near_ema: self.momentum.any() and near_close,
+            st.gap_up_near_ema: self.session_gap and near_close,
+            st.ema_slope_near_ema: self.streak.any() and self.ema_distance("ema") < pct,
+            st.above_and_near_ema: self.close - self.ema >= 0 and near_close,
+        }
+
+    def matches(self, strategy):
+        if self.n < strategy.min_bars:
+            return False
+        signals = self.signals(strategy.params)
+        return any(signals[cond] for cond in strategy.conditions)
+
+    # --- checkpointing ---
+
+    def to_dict(self):
+        return {
+            "n": self.n,
+            "last_ts": self.last_ts.isoformat() if self.last_ts is not None else None,
+            "ema": self.ema,
+            "prev_ema": self.prev_ema,
+            "bar": [self.open, self.high, self.low, self.close, self.volume],
+            "session": self.session.isoformat() if self.session is not None else None,
+            "session_gap": self.session_gap,
+            "candles": [list(c) for c in self.candles],
+            "momentum": self.momentum.to_dict(),
+            "run": self.run,
+            "streak": self.streak.to_dict(),
+            "atr": [self.atr_smoothed, self.atr_bars],
+        }
+
+    def load(self, d):
+        self.n = d["n"]
+        self.last_ts = pd.Timestamp(d["last_ts"]) if d["last_ts"] else None
+        self.ema, self.prev_ema = d["ema"], d["prev_ema"]
+        if len(d["bar"]) == 4:  # checkpoints written before the low and ATR were tracked
+            d = dict(d, bar=d["bar"][:2] + [None] + d["bar"][2:])
+        self.open, self.high, self.low, self.close, self.volume = d["bar"]
+        self.session = pd.Timestamp(d["session"]) if d["session"] else None
+        self.session_gap = d["session_gap"]
+        self.candles = deque(tuple(c) for c in d["candles"])
+        self.strong_sum = sum(c[0] for c in self.candles)
+        self.momentum.load(d["momentum"])
+        self.run = d["run"]
+        self.streak.load(d["streak"])
+        self.atr_smoothed, self.atr_bars = d.get("atr", [None, 0])
+        self._undo = None
+        return self
+
+
+class StreamingScanner:
+    """Per-symbol SymbolState for one strategy, checkpointed to `state_dir/{strategy}.json`."""
+
+    def __init__(self, strategy, state_dir=None, store=None):
+        self.strategy = strategy
+        self.store = store or default_store()
+        self.state_dir = state_dir or os.path.join(self.store.root, "state")
+        self.path = os.path.join(self.state_dir, f"{strategy.name}.json")
+        self.states = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            self.states = {s: SymbolState(self.strategy).load(d) for s, d in saved.items()}
+
+    def checkpoint(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({s: state.committed() for s, state in self.states.items()}, f)
+        os.replace(tmp, self.path)
+
+    def state(self, symbol):
+        if symbol not in self.states:
+            self.states[symbol] = SymbolState(self.strategy)
+        return self.states[symbol]
+
+    def scan(self, symbols=None, scan_date=None):
+        """One live cycle: top up bars, feed the new ones, emit matches to the sink."""
+        strategy = self.strategy
+        symbols = symbols if symbols is not None else load_symbols(strategy.universe)
+        scan_date = scan_date or datetime.now().strftime("%Y-%m-%d")
+        docs = []
+
+        with RunReport(f"stream_{strategy.name}", meta={"symbols": len(symbols)}) as report:
+            loaded = self.store.load_many(symbols, strategy.interval, strategy.period)
+            for symbol, data in report.timed_iter(loaded, f"load.{strategy.interval}"):
+                if data.empty:
+                    report.count("skipped_no_data")
+                    continue
+                try:
+                    with report.symbol(symbol):
+                        state = self.state(symbol)
+                        with report.stage("feed"):
+                            state.feed(data)
+                        if state.matches(strategy):
+                            report.count("matched")
+                            doc = build_doc(strategy, symbol, state.close, state.ema, state.volume,
+                                            state.last_ts, scan_date, atr=state.atr)
+                            docs.append(doc)
+                            if strategy.sink is not None:
+                                strategy.sink.add(doc)
+                except Exception as e:
+                    report.count("errors")
+                    print(f"❌ Error with {symbol} ({strategy.name}): {e}")
+
+            if strategy.sink is not None:
+                with report.stage("sink_flush"):
+                    strategy.sink.flush()
+            with report.stage("checkpoint"):
+                self.checkpoint()
+        print(f"\n✅ {strategy.name} streaming scan complete. {len(docs)} stock(s) matched.")
+        return docs
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or ["1m", "5m"]
+    for name in names:
+        StreamingScanner(st.STRATEGIES[name]).scan()
@@ -0,0 +1,176 @@
+"""
+sweep.py
+
+Parameter sweep (grid search) for a scan strategy over the local bar store.
+
+Every grid point is walk-forward backtested over the whole universe, but the expensive
+pieces are computed once per symbol and shared across grid points: the EMA (one per
+strategy span), the strong-candle counts per (momentum_length, body_pct), the momentum
+flags, gap-up flags, EMA streaks and EMA distances (see the `cache` argument of the
+vectorized conditions in strategies.py). Symbols are spread across worker processes and
+each worker returns per-grid-point tallies, which are summed and ranked.
+
+Grid keys are strategy params (momentum_length, required_strong_candles, ema_percent,
+body_pct, lookback) plus `target` and `stop` multipliers (points without them use the
+strategy's own exits, ATR-based ones included).
+
+ Usage:
+    python sweep.py 5m
+    python sweep.py 5m --grid momentum_length=5,7 --grid ema_percent=0.0025,0.0035,0.005 \\
+                       --grid target=1.005,1.01 --grid stop=0.995,0.99 --out sweep_5m.csv
+"""
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, DEFAULT_ROOT
+from scan_engine import load_symbols
+from strategies import STRATEGIES
+from walkforward import build_merged, signal_mask, first_per_session, bar_ns, exit_atr, exit_levels
+import trade_resolver as tr
+
+DEFAULT_GRIDS = {
+    "5m": {
+        "momentum_length": [5, 7],
+        "required_strong_candles": [2, 3],
+        "ema_percent": [0.0025, 0.0035, 0.005],
+        "body_pct": [0.003, 0.005],
+        "target": [1.01],
+        "stop": [0.995],
+    },
+    "1m": {
+        "momentum_length": [5, 7],
+        "required_strong_candles": [3, 4],
+        "ema_percent": [0.0015, 0.002, 0.003],
+        "body_pct": [0.002, 0.003],
+        "target": [1.005],
+        "stop": [0.995],
+    },
+    "daily": {
+        "ema_percent": [0.005, 0.01, 0.02],
+        "target": [1.1, 1.15],
+        "stop": [0.92, 0.95],
+    },
+}
+
+STAT_FIELDS = ["trades", "wins", "losses", "ambiguous", "no_hit", "return_sum"]
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _sweep_symbol(job):
+    """Returns a (grid points × STAT_FIELDS) array of tallies for one symbol."""
+    root, name, symbol, points = job
+    strategy = STRATEGIES[name]
+    stats = np.zeros((len(points), len(STAT_FIELDS)))
+    data = BarStore(root).read(symbol, strategy.interval)
+    if data.empty:
+        return stats, 0
+
+    merged = build_merged(strategy, data)  # EMA computed once per symbol
+    if len(merged) < strategy.min_bars:
+        return stats, len(merged)
+
+    cache = {}
+    times = bar_ns(merged.index)
+    close = merged["Close"].to_numpy()
+    high = merged["High"].to_numpy()
+    low = data["Low"].reindex(merged.index).to_numpy()
+    horizon = pd.Timedelta(strategy.horizon).value
+    atr = exit_atr(strategy, data)
+
+    for i, point in enumerate(points):
+        params = {**strategy.params, **{k: v for k, v in point.items() if k not in ("target", "stop")}}
+
+        signal = signal_mask(strategy, merged, data, params, cache)
+        picked = first_per_session(merged.index, signal)
+        if len(picked) == 0:
+            continue
+
+        entries = close[picked]
+        targets, stops = exit_levels(strategy, entries, atr[picked] if atr is not None else None,
+                                     point.get("target"), point.get("stop"))
+        res = tr.resolve(times[picked], entries, targets, stops, times, high, low, horizon)
+        outcome = res["outcome"]
+        won, lost = outcome == "win", (outcome == "loss") | (outcome == "ambiguous")
+        stats[i] = [
+            len(picked), won.sum(), (outcome == "loss").sum(), (outcome == "ambiguous").sum(),
+            (outcome == "no_hit").sum(),
+            (targets[won] / entries[won] - 1).sum() + (stops[lost] / entries[lost] - 1).sum(),
+        ]
+    return stats, len(merged)
+
+
+def run_sweep(strategy_name, grid=None, symbols=None, workers=None, root=DEFAULT_ROOT):
+    """Evaluates every grid point over the universe. Returns (ranked DataFrame, seconds)."""
+    grid = grid or DEFAULT_GRIDS[strategy_name]
+    points = expand_grid(grid)
+    symbols = symbols if symbols is not None else load_symbols(STRATEGIES[strategy_name].universe)
+    jobs = [(root, strategy_name, s, points) for s in symbols]
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        collected = [_sweep_symbol(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collected = list(pool.map(_sweep_symbol, jobs, chunksize=8))
+    elapsed = time.perf_counter() - t0
+
+    totals = sum((stats for stats, _ in collected), np.zeros((len(points), len(STAT_FIELDS))))
+    table = pd.DataFrame(points)
+    for j, col in enumerate(STAT_FIELDS):
+        table[col] = totals[:, j]
+    for col in STAT_FIELDS[:-1]:
+        table[col] = table[col].astype(int)
+
+    decided = table["wins"] + table["losses"]
+    table["win_rate"] = np.where(decided > 0, table["wins"] / decided.where(decided > 0, 1) * 100, 0.0).round(2)
+    table["expectancy_pct"] = np.where(
+        table["trades"] > 0, table["return_sum"] / table["trades"].where(table["trades"] > 0, 1) * 100, 0.0
+    ).round(4)
+    table = table.drop(columns="return_sum")
+    table = table.sort_values(["win_rate", "trades"], ascending=False).reset_index(drop=True)
+    return table, elapsed
+
+
+def parse_grid(pairs):
+    grid = {}
+    for pair in pairs or []:
+        key, values = pair.split("=", 1)
+        grid[key] = [float(v) if "." in v else int(v) for v in values.split(",")]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search strategy thresholds over the bar store")
+    parser.add_argument("strategy", choices=list(STRATEGIES))
+    parser.add_argument("--grid", action="append", help="param=v1,v2,... (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="process count (1 = in-process)")
+    parser.add_argument("--min-trades", type=int, default=0, help="hide parameter sets with fewer trades")
+    parser.add_argument("--universe", default=None, help="universe expression or CSV (default: the strategy's)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write the full ranked table to CSV")
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.universe or STRATEGIES[args.strategy].universe)
+    table, elapsed = run_sweep(args.strategy, parse_grid(args.grid), symbols, args.workers)
+    ranked = table[table["trades"] >= args.min_trades]
+
+    print(ranked.head(args.top).to_string(index=False))
+    print(f"\n✅ {len(table)} parameter set(s) × {len(symbols)} symbols in {elapsed:.1f}s")
+
+    if args.out:
+        ranked.to_csv(args.out, index=False)
+        print(f"✅ Table saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
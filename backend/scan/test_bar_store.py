@@ -0,0 +1,139 @@
+"""
+BarStore on a FixtureProvider: cold loads, warm top-ups, compaction, retention, the
+cross-process lock and tails derived from fresh 1m bars.
+
+ Usage:
+    python -m pytest test_bar_store.py
+"""
+
+import os
+from datetime import timedelta
+from multiprocessing import Process
+
+import pandas as pd
+import pytest
+
+from bar_store import BarStore
+from bench_suite import synthetic_bars
+from ohlc_fetch import FixtureProvider
+
+SYMBOL = "INFY"
+OHLC = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class RecordingProvider(FixtureProvider):
+    """FixtureProvider that remembers the start / period of every request."""
+
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.requests = []
+
+    def download(self, symbols, interval, period=None, start=None, end=None):
+        self.requests.append((interval, period, start))
+        return super().download(symbols, interval, period=period, start=start, end=end)
+
+
+def recent(bars):
+    """Moves a fixture so its last session was yesterday (a warm tail for the store)."""
+    last = bars.index[-1].normalize()
+    yesterday = pd.Timestamp.now(tz=last.tz).normalize() - pd.Timedelta(days=1)
+    bars.index = bars.index + (yesterday - last)
+    return bars
+
+
+def same_bars(got, expected):
+    pd.testing.assert_frame_equal(got[OHLC], expected[OHLC], check_freq=False, check_dtype=False)
+
+
+@pytest.fixture
+def bars_5m():
+    return recent(synthetic_bars(300, "5m", seed=3))
+
+
+def test_cold_then_warm_fetches_only_new_bars(tmp_path, bars_5m):
+    provider = RecordingProvider({(SYMBOL, "5m"): bars_5m.iloc[:200]})
+    store = BarStore(str(tmp_path), provider=provider)
+
+    same_bars(store.load(SYMBOL, "5m", "30d"), bars_5m.iloc[:200])
+    assert provider.requests == [("5m", "30d", None)]  # cold: full period
+
+    provider.frames[(SYMBOL, "5m")] = bars_5m
+    same_bars(store.load(SYMBOL, "5m", "30d"), bars_5m)
+    assert provider.requests[1] == ("5m", None, bars_5m.index[199])  # warm: from the last stored bar
+    assert len(os.listdir(tmp_path / "5m" / SYMBOL)) > 1  # the tail went to a part file
+    same_bars(store.read(SYMBOL, "5m"), bars_5m)
+
+
+def test_longer_period_than_stored_is_a_cold_load(tmp_path, bars_5m):
+    provider = RecordingProvider({(SYMBOL, "5m"): bars_5m})
+    store = BarStore(str(tmp_path), provider=provider)
+    store.load(SYMBOL, "5m", "5d")
+    store.load(SYMBOL, "5m", "30d")
+    assert [r[1] for r in provider.requests] == ["5d", "30d"]
+
+
+def test_compaction_preserves_bars(tmp_path, bars_5m):
+    store = BarStore(str(tmp_path))
+    for start in range(0, 300, 50):
+        store.append(SYMBOL, "5m", bars_5m.iloc[max(start - 1, 0):start + 50])  # overlapping parts
+    assert len(store._parts(SYMBOL, "5m")) == 5
+
+    assert store.compact(SYMBOL, "5m") == 300
+    assert store._parts(SYMBOL, "5m") == []
+    same_bars(store.read(SYMBOL, "5m"), bars_5m)
+
+
+def test_retention_drops_old_bars(tmp_path, bars_5m):
+    store = BarStore(str(tmp_path), retention={"5m": timedelta(days=1)})
+    store.append(SYMBOL, "5m", bars_5m)
+    store.compact(SYMBOL, "5m")
+    kept = store.read(SYMBOL, "5m")
+    assert kept.index[0] >= bars_5m.index[-1] - timedelta(days=1)
+    same_bars(kept, bars_5m[bars_5m.index >= bars_5m.index[-1] - timedelta(days=1)])
+
+
+def _append_parts(root, offset):
+    store = BarStore(root)
+    bars = recent(synthetic_bars(300, "5m", seed=3))
+    for start in range(10 + offset * 10, 300, 40):
+        store.append(SYMBOL, "5m", bars.iloc[start:start + 10])
+
+
+def test_concurrent_writers_lose_nothing(tmp_path, bars_5m):
+    store = BarStore(str(tmp_path))
+    store.append(SYMBOL, "5m", bars_5m.iloc[:10])
+    writers = [Process(target=_append_parts, args=(str(tmp_path), k)) for k in range(4)]
+    for w in writers:
+        w.start()
+    for _ in range(20):
+        store.read(SYMBOL, "5m")  # never sees a half-written or vanished part
+    for w in writers:
+        w.join()
+    same_bars(store.read(SYMBOL, "5m"), bars_5m)
+
+
+def derive_setup(tmp_path):
+    bars_1m = recent(synthetic_bars(3 * 375, "1m", seed=5))
+    bars_5m = bars_1m.resample("5min", origin="start_day", offset="9h15min").agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}).dropna()
+    provider = RecordingProvider({(SYMBOL, "1m"): bars_1m, (SYMBOL, "5m"): bars_5m.iloc[:150]})
+    store = BarStore(str(tmp_path), provider=provider)
+    store.load(SYMBOL, "5m", "30d")
+    provider.frames[(SYMBOL, "5m")] = bars_5m
+    store.load(SYMBOL, "1m", "8d")
+    return store, provider, bars_5m
+
+
+def test_tail_derived_from_fresh_1m_bars(tmp_path):
+    store, provider, bars_5m = derive_setup(tmp_path)
+    requests = len(provider.requests)
+    same_bars(store.load(SYMBOL, "5m", "30d"), bars_5m)
+    assert len(provider.requests) == requests
+
+
+def test_stale_1m_bars_are_not_resampled(tmp_path):
+    store, provider, bars_5m = derive_setup(tmp_path)
+    store._refreshed[(SYMBOL, "1m")] -= timedelta(minutes=5)
+    requests = len(provider.requests)
+    same_bars(store.load(SYMBOL, "5m", "30d"), bars_5m)
+    assert provider.requests[requests:] == [("5m", None, bars_5m.index[149])]
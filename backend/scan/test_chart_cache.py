@@ -0,0 +1,127 @@
+"""
+ChartCache with an injected clock and loader: expiry at the bar close, the memory bound,
+single-flight loads and failed loads.
+
+ Usage:
+    python -m pytest test_chart_cache.py
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from chart_cache import IST, SETTLE_SECONDS, ChartCache, next_bar_close
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now.timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+class Loader:
+    """Counts loads; optionally blocks on `release` or fails the first `failures` calls."""
+
+    def __init__(self, size=10, failures=0, release=None):
+        self.size = size
+        self.failures = failures
+        self.release = release
+        self.calls = 0
+
+    def __call__(self, symbol, interval, **window):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.calls <= self.failures:
+            raise LookupError(f"No chart data for {symbol} ({interval})")
+        return f"{symbol}:{interval}:{self.calls}".encode().ljust(self.size)
+
+
+@pytest.mark.parametrize("interval", ["1m", "5m", "1d"])
+def test_entry_expires_at_the_bar_close(interval):
+    started = datetime(2024, 6, 28, 10, 2, 30, tzinfo=IST)  # a Friday, mid-session
+    clock, loader = Clock(started), Loader()
+    cache = ChartCache(loader=loader, clock=clock)
+    first = cache.get("INFY", interval)
+
+    expires = next_bar_close(interval, started).timestamp() + SETTLE_SECONDS
+    clock.now = expires - 0.001
+    assert cache.get("INFY", interval) is first
+    clock.now = expires
+    assert cache.get("INFY", interval) != first
+    assert loader.calls == 2
+    assert cache.stats["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ChartCache(loader=Loader(size=100), max_bytes=250,
+                       clock=Clock(datetime(2024, 6, 28, 10, 0, 1, tzinfo=IST)))
+    cache.get("INFY", "5m")
+    cache.get("TCS", "5m")
+    cache.get("INFY", "5m")  # TCS is now the least recently used
+    cache.get("WIPRO", "5m")
+
+    assert [key[0] for key in cache.entries] == ["INFY", "WIPRO"]
+    assert cache.counters()["bytes"] == 200
+    assert cache.stats["evictions"] == 1
+
+
+def test_payload_larger_than_the_bound_is_not_cached():
+    loader = Loader(size=300)
+    cache = ChartCache(loader=loader, max_bytes=250,
+                       clock=Clock(datetime(2024, 6, 28, 10, 0, 1, tzinfo=IST)))
+    cache.get("INFY", "5m")
+    cache.get("INFY", "5m")
+    assert loader.calls == 2 and cache.bytes == 0
+
+
+def _get_all(cache, n):
+    results, errors = [], []
+
+    def request():
+        try:
+            results.append(cache.get("INFY", "5m"))
+        except LookupError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(n)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while cache.stats["misses"] + cache.stats["coalesced"] < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return threads, results, errors
+
+
+def test_concurrent_requests_share_one_load():
+    release = threading.Event()
+    loader = Loader(release=release)
+    cache = ChartCache(loader=loader, clock=Clock(datetime(2024, 6, 28, 10, 0, 1, tzinfo=IST)))
+
+    threads, results, errors = _get_all(cache, 8)
+    release.set()
+    for t in threads:
+        t.join()
+    assert loader.calls == 1
+    assert len(results) == 8 and len(set(results)) == 1 and not errors
+    assert (cache.stats["misses"], cache.stats["coalesced"]) == (1, 7)
+
+
+def test_failed_load_is_not_cached():
+    release = threading.Event()
+    loader = Loader(failures=1, release=release)
+    cache = ChartCache(loader=loader, clock=Clock(datetime(2024, 6, 28, 10, 0, 1, tzinfo=IST)))
+
+    threads, results, errors = _get_all(cache, 4)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(errors) == 4 and not results  # the waiters see the owner's failure
+    assert not cache.entries and not cache.in_flight
+
+    assert cache.get("INFY", "5m").startswith(b"INFY:5m:2")
+    assert loader.calls == 2
@@ -0,0 +1,42 @@
+"""
+Indicator memo: a changed forming bar must never be served from the cache.
+
+ Usage:
+    python -m pytest test_indicators.py
+"""
+
+import numpy as np
+import pytest
+
+import indicators
+from bars import Bars
+from bench_suite import synthetic_bars
+
+NAMES = ["atr14", "rsi14", "vwap", "ema22"]
+
+
+@pytest.mark.parametrize("field", ["high", "low", "volume"])
+def test_changed_forming_bar_is_recomputed(field):
+    data = synthetic_bars(300, "5m")
+    cache = indicators.IndicatorCache()
+    indicators.cached(Bars.from_frame(data), NAMES, "INFY", "5m", cache)
+
+    # same bars and last close, but the forming bar's high / low / volume moved
+    changed = data.copy()
+    column = field.capitalize()
+    changed.iloc[-1, changed.columns.get_loc(column)] *= 0.95 if field == "low" else 1.05
+    bars = Bars.from_frame(changed)
+    got = indicators.cached(bars, NAMES, "INFY", "5m", cache)
+    expected = indicators.compute(bars, NAMES)
+    for name in NAMES:
+        np.testing.assert_array_equal(got[name], expected[name])
+    assert cache.stats["hits"] == 0
+
+
+def test_unchanged_bars_hit():
+    data = synthetic_bars(300, "5m")
+    cache = indicators.IndicatorCache()
+    first = indicators.cached(Bars.from_frame(data), NAMES, "INFY", "5m", cache)
+    again = indicators.cached(Bars.from_frame(data.copy()), NAMES, "INFY", "5m", cache)
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+    assert all(first[n] is again[n] for n in NAMES)
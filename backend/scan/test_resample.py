@@ -0,0 +1,93 @@
+"""
+Resampling on fixture data: 1m fixture bars resampled to 5m/15m/30m/1h must equal the
+provider's own bars, here fixture bars aggregated independently with pandas on a grid
+anchored at the 09:15 session open. Both go through a BarStore backed by a
+FixtureProvider, as in production.
+
+ Usage:
+    python -m pytest test_resample.py
+"""
+
+import pandas as pd
+import pytest
+
+import resample
+from bar_store import BarStore
+from bench_suite import synthetic_bars
+from ohlc_fetch import FixtureProvider
+
+SYMBOL = "INFY"
+AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def fixture_1m(missing=0.05, recent=False):
+    """Three sessions of 1m bars with a few minutes missing (no trades)."""
+    bars = synthetic_bars(3 * 375, "1m", seed=7, missing=missing)
+    if recent:
+        # last session yesterday, so the store tops the symbol up as a warm tail
+        last = bars.index[-1].normalize()
+        yesterday = pd.Timestamp.now(tz=last.tz).normalize() - pd.Timedelta(days=1)
+        bars.index = bars.index + (yesterday - last)
+    return bars
+
+
+def provider_bars(bars_1m, interval):
+    """What the provider would serve for `interval`: buckets from 09:15, empty ones dropped."""
+    rule = {"5m": "5min", "15m": "15min", "30m": "30min", "1h": "60min"}[interval]
+    out = bars_1m.resample(rule, origin="start_day", offset="9h15min").agg(AGG)
+    return out.dropna(subset=["Open"])
+
+
+@pytest.mark.parametrize("interval", ["5m", "15m", "30m", "1h"])
+def test_resampled_fixture_matches_provider_bars(tmp_path, interval):
+    bars_1m = fixture_1m()
+    provider = FixtureProvider({(SYMBOL, "1m"): bars_1m, (SYMBOL, interval): provider_bars(bars_1m, interval)})
+    store = BarStore(str(tmp_path), provider=provider)
+    store.load(SYMBOL, "1m", "8d")
+    store.load(SYMBOL, interval, "60d")
+
+    compared, ohlc_bad, volume_bad = resample.check(SYMBOL, interval, store)
+    assert compared == len(provider_bars(bars_1m, interval))
+    assert (ohlc_bad, volume_bad) == (0, 0)
+
+
+def test_partial_flags_missing_minutes():
+    bars_1m = fixture_1m()
+    derived = resample.resample(bars_1m, "5m")
+    counts = bars_1m.resample("5min", origin="start_day", offset="9h15min")["Close"].count()
+    assert (derived["Partial"].to_numpy() == (counts[counts > 0] < 5).to_numpy()).all()
+    assert not derived["Forming"].any()
+
+
+def warm_store(tmp_path):
+    """A store with the first two sessions of 5m bars; the provider now has all three."""
+    bars_1m = fixture_1m(missing=0, recent=True)
+    bars_5m = provider_bars(bars_1m, "5m")
+    provider = FixtureProvider({(SYMBOL, "1m"): bars_1m, (SYMBOL, "5m"): bars_5m.iloc[:150]})
+    store = BarStore(str(tmp_path), provider=provider)
+    store.load(SYMBOL, "5m", "30d")
+    provider.frames[(SYMBOL, "5m")] = bars_5m
+    return store, provider, bars_1m, bars_5m
+
+
+def test_warm_tail_is_derived_from_fresh_1m_bars(tmp_path):
+    store, provider, bars_1m, bars_5m = warm_store(tmp_path)
+    store.load(SYMBOL, "1m", "8d")
+    calls = provider.calls
+
+    data = store.load(SYMBOL, "5m", "30d")
+    assert provider.calls == calls  # no second download
+    pd.testing.assert_frame_equal(data[list(AGG)], bars_5m, check_freq=False, check_dtype=False)
+
+
+def test_failed_1m_fetch_does_not_mark_1m_fresh(tmp_path):
+    store, provider, bars_1m, bars_5m = warm_store(tmp_path)
+    store.load(SYMBOL, "1m", "8d")
+    store._refreshed.clear()
+    del provider.frames[(SYMBOL, "1m")]  # the warm 1m top-up comes back empty
+    store.load(SYMBOL, "1m", "8d")
+    assert (SYMBOL, "1m") not in store._refreshed
+
+    calls = provider.calls
+    store.load(SYMBOL, "5m", "30d")
+    assert provider.calls == calls + 1  # downloaded instead of derived from stale 1m bars
@@ -0,0 +1,196 @@
+"""
+Bulk result writes against an in-memory stand-in for a Mongo collection.
+
+`FakeCollection` applies the UpdateOne operations the sinks and backtests queue (plain
+`$set` updates and the aggregation-pipeline upserts of MongoSink) and counts
+`bulk_write` calls, i.e. round-trips to the server.
+
+ Usage:
+    python -m pytest test_result_sinks.py
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import UpdateOne
+
+import result_sinks
+from mongo import flush_bulk
+from trade_resolver import BACKTEST_FIELDS, backtest_update
+
+REMOVE = object()   # $$REMOVE
+MISSING = object()  # a field path the document does not have
+
+
+class FakeCollection:
+    def __init__(self, name="scan_5m"):
+        self.name = name
+        self.docs = []
+        self.bulk_writes = 0
+
+    def create_index(self, keys, **kwargs):
+        pass
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_writes += 1
+        for op in ops:
+            self._apply(op._filter, op._doc, op._upsert)
+
+    def _apply(self, query, update, upsert):
+        doc = next((d for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = dict(query)
+            self.docs.append(doc)
+        stages = update if isinstance(update, list) else [update]
+        for stage in stages:
+            (op, fields), = stage.items()
+            assert op == "$set", op
+            # a pipeline $set evaluates every expression against the document before it
+            values = {k: evaluate(v, doc) if isinstance(update, list) else v for k, v in fields.items()}
+            for key, value in values.items():
+                if value is REMOVE or value is MISSING:
+                    doc.pop(key, None)
+                else:
+                    doc[key] = value
+
+
+def evaluate(expr, doc):
+    """The aggregation expressions the sinks use."""
+    if isinstance(expr, str):
+        if expr == "$$REMOVE":
+            return REMOVE
+        return doc.get(expr[1:], MISSING) if expr.startswith("$") else expr
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$literal":
+        return args
+    if op == "$cond":
+        condition, then, otherwise = args
+        return evaluate(then if evaluate(condition, doc) else otherwise, doc)
+    values = [evaluate(a, doc) for a in args]
+    if op == "$ifNull":
+        return next((v for v in values if v is not None and v is not MISSING), None)
+    if op == "$in":
+        return values[0] in values[1]
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$ne":
+        return values[0] != values[1]
+    if op == "$or":
+        return any(values)
+    if op == "$and":
+        return all(values)
+    raise NotImplementedError(op)
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(result_sinks, "get_collection", lambda name: collection)
+    monkeypatch.setattr(result_sinks, "refresh_daily_stats", lambda collection, keys: None)
+    return collection
+
+
+def match(symbol, close=100.0, timestamp="2024-06-28T10:00:00+05:30"):
+    return {
+        "symbol": symbol,
+        "close": close,
+        "ema22": 99.0,
+        "volume": 1000,
+        "timestamp": timestamp,
+        "scan_date": "2024-06-28",
+        "strategy": "5m_momentum",
+        "target": close * 1.02,
+        "stop_loss": close * 0.99,
+    }
+
+
+def test_sink_writes_one_round_trip_per_chunk(collection, monkeypatch):
+    monkeypatch.setattr(result_sinks, "flush_bulk", lambda c, ops: flush_bulk(c, ops, chunk_size=100))
+    sink = result_sinks.MongoSink("scan_5m")
+    for i in range(250):
+        sink.add(match(f"S{i}"))
+    sink.flush()
+    assert collection.bulk_writes == 3
+    assert len(collection.docs) == 250
+    assert {d["status"] for d in collection.docs} == {"pending"}
+
+    sink.flush()  # nothing queued → no round-trip
+    assert collection.bulk_writes == 3
+
+
+def test_reupsert_keeps_evaluated_status(collection):
+    sink = result_sinks.MongoSink("scan_5m")
+    sink.add(match("INFY"))
+    sink.add(match("TCS"))
+    sink.flush()
+    for doc in collection.docs:
+        doc["status"] = "win" if doc["symbol"] == "INFY" else "pending"
+
+    sink.add(match("INFY"))
+    sink.add(match("TCS"))
+    sink.flush()
+    assert len(collection.docs) == 2
+    assert {d["symbol"]: d["status"] for d in collection.docs} == {"INFY": "win", "TCS": "pending"}
+
+
+def test_backtest_updates_one_round_trip_per_chunk():
+    collection = FakeCollection()
+    now = datetime(2024, 6, 28, 12, 0, tzinfo=timezone.utc)
+    trades = [dict(match(f"S{i}"), _id=i, status="pending") for i in range(1001)]
+    collection.docs = [dict(t) for t in trades]
+    res = {"outcome": "win", "bars_to_exit": 3, "exit_time": now.isoformat(), "mae": 0.001,
+           "mfe": 0.02, "cursor": now.isoformat(), "bars_evaluated": 3, "future_bars": 3}
+    ops = [UpdateOne({"_id": t["_id"]}, {"$set": backtest_update(t, res, now, timedelta(days=2))})
+           for t in trades]
+
+    assert flush_bulk(collection, ops) == 3  # chunks of 500
+    assert collection.bulk_writes == 3
+    assert all(d["status"] == "win" and d["backtest_done"] for d in collection.docs)
+
+
+def backtested(collection, symbol, **fields):
+    doc = next(d for d in collection.docs if d["symbol"] == symbol)
+    doc.update({"backtest_cursor": "2024-06-28T05:00:00+00:00", "backtest_bars": 12, "mae": 0.004,
+                "mfe": 0.006, "backtest_retries": 2, "backtest_next_try": None}, **fields)
+    return doc
+
+
+def test_new_entry_resets_open_backtest(collection):
+    sink = result_sinks.MongoSink("scan_5m")
+    for symbol in ("INFY", "TCS", "WIPRO"):
+        sink.add(match(symbol))
+    sink.flush()
+    backtested(collection, "INFY", status="no_hit", backtest_done=True)
+    backtested(collection, "TCS", status="no_data", backtest_done=True)
+    backtested(collection, "WIPRO", status="no_hit", backtest_done=False)
+
+    later = "2024-06-28T11:30:00+05:30"
+    sink.add(match("INFY", timestamp=later))
+    sink.add(match("TCS", close=101.5))
+    sink.add(match("WIPRO"))  # same entry → progress kept
+    sink.flush()
+
+    docs = {d["symbol"]: d for d in collection.docs}
+    for symbol in ("INFY", "TCS"):
+        assert docs[symbol]["status"] == "pending"
+        assert not set(BACKTEST_FIELDS) & set(docs[symbol])
+    assert docs["INFY"]["timestamp"] == later and docs["TCS"]["close"] == 101.5
+    assert docs["WIPRO"]["status"] == "no_hit" and docs["WIPRO"]["backtest_cursor"]
+    assert docs["WIPRO"]["backtest_bars"] == 12
+
+
+def test_new_entry_keeps_closed_trade(collection):
+    sink = result_sinks.MongoSink("scan_5m")
+    sink.add(match("INFY"))
+    sink.flush()
+    before = dict(backtested(collection, "INFY", status="win", backtest_done=True, exit_time="x"))
+
+    sink.add(match("INFY", timestamp="2024-06-28T11:30:00+05:30"))
+    sink.flush()
+    doc = collection.docs[0]
+    assert doc["status"] == "win"
+    assert {k: doc.get(k) for k in BACKTEST_FIELDS} == {k: before.get(k) for k in BACKTEST_FIELDS}
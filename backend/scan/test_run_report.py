@@ -0,0 +1,38 @@
+"""
+RunReport files: unique names for same-second runs and the per-run retention cap.
+
+ Usage:
+    python -m pytest test_run_report.py
+"""
+
+import os
+
+from run_report import RunReport
+
+
+def run(name, report_dir, keep=3):
+    with RunReport(name, report_dir=str(report_dir), keep=keep) as report:
+        report.count("matched")
+    return report.path
+
+
+def test_same_second_runs_get_their_own_file(tmp_path):
+    paths = [run("scan_5m", tmp_path, keep=None) for _ in range(5)]
+    assert len(set(paths)) == 5
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_only_the_newest_reports_of_a_run_are_kept(tmp_path):
+    other = run("scan_5m-replay", tmp_path)
+    paths = []
+    for i in range(6):
+        paths.append(run("scan_5m", tmp_path))
+        os.utime(paths[-1], (i, i))  # oldest first, whatever the clock resolution
+        (tmp_path / os.path.basename(paths[-1]).replace(".json", ".prof")).write_bytes(b"")
+    run("scan_5m", tmp_path)
+
+    kept = sorted(os.listdir(tmp_path))
+    assert os.path.basename(other) in kept  # another run's reports are untouched
+    assert sum(name.startswith("scan_5m-2") and name.endswith(".json") for name in kept) == 3
+    for path in paths[:4]:
+        assert not os.path.exists(path) and not os.path.exists(path.replace(".json", ".prof"))
@@ -0,0 +1,119 @@
+"""
+Scheduler on a SimulatedClock with a fake runner and pre-warmer: pre-warm before the open,
+runs at every bar close + settle, skipped closes while a run is going, market hours only
+and `fresh()`.
+
+ Usage:
+    python -m pytest test_scheduler.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from chart_cache import IST
+from scheduler import Scheduler, SimulatedClock
+
+SETTLE = 20
+FRIDAY = datetime(2024, 6, 28, tzinfo=IST)
+
+
+def at(day, hour, minute, second=0):
+    return day.replace(hour=hour, minute=minute, second=second)
+
+
+class Replay:
+    """A scheduler whose runs and pre-warms only record the time and take `run_seconds`."""
+
+    def __init__(self, start, run_seconds=5):
+        self.clock = SimulatedClock(start)
+        self.runs, self.prewarms = [], []
+
+        def runner(keys):
+            self.runs.append((self.clock.now(), keys))
+            self.clock.advance(run_seconds)
+            return {f"{key}_momentum": [{"symbol": "INFY"}] for key in keys}
+
+        def prewarmer(keys):
+            self.prewarms.append(self.clock.now())
+            self.clock.advance(120)
+
+        self.scheduler = Scheduler(["5m", "1m"], settle=SETTLE, clock=self.clock,
+                                   runner=runner, prewarmer=prewarmer)
+
+    def until(self, end):
+        self.scheduler.run(until=end)
+        return self
+
+    def runs_of(self, key):
+        return [when for when, keys in self.runs if key in keys]
+
+
+@pytest.fixture(scope="module")
+def day():
+    return Replay(at(FRIDAY, 8, 30)).until(at(FRIDAY, 16, 0))
+
+
+def test_prewarm_runs_once_before_the_open(day):
+    assert day.prewarms == [at(FRIDAY, 9, 0)]
+    assert day.scheduler.stats["prewarms"] == 1
+
+
+def test_first_runs_after_the_first_bar_closes(day):
+    assert day.runs[0] == (at(FRIDAY, 9, 16, SETTLE), ["1m"])
+    assert day.runs_of("5m")[0] == at(FRIDAY, 9, 20, SETTLE)
+
+
+def test_1m_and_5m_run_together_on_shared_closes(day):
+    keys = dict(day.runs)
+    assert keys[at(FRIDAY, 10, 0, SETTLE)] == ["5m", "1m"]
+    assert keys[at(FRIDAY, 10, 1, SETTLE)] == ["1m"]
+    assert len(day.runs_of("1m")) == 375 and len(day.runs_of("5m")) == 75
+    assert len(day.runs) == 375 and day.scheduler.stats["skipped"] == 0
+
+
+def test_no_runs_after_the_close(day):
+    assert day.runs[-1] == (at(FRIDAY, 15, 30, SETTLE), ["5m", "1m"])
+
+
+def test_closes_passed_during_a_run_are_skipped():
+    slow = Replay(at(FRIDAY, 8, 30), run_seconds=75).until(at(FRIDAY, 16, 0))
+    starts = [when for when, _ in slow.runs]
+    assert all(b - a >= timedelta(seconds=75) for a, b in zip(starts, starts[1:]))  # never overlap
+    assert slow.scheduler.stats["skipped"] == 74
+    assert slow.scheduler.stats["runs"] == len(slow.runs) == 301
+    assert len(slow.runs) + slow.scheduler.stats["skipped"] == 375  # every 1m close run or skipped
+
+
+def test_nothing_runs_on_weekends():
+    saturday = at(FRIDAY + timedelta(days=1), 8, 30)
+    monday = FRIDAY + timedelta(days=3)
+    replay = Replay(saturday).until(at(monday, 0, 0))
+    assert replay.runs == [] and replay.prewarms == []
+
+    replay.until(at(monday, 9, 21))
+    assert replay.prewarms == [at(monday, 9, 0)]
+    assert replay.runs[0] == (at(monday, 9, 16, SETTLE), ["1m"])
+
+
+def test_fresh_until_the_next_settled_close():
+    replay = Replay(at(FRIDAY, 10, 4)).until(at(FRIDAY, 10, 5, 30))
+    scheduler, clock = replay.scheduler, replay.clock
+    assert scheduler.fresh("5m_momentum") and scheduler.fresh("1m_momentum")
+    assert scheduler.latest("5m_momentum")["docs"] == [{"symbol": "INFY"}]
+
+    clock.current = at(FRIDAY, 10, 6, SETTLE - 1)  # the 10:06 bar closed but has not settled
+    assert scheduler.fresh("1m_momentum")
+    clock.current = at(FRIDAY, 10, 6, SETTLE)
+    assert not scheduler.fresh("1m_momentum") and scheduler.fresh("5m_momentum")
+    clock.current = at(FRIDAY, 10, 10, SETTLE)
+    assert not scheduler.fresh("5m_momentum")
+
+    replay.until(at(FRIDAY, 10, 10, SETTLE + 1))
+    assert scheduler.fresh("5m_momentum") and scheduler.fresh("1m_momentum")
+    assert not scheduler.fresh("daily_44ema")  # not scheduled
+
+
+def test_fresh_is_false_before_any_run():
+    replay = Replay(at(FRIDAY, 10, 4))
+    assert not replay.scheduler.fresh("5m_momentum")
@@ -0,0 +1,127 @@
+"""
+Streaming state vs full recomputation: `SymbolState` fed one bar at a time must give, after
+every bar, the signals the walk-forward twins (strategies.VECTORIZED_CONDITIONS over the
+helpers.py signals) compute over all bars up to it.
+
+ Usage:
+    python -m pytest test_streaming.py
+"""
+
+import json
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+import indicators
+from bars import Bars
+from bench_suite import synthetic_bars
+from scan_engine import build_doc
+from streaming import SymbolState
+from strategies import STRATEGIES, VECTORIZED_CONDITIONS
+from walkforward import build_merged, signal_mask
+
+CASES = [("5m", seed) for seed in (1, 2, 3)] + [("1m", seed) for seed in (1, 2)] + [("daily", 1)]
+
+
+def session_data(key, seed):
+    strategy = STRATEGIES[key]
+    # strong drift bursts and frequent gaps so every condition fires somewhere
+    return strategy, synthetic_bars(600, strategy.interval, seed=seed, burst_prob=0.15, gap_prob=0.5)
+
+
+def expected(strategy, data):
+    """{condition: bool per bar} and the strategy's match per bar, recomputed in full."""
+    merged = build_merged(strategy, data)
+    conditions = {cond: VECTORIZED_CONDITIONS[cond](merged, data, strategy.params)
+                  for cond in strategy.conditions}
+    return conditions, signal_mask(strategy, merged, data, strategy.params)
+
+
+def assert_bar(state, strategy, conditions, matched, t):
+    signals = state.signals(strategy.params)
+    for cond, values in conditions.items():
+        assert signals[cond] == values[t], f"{cond.__name__} differs at bar {t}"
+    assert state.matches(strategy) == matched[t], f"match differs at bar {t}"
+
+
+@pytest.mark.parametrize("key,seed", CASES)
+def test_bar_by_bar_matches_recomputation(key, seed):
+    strategy, data = session_data(key, seed)
+    conditions, matched = expected(strategy, data)
+    assert any(v.any() for v in conditions.values())
+
+    state = SymbolState(strategy)
+    for t, (ts, row) in enumerate(data.iterrows()):
+        state.update(ts, row["Open"], row["High"], row["Low"], row["Close"], row["Volume"])
+        assert_bar(state, strategy, conditions, matched, t)
+
+
+@pytest.mark.parametrize("key,seed", CASES)
+def test_resent_forming_bar_is_rolled_back(key, seed):
+    strategy, data = session_data(key, seed)
+    conditions, matched = expected(strategy, data)
+
+    state = SymbolState(strategy)
+    state.feed(data.iloc[:100])
+    for t in range(100, len(data)):
+        # the newest bar first arrives while still forming, then again once it closed;
+        # each feed rolls back the bar it applied last and re-applies it
+        forming = data.iloc[:t + 1].copy()
+        forming.iloc[-1, forming.columns.get_loc("High")] *= 1.01
+        forming.iloc[-1, forming.columns.get_loc("Close")] *= 1.005
+        assert state.feed(forming) == 2
+        assert state.feed(data.iloc[:t + 1]) == 1
+        assert_bar(state, strategy, conditions, matched, t)
+
+
+@pytest.mark.parametrize("key,seed", CASES)
+def test_checkpoint_round_trip(key, seed):
+    strategy, data = session_data(key, seed)
+    conditions, matched = expected(strategy, data)
+
+    state = SymbolState(strategy)
+    for end in range(150, len(data) + 1, 73):
+        state.feed(data.iloc[:end])
+        # restart from the checkpoint: the forming last bar is not in it and gets re-applied
+        saved = json.loads(json.dumps(state.committed()))
+        state = SymbolState(strategy).load(saved)
+        assert state.n == end - 1
+        assert state.feed(data.iloc[:end]) == 1
+        assert_bar(state, strategy, conditions, matched, end - 1)
+
+
+def test_feed_without_new_bars_changes_nothing():
+    strategy, data = session_data("5m", 1)
+    state = SymbolState(strategy)
+    state.feed(data)
+    before = state.to_dict()
+    assert state.feed(data.iloc[:-5]) == 0
+    assert state.to_dict() == before
+    assert np.isclose(state.ema, build_merged(strategy, data).iloc[-1, 3])
+
+
+@pytest.mark.parametrize("key", ["5m", "1m"])
+def test_atr_matches_kernel_and_batch_exits(key):
+    strategy, data = session_data(key, 1)
+    strategy = replace(strategy, target_atr=2.0, stop_atr=1.0)
+    atr = indicators.compute(Bars.from_frame(data), [strategy.atr_name])[strategy.atr_name]
+
+    state = SymbolState(strategy)
+    for end in range(1, len(data) + 1, 37):
+        state.feed(data.iloc[:end])
+        if end % 2:  # restart from the checkpoint every other step
+            state = SymbolState(strategy).load(json.loads(json.dumps(state.committed())))
+            state.feed(data.iloc[:end])
+        if np.isnan(atr[end - 1]):
+            assert state.atr is None
+        else:
+            assert state.atr == pytest.approx(atr[end - 1], rel=1e-12)
+
+    state.feed(data)
+    ts = data.index[-1]
+    streamed = build_doc(strategy, "INFY", state.close, state.ema, state.volume, ts, "2024-06-28", atr=state.atr)
+    batch = build_doc(strategy, "INFY", data["Close"].iloc[-1], state.ema, data["Volume"].iloc[-1], ts,
+                      "2024-06-28", atr=atr[-1])
+    assert (streamed["target"], streamed["stop_loss"], streamed["atr"]) == \
+        (batch["target"], batch["stop_loss"], batch["atr"])
@@ -0,0 +1,57 @@
+"""
+Resumed backtests: a forming last bar is checked for hits but the cursor never moves onto
+it, so the closed version of that bar is checked again by the next run.
+
+ Usage:
+    python -m pytest test_trade_resolver.py
+"""
+
+from datetime import timedelta
+
+import pandas as pd
+
+from trade_resolver import backtest_update, resolve_frame
+
+HORIZON = timedelta(days=2)
+TRADE = {"symbol": "INFY", "timestamp": "2024-06-28T10:00:00+05:30", "close": 100.0,
+         "target": 101.0, "stop_loss": 99.0, "status": "pending"}
+
+
+def bars(highs):
+    index = pd.date_range("2024-06-28 10:00", periods=len(highs), freq="5min", tz="Asia/Kolkata")
+    return pd.DataFrame({"High": highs, "Low": [99.5] * len(highs)}, index=index)
+
+
+def run(trade, data, now):
+    res, = resolve_frame([trade], data, HORIZON)
+    return {**trade, **backtest_update(trade, res, now, HORIZON)}, res
+
+
+def test_revised_forming_bar_is_checked_again():
+    now = pd.Timestamp("2024-06-28 10:17", tz="Asia/Kolkata").to_pydatetime()
+    trade, res = run(TRADE, bars([100.2, 100.4, 100.6, 100.8]), now)  # 10:15 is forming
+    assert trade["status"] == "no_hit"
+    assert res["future_bars"] == 3 and trade["backtest_bars"] == 2
+    assert trade["backtest_cursor"] == pd.Timestamp("2024-06-28 04:40", tz="UTC").isoformat()
+
+    # the 10:15 bar closed with a high above the target
+    trade, res = run(trade, bars([100.2, 100.4, 100.6, 101.5, 100.9]), now + timedelta(minutes=5))
+    assert trade["status"] == "win"
+    assert trade["bars_to_exit"] == 3
+    assert trade["exit_time"] == pd.Timestamp("2024-06-28 04:45", tz="UTC").isoformat()
+    assert trade["mfe"] == 0.015
+
+
+def test_hit_on_the_forming_bar_counts():
+    now = pd.Timestamp("2024-06-28 10:12", tz="Asia/Kolkata").to_pydatetime()
+    trade, _ = run(TRADE, bars([100.2, 100.4, 101.2]), now)
+    assert trade["status"] == "win" and trade["bars_to_exit"] == 2
+
+
+def test_no_new_closed_bar_keeps_the_cursor():
+    now = pd.Timestamp("2024-06-28 10:12", tz="Asia/Kolkata").to_pydatetime()
+    trade, _ = run(TRADE, bars([100.2, 100.4, 100.6]), now)
+    again, res = run(trade, bars([100.2, 100.4, 100.7]), now + timedelta(minutes=1))
+    assert res["future_bars"] == 1  # only the still-forming 10:10 bar
+    assert (again["backtest_cursor"], again["backtest_bars"]) == \
+        (trade["backtest_cursor"], trade["backtest_bars"])
@@ -0,0 +1,276 @@
+"""
+trade_resolver.py
+
+Vectorized win/loss resolution for logged trades.
+
+Given the trades of one symbol and that symbol's bars, every trade is resolved at once:
+the bars after entry are laid out as a (trades × bars) matrix, target/stop hit masks are
+built with NumPy and `argmax` gives the first hit per trade.
+
+Outcomes:
+- "win"       → High ≥ target before Low ≤ stop
+- "loss"      → Low ≤ stop before High ≥ target
+- "ambiguous" → both on the same bar (the bar's path is unknown)
+- "no_hit"    → neither within the horizon
+- "no_data"   → no bars at all between entry and entry + horizon
+
+Backtests resume where the previous run stopped: each open trade stores a cursor (the
+last closed bar evaluated, `backtest_cursor`) plus the bars and excursions seen so far, so
+a run only looks at bars after the cursor. The newest stored bar may still be forming: it
+is checked for hits, but the cursor stays one bar behind it so the next run checks the
+closed version again. `backtest_update` turns a result into the fields to
+store; trades leave the backtest once they hit, once their horizon has passed, or after
+MAX_RETRIES no_data retries spaced out with exponential backoff (`due_filter` picks the rest).
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+OPEN_STATUSES = ["pending", "no_hit", "no_data"]
+# Everything `backtest_update` stores besides the status; cleared when a scan re-logs an
+# open trade with a new entry (see result_sinks.MongoSink)
+BACKTEST_FIELDS = ["backtest_time", "backtest_expires", "backtest_cursor", "backtest_bars",
+                   "backtest_retries", "backtest_next_try", "backtest_done",
+                   "same_bar_hit", "bars_to_exit", "exit_time", "mae", "mfe"]
+RETRY_BASE = timedelta(minutes=30)  # first no_data retry; doubles each time
+RETRY_MAX = timedelta(hours=12)
+MAX_RETRIES = 6
+SETTLE = timedelta(minutes=10)  # bars for the end of the horizon may arrive a little late
+
+OUTCOMES = np.array(["win", "loss", "ambiguous", "no_hit", "no_data"])
+WIN, LOSS, AMBIGUOUS, NO_HIT, NO_DATA = range(5)
+
+
+def resolve(entry_ns, entries, targets, stops, bar_ns, highs, lows, horizon_ns, cursor_ns=None,
+            forming=False):
+    """
+    Resolves every trade against one bar series.
+
+    entry_ns / bar_ns are int64 epoch-nanoseconds, `bar_ns` sorted ascending.
+    The entry bar is the first bar at or after the entry time; evaluation starts on the
+    bar after it (or after `cursor_ns`, the last bar a previous run evaluated, -1 for
+    none) and stops before entry + horizon. With `forming=True` the series' last bar may
+    still be forming: it is evaluated, but not counted in closed_bars / last_ns.
+
+    Returns a dict of arrays (one element per trade):
+    outcome (str), hit_index (bar index into the series, -1 if none), bars_to_exit,
+    exit_ns, future_bars (bars evaluated in this call), closed_bars (those of them that
+    are closed), last_ns (last closed bar evaluated, -1 if none), mae, mfe (fractions of
+    entry).
+    """
+    entry_ns = np.asarray(entry_ns, dtype=np.int64)
+    entries = np.asarray(entries, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    stops = np.asarray(stops, dtype=np.float64)
+    bar_ns = np.asarray(bar_ns, dtype=np.int64)
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    n_trades = len(entry_ns)
+    cursor_ns = np.full(n_trades, -1, dtype=np.int64) if cursor_ns is None \
+        else np.asarray(cursor_ns, dtype=np.int64)
+
+    entry_idx = np.searchsorted(bar_ns, entry_ns, side="left")
+    end_idx = np.searchsorted(bar_ns, entry_ns + horizon_ns, side="left")
+    has_data = (entry_idx < end_idx) | (cursor_ns >= 0)
+    start = np.maximum(entry_idx + 1, np.searchsorted(bar_ns, cursor_ns, side="right"))
+    future_bars = np.where(has_data, np.maximum(end_idx - start, 0), 0)
+    closed_bars = future_bars.copy()
+    if forming:
+        closed_bars[(future_bars > 0) & (start + future_bars == len(bar_ns))] -= 1
+    last_ns = np.full(n_trades, -1, dtype=np.int64)
+    evaluated = closed_bars > 0
+    last_ns[evaluated] = bar_ns[(start + closed_bars - 1)[evaluated]]
+
+    outcome = np.full(n_trades, NO_HIT)
+    outcome[~has_data] = NO_DATA
+    hit_index = np.full(n_trades, -1, dtype=np.int64)
+    bars_to_exit = np.full(n_trades, -1, dtype=np.int64)
+    exit_ns = np.full(n_trades, -1, dtype=np.int64)
+    mae = np.full(n_trades, np.nan)
+    mfe = np.full(n_trades, np.nan)
+
+    width = int(future_bars.max()) if n_trades else 0
+    if width > 0:
+        offsets = np.arange(width)
+        idx = start[:, None] + offsets
+        valid = offsets < future_bars[:, None]
+        idx = np.where(valid, idx, 0)
+        h = np.where(valid, highs[idx], np.nan)
+        l = np.where(valid, lows[idx], np.nan)
+
+        with np.errstate(invalid="ignore"):
+            up = h >= targets[:, None]
+            down = l <= stops[:, None]
+        any_hit = up | down
+        hit = any_hit.any(axis=1)
+        first = np.argmax(any_hit, axis=1)
+
+        rows = np.arange(n_trades)
+        first_up = up[rows, first] & hit
+        first_down = down[rows, first] & hit
+        outcome[first_up & ~first_down] = WIN
+        outcome[first_down & ~first_up] = LOSS
+        outcome[first_up & first_down] = AMBIGUOUS
+
+        hit_index[hit] = start[hit] + first[hit]
+        bars_to_exit[hit] = first[hit] + 1
+        exit_ns[hit] = bar_ns[hit_index[hit]]
+
+        # Excursions are measured up to and including the exit bar (whole window if no hit)
+        span = np.where(hit, first + 1, future_bars)
+        in_trade = offsets < span[:, None]
+        with np.errstate(invalid="ignore"):
+            max_high = np.nanmax(np.where(in_trade, h, np.nan), axis=1, initial=-np.inf)
+            min_low = np.nanmin(np.where(in_trade, l, np.nan), axis=1, initial=np.inf)
+            traded = span > 0
+            mfe[traded] = (max_high[traded] - entries[traded]) / entries[traded]
+            mae[traded] = (entries[traded] - min_low[traded]) / entries[traded]
+
+    return {
+        "outcome": OUTCOMES[outcome],
+        "hit_index": hit_index,
+        "bars_to_exit": bars_to_exit,
+        "exit_ns": exit_ns,
+        "future_bars": future_bars,
+        "closed_bars": closed_bars,
+        "last_ns": last_ns,
+        "mae": mae,
+        "mfe": mfe,
+    }
+
+
+def _ns(value):
+    ts = pd.Timestamp(value)
+    return (ts if ts.tz is not None else ts.tz_localize("UTC")).value
+
+
+def resolve_frame(trades, bars, horizon):
+    """
+    Resolves a list of trade documents (symbol, timestamp, close, target, stop_loss)
+    against a bar DataFrame with High/Low columns. `horizon` is a timedelta.
+    Trades carrying a `backtest_cursor` resume after it; their earlier bars and
+    excursions (`backtest_bars`, mae, mfe) are folded into the result. The last bar is
+    treated as possibly forming, so the cursor never moves onto it.
+    Returns one result dict per trade, in the same order.
+    """
+    if not trades:
+        return []
+    entry_ns = [_ns(t["timestamp"]) for t in trades]
+    entries = [float(t["close"]) for t in trades]
+    targets = [float(t["target"]) for t in trades]
+    stops = [float(t["stop_loss"]) for t in trades]
+    cursors = [_ns(t["backtest_cursor"]) if t.get("backtest_cursor") else -1 for t in trades]
+
+    if bars is None or bars.empty:
+        bar_ns = np.array([], dtype=np.int64)
+        highs = lows = np.array([], dtype=np.float64)
+    else:
+        bars = bars.sort_index()
+        index = bars.index if bars.index.tz is not None else bars.index.tz_localize("UTC")
+        bar_ns = index.as_unit("ns").asi8
+        highs = bars["High"].to_numpy(dtype=np.float64)
+        lows = bars["Low"].to_numpy(dtype=np.float64)
+
+    res = resolve(entry_ns, entries, targets, stops, bar_ns, highs, lows,
+                  pd.Timedelta(horizon).value, cursors, forming=True)
+
+    out = []
+    for i, trade in enumerate(trades):
+        resumed = cursors[i] >= 0
+        seen = int(trade.get("backtest_bars", 0)) if resumed else 0
+        exit_ns, last_ns = int(res["exit_ns"][i]), int(res["last_ns"][i])
+        mae, mfe = res["mae"][i], res["mfe"][i]
+        mae = None if np.isnan(mae) else round(float(mae), 5)
+        mfe = None if np.isnan(mfe) else round(float(mfe), 5)
+        if resumed:
+            mae = _worst(mae, trade.get("mae"))
+            mfe = _worst(mfe, trade.get("mfe"))
+        bars_to_exit = int(res["bars_to_exit"][i])
+        out.append({
+            "outcome": str(res["outcome"][i]),
+            "bars_to_exit": bars_to_exit + seen if bars_to_exit >= 0 else -1,
+            "exit_time": pd.Timestamp(exit_ns, tz="UTC").isoformat() if exit_ns >= 0 else None,
+            "future_bars": int(res["future_bars"][i]),
+            "bars_evaluated": seen + int(res["closed_bars"][i]),
+            "cursor": pd.Timestamp(last_ns, tz="UTC").isoformat() if last_ns >= 0
+            else trade.get("backtest_cursor"),
+            "mae": mae,
+            "mfe": mfe,
+        })
+    return out
+
+
+def _worst(new, old):
+    """Larger of two excursions, either of which may be missing."""
+    values = [v for v in (new, old) if v is not None]
+    return max(values) if values else None
+
+
+def due_filter(strategy, now):
+    """Mongo filter for the trades of `strategy` a backtest run at `now` should look at."""
+    return {
+        "strategy": strategy,
+        "status": {"$in": OPEN_STATUSES},
+        "backtest_done": {"$ne": True},
+        "backtest_next_try": {"$not": {"$gt": now}},  # also matches a missing field
+    }
+
+
+def backtest_update(trade, res, now, horizon):
+    """
+    Fields to $set on `trade` after resolving it at `now` (tz-aware), or None when
+    there is nothing new (no bars since the cursor and the horizon still open).
+    - a hit closes the trade (ambiguous counts as a win, flagged `same_bar_hit`)
+    - no_data schedules a retry RETRY_BASE · 2^(n-1) later (at most RETRY_MAX) and gives
+      up after MAX_RETRIES
+    - no hit moves the cursor forward; once the horizon is over the trade is closed as no_hit
+    """
+    expires = pd.Timestamp(trade["timestamp"]).to_pydatetime() + horizon
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=now.tzinfo)
+    expired = now >= expires + SETTLE
+    fields = {"backtest_time": now.isoformat(), "backtest_expires": expires}
+
+    outcome = res["outcome"]
+    if outcome == "no_data":
+        retries = int(trade.get("backtest_retries", 0)) + 1
+        delay = min(RETRY_BASE * 2 ** (retries - 1), RETRY_MAX)
+        return {**fields, "status": "no_data", "backtest_retries": retries,
+                "backtest_next_try": now + delay, "backtest_done": retries >= MAX_RETRIES}
+
+    if outcome in ("win", "loss", "ambiguous"):
+        return {
+            **fields,
+            "status": "win" if outcome == "ambiguous" else outcome,
+            "same_bar_hit": outcome == "ambiguous",
+            "bars_to_exit": res["bars_to_exit"],
+            "exit_time": res["exit_time"],
+            "mae": res["mae"],
+            "mfe": res["mfe"],
+            "backtest_cursor": res["cursor"],
+            "backtest_bars": res["bars_evaluated"],
+            "backtest_next_try": None,
+            "backtest_done": True,
+        }
+
+    if res["future_bars"] == 0 and not expired:
+        return None
+    return {
+        **fields,
+        "status": "no_hit",
+        "mae": res["mae"],
+        "mfe": res["mfe"],
+        "backtest_cursor": res["cursor"],
+        "backtest_bars": res["bars_evaluated"],
+        "backtest_next_try": None,
+        "backtest_done": expired,
+    }
+
+
+def group_by_symbol(trades):
+    grouped = {}
+    for trade in trades:
+        grouped.setdefault(trade["symbol"], []).append(trade)
+    return grouped
@@ -0,0 +1,183 @@
+"""
+universes.py
+
+Registry of the stock universes shipped with the scanners: every CSV under
+`listofstocks/` (named by its path, e.g. "it/Large", "finserv/Bank-Nifty", "Nifty50",
+"futures", "EQUITY_L") plus "Nifty 500". A sector folder is also a universe of its own
+("it" = every list in listofstocks/it/).
+
+All lists are loaded once into one symbol table and a per-universe list of symbol ids;
+each symbol also carries a bitmask of the universes it belongs to. The index is cached
+in the bar store directory (`universes.json`) and rebuilt only when a CSV changes.
+
+Universe expressions combine names with `|` (union) and `&` (intersection), evaluated
+left to right; names are case-insensitive and ignore spaces:
+    "Nifty 500"            "it|finserv"            "futures&it"
+
+ Usage:
+    python universes.py                       # list universes and their sizes
+    python universes.py "futures&finserv"     # symbols of an expression
+    python universes.py --of INFY             # universes a symbol belongs to
+"""
+
+import glob
+import json
+import os
+import re
+import sys
+
+import pandas as pd
+
+from bar_store import DEFAULT_ROOT
+
+SCAN_DIR = os.path.dirname(os.path.abspath(__file__))
+LISTS_DIR = os.path.join(SCAN_DIR, "listofstocks")
+EXTRA_LISTS = {"Nifty 500": os.path.join(SCAN_DIR, "Nifty 500.csv")}
+INDEX_PATH = os.path.join(DEFAULT_ROOT, "universes.json")
+
+
+def normalize(name):
+    name = name.strip()
+    if name.lower().endswith(".csv"):
+        name = name[:-4]
+    return name.replace(" ", "").lower()
+
+
+def find_lists(lists_dir=LISTS_DIR, extra=None):
+    """{universe name: CSV path} for every shipped list."""
+    lists = {}
+    for path in sorted(glob.glob(os.path.join(lists_dir, "**", "*.csv"), recursive=True)):
+        lists[os.path.splitext(os.path.relpath(path, lists_dir))[0].replace(os.sep, "/")] = path
+    lists.update(EXTRA_LISTS if extra is None else extra)
+    return lists
+
+
+class UniverseRegistry:
+    def __init__(self, lists):
+        self.names = []         # universe names, in bit order
+        self.symbols = []       # symbol table
+        self.ids = {}           # symbol → id
+        self.members = {}       # universe → [symbol ids] in CSV order
+        self.masks = []         # symbol id → bitmask of universes
+        self._lookup = {}       # normalized name → universe name(s)
+
+        for name, symbols in lists.items():
+            self._add(name, symbols)
+        sectors = {}
+        for name in self.names:
+            if "/" in name:
+                sectors.setdefault(normalize(name.split("/")[0]), []).append(name)
+        for key, group in sectors.items():
+            self._lookup.setdefault(key, group)
+
+    def _add(self, name, symbols):
+        bit = 1 << len(self.names)
+        self.names.append(name)
+        self._lookup[normalize(name)] = [name]
+        ids = []
+        for symbol in dict.fromkeys(symbols):
+            if symbol not in self.ids:
+                self.ids[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+                self.masks.append(0)
+            sid = self.ids[symbol]
+            self.masks[sid] |= bit
+            ids.append(sid)
+        self.members[name] = ids
+
+    # --- building / caching ---
+
+    @classmethod
+    def from_csvs(cls, lists):
+        return cls({name: _read_symbols(path) for name, path in lists.items()})
+
+    @classmethod
+    def load(cls, lists=None, index_path=INDEX_PATH):
+        """Registry from the cached index, rebuilt from the CSVs if any list changed."""
+        lists = lists or find_lists()
+        signature = {name: os.path.getmtime(path) for name, path in lists.items()}
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    cached = json.load(f)
+                if cached["signature"] == signature:
+                    symbols = cached["symbols"]
+                    return cls({name: [symbols[i] for i in ids] for name, ids in cached["members"].items()})
+            except (OSError, ValueError, KeyError):
+                pass
+
+        registry = cls.from_csvs(lists)
+        if index_path:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            tmp = index_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"signature": signature, "symbols": registry.symbols, "members": registry.members}, f)
+            os.replace(tmp, index_path)
+        return registry
+
+    # --- queries ---
+
+    def resolve(self, name):
+        """Universe names behind `name` (a list, or a sector folder)."""
+        names = self._lookup.get(normalize(name))
+        if not names:
+            raise KeyError(f"unknown universe '{name}'")
+        return names
+
+    def _ids(self, name):
+        return list(dict.fromkeys(i for n in self.resolve(name) for i in self.members[n]))
+
+    def select(self, expression):
+        """Symbols of a universe expression ("a|b", "a&b"), without duplicates."""
+        tokens = [t.strip() for t in re.split(r"([|&])", expression)]
+        ids = self._ids(tokens[0])
+        for op, name in zip(tokens[1::2], tokens[2::2]):
+            other = self._ids(name)
+            if op == "|":
+                ids = list(dict.fromkeys(ids + other))
+            else:
+                keep = set(other)
+                ids = [i for i in ids if i in keep]
+        return [self.symbols[i] for i in ids]
+
+    def union(self, *names):
+        return self.select("|".join(names))
+
+    def intersection(self, *names):
+        return self.select("&".join(names))
+
+    def universes_of(self, symbol):
+        mask = self.masks[self.ids[symbol]] if symbol in self.ids else 0
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+    def sizes(self):
+        return {name: len(ids) for name, ids in self.members.items()}
+
+
+def _read_symbols(path):
+    df = pd.read_csv(path, usecols=["SYMBOL"])
+    return [s.strip() for s in df["SYMBOL"].dropna().astype(str) if s.strip()]
+
+
+_default_registry = None
+
+
+def default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = UniverseRegistry.load()
+    return _default_registry
+
+
+if __name__ == "__main__":
+    registry = default_registry()
+    if len(sys.argv) > 2 and sys.argv[1] == "--of":
+        print(", ".join(registry.universes_of(sys.argv[2].strip().upper())) or "(none)")
+    elif len(sys.argv) > 1:
+        symbols = registry.select(sys.argv[1])
+        print("\n".join(symbols))
+        print(f"\n✅ {len(symbols)} symbol(s)")
+    else:
+        for name, size in registry.sizes().items():
+            print(f"{name:<32}{size:>6}")
+        print(f"\n✅ {len(registry.names)} universe(s), {len(registry.symbols)} distinct symbol(s)")
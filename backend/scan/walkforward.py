@@ -0,0 +1,264 @@
+"""
+walkforward.py
+
+Offline walk-forward backtest for the scan strategies.
+
+Replays the bars already in the local bar store through the walk-forward twins of the
+strategy conditions (`strategies.VECTORIZED_CONDITIONS`), so every bar of history is
+evaluated as if a scan had run right after it closed. Each signal becomes a trade at that
+bar's close with the strategy's target/stop (ATR exits use the ATR as of that bar, from
+the same indicator kernel as the live scan), resolved by `trade_resolver`. Symbols are
+spread across a process pool.
+
+Like the live scanners, a symbol produces at most one trade per session (the first
+signal of the day) unless --all-signals is given.
+
+Report:
+- trades, wins, losses, ambiguous, no_hit, win rate (wins / (wins + losses))
+- expectancy: mean return per trade (target % on win, stop % on loss/ambiguous, 0 on no_hit)
+- throughput: symbols·bars evaluated per second
+
+ Usage:
+    python walkforward.py 5m
+    python walkforward.py 1m --workers 8 --param ema_percent=0.003 --out wf_1m.json
+    python walkforward.py 5m --check 20     # cross-check signals against the live conditions
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BarStore, DEFAULT_ROOT
+from bars import Bars
+from scan_engine import load_symbols
+from strategies import STRATEGIES, VECTORIZED_CONDITIONS
+import trade_resolver as tr
+
+
+def build_merged(strategy, data):
+    """Same Open/High/Close/EMA frame the live engine builds for a strategy."""
+    ema = data["Close"].ewm(span=strategy.ema_span, adjust=False).mean()
+    merged = pd.concat([data["Open"], data["High"], data["Close"], ema], axis=1)
+    merged.columns = ["Open", "High", "Close", strategy.ema_col]
+    return merged.dropna()
+
+
+def signal_mask(strategy, merged, data, params, cache=None):
+    """Boolean array: does the strategy match on the bars up to t, for every t."""
+    signal = np.zeros(len(merged), dtype=bool)
+    for cond in strategy.conditions:
+        signal |= VECTORIZED_CONDITIONS[cond](merged, data, params, cache)
+    signal[: strategy.min_bars - 1] = False
+    return signal
+
+
+def first_per_session(index, signal):
+    """Keeps only the first signal of each trading day."""
+    days = index.normalize().asi8
+    picked = np.flatnonzero(signal)
+    if len(picked) == 0:
+        return picked
+    keep = np.r_[True, days[picked][1:] != days[picked][:-1]]
+    return picked[keep]
+
+
+def bar_ns(index):
+    index = index if index.tz is not None else index.tz_localize("UTC")
+    return index.as_unit("ns").asi8
+
+
+def exit_atr(strategy, data):
+    """The strategy's exit ATR over the rows of `build_merged(strategy, data)`, or None."""
+    if strategy.atr_name is None:
+        return None
+    return Bars.from_frame(data).indicators([strategy.atr_name])[strategy.atr_name]
+
+
+def exit_levels(strategy, entries, atr=None, target_mult=None, stop_mult=None):
+    """
+    (targets, stops) for `entries`: explicit multipliers if given, else the strategy's own
+    exits (`atr` = the exit ATR at each entry; fixed multiples where it is undefined).
+    """
+    if target_mult is not None or stop_mult is not None or atr is None:
+        return entries * (target_mult or strategy.target_mult), entries * (stop_mult or strategy.stop_mult)
+    targets, stops = strategy.exits(entries, atr)
+    fallback = np.isnan(atr)
+    targets[fallback] = entries[fallback] * strategy.target_mult
+    stops[fallback] = entries[fallback] * strategy.stop_mult
+    return targets, stops
+
+
+def trades_for_symbol(strategy, data, params, target_mult, stop_mult, all_signals=False):
+    """Signals → resolved trades for one symbol. Returns (trades DataFrame, bars evaluated)."""
+    merged = build_merged(strategy, data)
+    if len(merged) < strategy.min_bars:
+        return None, len(merged)
+
+    signal = signal_mask(strategy, merged, data, params)
+    picked = np.flatnonzero(signal) if all_signals else first_per_session(merged.index, signal)
+    if len(picked) == 0:
+        return None, len(merged)
+
+    times = bar_ns(merged.index)
+    entries = merged["Close"].to_numpy()[picked]
+    atr = exit_atr(strategy, data) if target_mult is None and stop_mult is None else None
+    targets, stops = exit_levels(strategy, entries, atr[picked] if atr is not None else None,
+                                 target_mult, stop_mult)
+    res = tr.resolve(
+        times[picked], entries, targets, stops, times,
+        merged["High"].to_numpy(), data["Low"].reindex(merged.index).to_numpy(),
+        pd.Timedelta(strategy.horizon).value,
+    )
+    trades = pd.DataFrame({
+        "timestamp": merged.index[picked],
+        "entry": entries,
+        "target": targets,
+        "stop_loss": stops,
+        "outcome": res["outcome"],
+        "bars_to_exit": res["bars_to_exit"],
+        "mae": res["mae"],
+        "mfe": res["mfe"],
+    })
+    return trades, len(merged)
+
+
+def _run_symbol(job):
+    root, name, symbol, params, target_mult, stop_mult, all_signals = job
+    strategy = STRATEGIES[name]
+    data = BarStore(root).read(symbol, strategy.interval)
+    if data.empty:
+        return symbol, None, 0
+    trades, bars = trades_for_symbol(strategy, data, params, target_mult, stop_mult, all_signals)
+    if trades is not None:
+        trades.insert(0, "symbol", symbol)
+    return symbol, trades, bars
+
+
+def summarize(trades):
+    counts = trades["outcome"].value_counts().to_dict() if len(trades) else {}
+    wins, losses = counts.get("win", 0), counts.get("loss", 0)
+    ambiguous, no_hit = counts.get("ambiguous", 0), counts.get("no_hit", 0)
+    returns = np.select(
+        [trades["outcome"] == "win", trades["outcome"].isin(["loss", "ambiguous"])],
+        [trades["target"] / trades["entry"] - 1, trades["stop_loss"] / trades["entry"] - 1],
+        0.0,
+    ) if len(trades) else np.array([])
+    return {
+        "trades": int(len(trades)),
+        "wins": int(wins),
+        "losses": int(losses),
+        "ambiguous": int(ambiguous),
+        "no_hit": int(no_hit),
+        "win_rate": round(wins / (wins + losses) * 100, 2) if (wins + losses) else 0.0,
+        "expectancy_pct": round(float(returns.mean()) * 100, 4) if len(returns) else 0.0,
+    }
+
+
+def run_walkforward(strategy_name, symbols=None, params=None, workers=None, root=DEFAULT_ROOT,
+                    target_mult=None, stop_mult=None, all_signals=False):
+    """Runs the whole universe and returns (report dict, trades DataFrame)."""
+    strategy = STRATEGIES[strategy_name]
+    symbols = symbols if symbols is not None else load_symbols(strategy.universe)
+    params = dict(strategy.params, **(params or {}))
+    jobs = [(root, strategy_name, s, params, target_mult, stop_mult, all_signals) for s in symbols]
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        collected = [_run_symbol(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collected = list(pool.map(_run_symbol, jobs, chunksize=8))
+    elapsed = time.perf_counter() - t0
+
+    frames = [t for _, t, _ in collected if t is not None]
+    trades = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["symbol", "timestamp", "entry", "target", "stop_loss", "outcome"])
+    total_bars = sum(b for _, _, b in collected)
+
+    report = {
+        "strategy": strategy_name,
+        "symbols": len(symbols),
+        "symbols_with_data": sum(1 for _, _, b in collected if b),
+        "params": params,
+        "target_mult": target_mult or strategy.target_mult,
+        "stop_mult": stop_mult or strategy.stop_mult,
+        "target_atr": strategy.target_atr if target_mult is None and stop_mult is None else None,
+        "stop_atr": strategy.stop_atr if target_mult is None and stop_mult is None else None,
+        **summarize(trades),
+        "bars_evaluated": int(total_bars),
+        "seconds": round(elapsed, 3),
+        "throughput_symbol_bars_per_s": round(total_bars / elapsed) if elapsed else None,
+    }
+    return report, trades
+
+
+def check_against_live(strategy_name, symbols, root=DEFAULT_ROOT):
+    """
+    Re-runs the live (per-slice) conditions bar by bar for a few symbols and counts bars
+    where they disagree with the walk-forward signal. Slow; used as a sanity check.
+    """
+    strategy = STRATEGIES[strategy_name]
+    store = BarStore(root)
+    mismatches = 0
+    for symbol in symbols:
+        data = store.read(symbol, strategy.interval)
+        if data.empty:
+            continue
+        merged = build_merged(strategy, data)
+        signal = signal_mask(strategy, merged, data, strategy.params)
+        bars = Bars.from_frame(data)
+        ema = bars.ema(strategy.ema_span)
+        for t in range(strategy.min_bars - 1, len(merged)):
+            live = any(c(bars.upto(t + 1), ema[: t + 1], strategy.params) for c in strategy.conditions)
+            mismatches += live != signal[t]
+    return mismatches
+
+
+def parse_params(pairs):
+    params = {}
+    for pair in pairs or []:
+        key, value = pair.split("=", 1)
+        params[key] = float(value) if "." in value else int(value)
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest over the local bar store")
+    parser.add_argument("strategy", choices=list(STRATEGIES))
+    parser.add_argument("--workers", type=int, default=None, help="process count (1 = in-process)")
+    parser.add_argument("--param", action="append", help="override a strategy param, e.g. ema_percent=0.003")
+    parser.add_argument("--target", type=float, help="target multiplier override")
+    parser.add_argument("--stop", type=float, help="stop multiplier override")
+    parser.add_argument("--all-signals", action="store_true", help="trade every signal, not one per day")
+    parser.add_argument("--universe", default=None, help="universe expression or CSV (default: the strategy's)")
+    parser.add_argument("--out", help="write the report (JSON) and trades (CSV next to it)")
+    parser.add_argument("--check", type=int, default=0, help="cross-check N symbols against the live conditions")
+    args = parser.parse_args()
+
+    symbols = load_symbols(args.universe or STRATEGIES[args.strategy].universe)
+
+    if args.check:
+        mismatches = check_against_live(args.strategy, symbols[: args.check])
+        print(f"{'✅' if mismatches == 0 else '❌'} {mismatches} bar(s) disagree with the live conditions")
+        return
+
+    report, trades = run_walkforward(
+        args.strategy, symbols, parse_params(args.param), args.workers,
+        target_mult=args.target, stop_mult=args.stop, all_signals=args.all_signals,
+    )
+    print(json.dumps(report, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        trades.to_csv(os.path.splitext(args.out)[0] + "_trades.csv", index=False)
+        print(f"✅ Report saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 /**
  * Express Server for TradeSmart 2.0
- * - /api/scan/intraday → 5m, 1m scan from MongoDB
+ * - /api/scan/intraday → stored 5m, 1m results from MongoDB plus the worker job of a new
+ *                        scan, if one was needed (none when the worker's bar-close
+ *                        scheduler already covers the latest bar close)
  * - /api/scan/daily    → daily scan from JSON
- * - /api/ohlc/:symbol  → OHLC chart data from file
- * - /api/history/5m    → last 5m scan results (from MongoDB)
+ * - /api/ohlc/:symbol  → OHLC chart data (worker chart cache; from/to/limit/points windows)
+ * - /api/history/5m    → this week's 5m scan results by day (MongoDB aggregation)
+ * - /api/summary       → this week's win/loss totals (from the daily_stats collection)
+ * - /api/jobs/:id      → status of a job running in the Python scan worker
+ *
+ * Scans and chart data are produced by the long-running Python worker
+ * (scan/scan_worker.py, SCAN_WORKER_URL). If it is not running, the scripts
+ * are spawned with exec() as before.
  */
 
 import express, { json } from 'express';
@@ -22,43 +30,137 @@ const PORT = 4000;
 app.use(cors());
 app.use(json());
 
+// --- Python scan worker client ---
+const WORKER_URL = process.env.SCAN_WORKER_URL || "http://127.0.0.1:5001";
+const JOB_POLL_MS = 500;
+const JOB_TIMEOUT_MS = 10 * 60 * 1000;
 
-app.get('/api/scan/intraday', async (req, res) => {
-  console.log("🔁 Running intraday scan (5m + 1m) and fetching from MongoDB");
+const submitJob = async (body) => {
+  const response = await fetch(`${WORKER_URL}/jobs`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok) throw new Error(`worker responded ${response.status}`);
+  return response.json();
+};
+
+const getJob = async (id) => {
+  const response = await fetch(`${WORKER_URL}/jobs/${id}`);
+  if (!response.ok) throw new Error(`worker responded ${response.status}`);
+  return response.json();
+};
+
+const waitForJob = async (id) => {
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const job = await getJob(id);
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+  }
+  throw new Error(`job ${id} timed out`);
+};
 
-  let completed = 0;
+// True when the worker's scheduler (SCAN_SCHEDULER=1) has results for the latest
+// bar close of every strategy; false when it is not running or not up to date
+const scheduledResultsFresh = async (strategies) => {
+  try {
+    const response = await fetch(`${WORKER_URL}/latest`);
+    if (!response.ok) return false;
+    const { fresh } = await response.json();
+    return strategies.every((name) => fresh[name]);
+  } catch (err) {
+    return false;
+  }
+};
+
+// Runs a job in the worker and waits for it; falls back to spawning the script
+const runInWorker = async (body, fallbackCommand, fallbackCwd = 'scan') => {
+  try {
+    const job = await submitJob(body);
+    return await waitForJob(job.id);
+  } catch (err) {
+    if (err.message.startsWith("job ")) throw err;
+    console.log(`⚠️ Scan worker unavailable (${err.message}), running ${fallbackCommand}`);
+    return new Promise((resolve) => {
+      exec(fallbackCommand, { cwd: fallbackCwd }).on('close', (code) =>
+        resolve({ status: code === 0 ? "done" : "failed", result: null, fallback: true })
+      );
+    });
+  }
+};
+
+app.get('/api/jobs/:id', async (req, res) => {
+  try {
+    res.json(await getJob(req.params.id));
+  } catch (err) {
+    res.status(502).json({ error: `Scan worker unavailable: ${err.message}` });
+  }
+});
+
+
+// Today's stored 5m / 1m matches from MongoDB
+const readIntradayResults = async () => {
   const results = {};
+  const today = new Date().toISOString().slice(0, 10);
 
-  const checkAndRespond = () => {
-    if (completed === 2) {
-      console.log("✅ Intraday scan response sent.");
-      res.json(results);
+  const fetchResults = async (label, strategy, collectionName) => {
+    try {
+      const collection = await getCollection(collectionName);
+      const stocks = await collection.find({ scan_date: today, strategy }).toArray();
+      results[label] = stocks;
+      console.log(`✅ ${label} → ${stocks.length} stock(s)`);
+    } catch (err) {
+      console.error(`❌ Failed to read ${label} from MongoDB:`, err.message);
+      results[label] = [];
     }
   };
 
-  const runScanAndFetch = async (label, script, strategy, collectionName) => {
-    exec(`python3 ${script}`, { cwd: 'scan' }).on('close', async () => {
-      try {
-        const collection = await getCollection(collectionName);
-        const today = new Date().toISOString().slice(0, 10);
-        const stocks = await collection.find({ scan_date: today, strategy }).toArray();
-        results[label] = stocks;
-        console.log(`✅ ${label} → ${stocks.length} stock(s)`);
-      } catch (err) {
-        console.error(`❌ Failed to read ${label} from MongoDB:`, err.message);
-        results[label] = [];
-      }
-      completed++;
-      checkAndRespond();
-    });
-  };
+  await Promise.all([
+    fetchResults("5m", "5m_momentum", "scan_5m"),
+    fetchResults("1m", "1m_momentum", "scan_1m"),
+  ]);
+  return results;
+};
+
+// Responds with the stored results right away. Unless the scheduler already covers the
+// latest bar close, a scan is submitted to the worker and returned as `job`: poll
+// /api/jobs/:id and re-read with ?cached=1 once it is done.
+// ?wait=1 → block until the scan finished (the old behaviour); ?cached=1 → never scan
+app.get('/api/scan/intraday', async (req, res) => {
+  const scan = { type: "scan", strategies: ["5m", "1m"] };
+  let job = null;
+
+  if (req.query.cached) {
+    console.log("📦 Serving stored intraday results");
+  } else if (await scheduledResultsFresh(["5m_momentum", "1m_momentum"])) {
+    console.log("⚡ Scheduled scans cover the latest bar close, skipping the scan");
+  } else if (req.query.wait) {
+    console.log("🔁 Running intraday scan (5m + 1m) and fetching from MongoDB");
+    try {
+      // Both strategies run in one job over a shared data load; concurrent callers share it
+      await runInWorker(scan, 'python3 scan_engine.py 5m 1m');
+    } catch (err) {
+      console.error("❌ Intraday scan failed:", err.message);
+    }
+  } else {
+    console.log("🔁 Submitting intraday scan (5m + 1m)");
+    try {
+      job = await submitJob(scan);
+    } catch (err) {
+      // no worker to poll: run the script and answer once it finished
+      await runInWorker(scan, 'python3 scan_engine.py 5m 1m');
+    }
+  }
 
-  runScanAndFetch("5m", "scan_momentum_5min.py", "5m_momentum", "scan_5m");
-  runScanAndFetch("1m", "scan_momentum_1min.py", "1m_momentum", "scan_1m");
+  const results = await readIntradayResults();
+  if (job) results.job = job;
+  console.log("✅ Intraday scan response sent.");
+  res.json(results);
 });
 const __filename = fileURLToPath(import.meta.url);
   const __dirname = path.dirname(__filename);
-app.get('/api/scan/daily', (req, res) => {
+app.get('/api/scan/daily', async (req, res) => {
   
   const resultPath = path.join(__dirname, 'scan', 'results_44_daily.json');
 
@@ -83,93 +185,117 @@ app.get('/api/scan/daily', (req, res) => {
   }
 
   console.log("🔁 Running fresh daily scan (44 EMA)...");
-  const scanProcess = exec('python3 scan_44ema_daily.py', { cwd: path.join(__dirname, 'scan') });
+  let job;
+  try {
+    job = await runInWorker({ type: "scan", strategies: ["daily"] }, 'python3 scan_44ema_daily.py',
+      path.join(__dirname, 'scan'));
+  } catch (err) {
+    job = { status: "failed", error: err.message };
+  }
 
-  scanProcess.on('close', (code) => {
-    if (code !== 0) {
-      console.error(`❌ Python script exited with code ${code}`);
-      return res.status(500).json({ daily: [] });
-    }
+  if (job.status !== "done") {
+    console.error(`❌ Daily scan failed: ${job.error || "script exited with an error"}`);
+    return res.status(500).json({ daily: [] });
+  }
 
-    try {
-      const raw = fs.readFileSync(resultPath, 'utf8');
-      const data = JSON.parse(raw);
-      console.log(`✅ daily → ${data.length} stocks`);
-      res.json({ daily: data });
-    } catch (err) {
-      console.error("❌ Failed to read daily results:", err.message);
-      res.status(500).json({ daily: [] });
-    }
-  });
+  try {
+    const raw = fs.readFileSync(resultPath, 'utf8');
+    const data = JSON.parse(raw);
+    console.log(`✅ daily → ${data.length} stocks`);
+    res.json({ daily: data });
+  } catch (err) {
+    console.error("❌ Failed to read daily results:", err.message);
+    res.status(500).json({ daily: [] });
+  }
 });
-// --- /api/ohlc/:symbol?tf=... → Live OHLC + EMA from fetch_ohlc.py ---
-app.get('/api/ohlc/:symbol', (req, res) => {
+// --- /api/ohlc/:symbol?tf=&from=&to=&limit=&points= → Live OHLC + EMA from fetch_ohlc.py ---
+const CHART_WINDOW_PARAMS = { from: /^[\w:.+-]+$/, to: /^[\w:.+-]+$/, limit: /^\d+$/, points: /^\d+$/ };
+// Same checks as fetch_ohlc.check_request: symbols and timeframes end up in store paths
+const CHART_SYMBOL = /^[A-Z0-9&-]+$/;
+const CHART_TIMEFRAMES = ["5m", "1m", "1d"];
+
+app.get('/api/ohlc/:symbol', async (req, res) => {
   const symbol = req.params.symbol.toUpperCase();
   const tf = req.query.tf || '5m';
-  const filePath = `scan/data/${symbol}_${tf}.json`;
-
-  const process = exec(`python3 fetch_ohlc.py ${symbol} ${tf}`, { cwd: 'scan' });
-
-  process.on('close', () => {
-    fs.readFile(filePath, 'utf8', (err, data) => {
-      if (err) {
-        console.error(`❌ Could not read ${filePath}:`, err.message);
-        return res.status(404).json({ error: `No chart data for ${symbol} (${tf})` });
-      }
+  if (!CHART_SYMBOL.test(symbol)) return res.status(400).json({ error: "Invalid symbol" });
+  if (!CHART_TIMEFRAMES.includes(tf)) return res.status(400).json({ error: "Invalid tf" });
+
+  const query = new URLSearchParams({ tf });
+  const cliArgs = [];
+  for (const [name, pattern] of Object.entries(CHART_WINDOW_PARAMS)) {
+    const value = req.query[name];
+    if (value === undefined) continue;
+    if (!pattern.test(value)) return res.status(400).json({ error: `Invalid ${name}` });
+    query.set(name, value);
+    cliArgs.push(`--${name} ${value}`);
+  }
 
-      try {
-        const json = JSON.parse(data);
-        res.json(json);
-      } catch (parseErr) {
-        console.error(`❌ JSON Parse error:`, parseErr.message);
-        res.status(500).json({ error: 'Invalid JSON format' });
-      }
-    });
-  });
+  // Served from the worker's chart cache; concurrent requests for the same chart share one load
+  try {
+    const response = await fetch(`${WORKER_URL}/ohlc/${encodeURIComponent(symbol)}?${query}`);
+    return res.status(response.status).type('json').send(await response.text());
+  } catch (err) {
+    console.log(`⚠️ Scan worker unavailable (${err.message}), running fetch_ohlc.py`);
+  }
 
-  process.on('error', (err) => {
-    console.error(`❌ fetch_ohlc.py failed for ${symbol} (${tf}):`, err.message);
-    res.status(500).json({ error: 'Chart data fetch failed' });
+  const command = `python3 fetch_ohlc.py '${symbol}' ${tf} --stdout ${cliArgs.join(' ')}`;
+  exec(command, { cwd: 'scan', maxBuffer: 256 * 1024 * 1024 }, (err, stdout) => {
+    if (err) {
+      console.error(`❌ Chart data fetch failed for ${symbol} (${tf}):`, err.message);
+      return res.status(500).json({ error: 'Chart data fetch failed' });
+    }
+    res.type('json').send(stdout);
   });
 });
 
+// Monday 00:00 (server local time) of the current week
+const startOfWeek = () => {
+  const monday = new Date();
+  monday.setDate(monday.getDate() - ((monday.getDay() + 6) % 7));
+  monday.setHours(0, 0, 0, 0);
+  return monday;
+};
+
+const localDate = (d) =>
+  `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}-${String(d.getDate()).padStart(2, "0")}`;
+
+// This week's last 1000 results of a strategy grouped by scan_date, with status counts,
+// grouped and counted by MongoDB (uses the (strategy, timestamp) index)
+const weeklyHistory = async (collectionName, strategy) => {
+  const collection = await getCollection(collectionName);
+  const isStatus = (status) => ({ $cond: [{ $eq: [{ $ifNull: ["$status", "pending"] }, status] }, 1, 0] });
+
+  const days = await collection
+    .aggregate([
+      { $match: { strategy, timestamp: { $gte: startOfWeek().toISOString() } } },
+      { $sort: { timestamp: -1 } },
+      { $limit: 1000 },
+      {
+        $group: {
+          _id: "$scan_date",
+          latest: { $max: "$timestamp" },
+          stocks: { $push: "$$ROOT" },
+          win: { $sum: isStatus("win") },
+          loss: { $sum: isStatus("loss") },
+          no_hit: { $sum: isStatus("no_hit") },
+          total: { $sum: 1 },
+        },
+      },
+      { $sort: { latest: -1 } },
+    ])
+    .toArray();
+
+  const grouped = {};
+  for (const { _id, stocks, win, loss, no_hit, total } of days) {
+    grouped[_id] = { stocks, win, loss, no_hit, pending: total - win - loss - no_hit };
+  }
+  return grouped;
+};
+
 // --- /api/history/5m → Get last 1000 5m scan results grouped by date ---
 app.get("/api/history/5m", async (req, res) => {
   try {
-    const collection = await getCollection("scan_5m");
-
-    const today = new Date();
-    const monday = new Date(today);
-    monday.setDate(today.getDate() - ((today.getDay() + 6) % 7));
-    monday.setHours(0, 0, 0, 0);
-
-    const results = await collection
-      .find({
-        strategy: "5m_momentum",
-        timestamp: { $gte: monday.toISOString() }, // ✅ Filter only this week's data
-      })
-      .sort({ timestamp: -1 })
-      .limit(1000)
-      .toArray();
-
-    const grouped = {};
-
-    for (const stock of results) {
-      const date = stock.scan_date;
-      if (!grouped[date]) {
-        grouped[date] = { stocks: [], win: 0, loss: 0, no_hit: 0, pending: 0 };
-      }
-
-      grouped[date].stocks.push(stock);
-
-      const status = stock.status || "pending";
-      if (status === "win") grouped[date].win++;
-      else if (status === "loss") grouped[date].loss++;
-      else if (status === "no_hit") grouped[date].no_hit++;
-      else grouped[date].pending++;
-    }
-
-    res.json(grouped);
+    res.json(await weeklyHistory("scan_5m", "5m_momentum"));
   } catch (err) {
     console.error("❌ History fetch error:", err.message);
     res.status(500).json({ error: "Failed to fetch scan history" });
@@ -178,40 +304,7 @@ app.get("/api/history/5m", async (req, res) => {
 
 app.get("/api/history/1m", async (req, res) => {
   try {
-    const collection = await getCollection("scan_1m");
-
-    const today = new Date();
-    const monday = new Date(today);
-    monday.setDate(today.getDate() - ((today.getDay() + 6) % 7));
-    monday.setHours(0, 0, 0, 0);
-
-    const results = await collection
-      .find({
-        strategy: "1m_momentum",
-        timestamp: { $gte: monday.toISOString() }, // ✅ Filter only this week's data
-      })
-      .sort({ timestamp: -1 })
-      .limit(1000)
-      .toArray();
-
-    const grouped = {};
-
-    for (const stock of results) {
-      const date = stock.scan_date;
-      if (!grouped[date]) {
-        grouped[date] = { stocks: [], win: 0, loss: 0, no_hit: 0, pending: 0 };
-      }
-
-      grouped[date].stocks.push(stock);
-
-      const status = stock.status || "pending";
-      if (status === "win") grouped[date].win++;
-      else if (status === "loss") grouped[date].loss++;
-      else if (status === "no_hit") grouped[date].no_hit++;
-      else grouped[date].pending++;
-    }
-
-    res.json(grouped);
+    res.json(await weeklyHistory("scan_1m", "1m_momentum"));
   } catch (err) {
     console.error("❌ History fetch error:", err.message);
     res.status(500).json({ error: "Failed to fetch scan history" });
@@ -231,35 +324,40 @@ cron.schedule('*/30 * * * *', () => {
 
 
 
+// Weekly totals from the daily_stats collection (one row per strategy and day, kept up to
+// date by the scan and backtest jobs), both strategies in one $facet query
 app.get("/api/summary", async (req, res) => {
   try {
-    const collection5m = await getCollection("scan_5m");
-    const collection1m = await getCollection("scan_1m");
+    const stats = await getCollection("daily_stats");
+    const weekTotals = (collection) => [
+      { $match: { collection } },
+      {
+        $group: {
+          _id: null,
+          total: { $sum: "$total" },
+          wins: { $sum: "$win" },
+          losses: { $sum: "$loss" },
+          noHits: { $sum: "$no_hit" },
+        },
+      },
+    ];
+
+    const [facets] = await stats
+      .aggregate([
+        { $match: { scan_date: { $gte: localDate(startOfWeek()) } } },
+        { $facet: { summary_5m: weekTotals("scan_5m"), summary_1m: weekTotals("scan_1m") } },
+      ])
+      .toArray();
 
-    const today = new Date();
-    const monday = new Date(today);
-    monday.setDate(today.getDate() - ((today.getDay() + 6) % 7)); // Last Monday
-    monday.setHours(0, 0, 0, 0);
-
-    const query = { timestamp: { $gte: monday.toISOString() } };
-
-    const [all5m, all1m] = await Promise.all([
-      collection5m.find(query).toArray(),
-      collection1m.find(query).toArray(),
-    ]);
-
-    const summarize = (data) => {
-      const total = data.length;
-      const wins = data.filter((d) => d.status === "win").length;
-      const losses = data.filter((d) => d.status === "loss").length;
-      const noHits = data.filter((d) => d.status === "no_hit").length;
+    const summarize = ([row] = []) => {
+      const { total = 0, wins = 0, losses = 0, noHits = 0 } = row || {};
       const winRate = total > 0 ? ((wins / total) * 100).toFixed(2) : "0.00";
       return { total, wins, losses, noHits, winRate };
     };
 
     res.json({
-      summary_5m: summarize(all5m),
-      summary_1m: summarize(all1m),
+      summary_5m: summarize(facets.summary_5m),
+      summary_1m: summarize(facets.summary_1m),
     });
   } catch (err) {
     console.error("❌ Weekly summary error:", err.message);
@@ -19,13 +19,33 @@ const App = () => {
   const [searchQuery, setSearchQuery] = useState("");
 
   useEffect(() => {
+    const loadIntraday = async (query = "") => {
+      const res = await fetch(`http://localhost:4000/api/scan/intraday${query}`);
+      if (!res.ok) throw new Error("Intraday API error");
+      const intraday = await res.json();
+      setData5m(intraday["5m"] || []);
+      setData1m(intraday["1m"] || []);
+      return intraday.job;
+    };
+
+    // Stored results show right away; a scan still running in the worker is polled
+    // and the tables are re-read once it finished
+    const waitForScan = async (job) => {
+      while (job.status !== "done" && job.status !== "failed") {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        const res = await fetch(`http://localhost:4000/api/jobs/${job.id}`);
+        if (!res.ok) throw new Error("Scan job API error");
+        job = await res.json();
+      }
+      if (job.status === "failed") console.error("❌ Intraday scan failed:", job.error);
+      await loadIntraday("?cached=1");
+    };
+
     const fetchIntraday = async () => {
       try {
-        const res = await fetch("http://localhost:4000/api/scan/intraday");
-        if (!res.ok) throw new Error("Intraday API error");
-        const intraday = await res.json();
-        setData5m(intraday["5m"] || []);
-        setData1m(intraday["1m"] || []);
+        const job = await loadIntraday();
+        setLoadingIntraday(false);
+        if (job) await waitForScan(job);
       } catch (err) {
         console.error("❌ Intraday fetch error:", err.message);
         setError("Failed to fetch intraday data.");
@@ -148,6 +168,7 @@ const App = () => {
                     >
                       <StockChart
                         symbol={stock.symbol}
+                        trade={stock}
                         tf={
                           label === "1-min"
                             ? "1m"
@@ -6,7 +6,8 @@ import {
   checkIlliquidity,
 } from "./helpers/stockUtils";
 
-const StockChart = ({ symbol, tf }) => {
+// `trade` is the scan match being charted; its target / stop_loss are drawn on its own timeframe
+const StockChart = ({ symbol, tf, trade }) => {
   const chartContainerRef = useRef();
   const chartRef = useRef();
   const volumeSeriesRef = useRef();
@@ -91,7 +92,8 @@ const StockChart = ({ symbol, tf }) => {
             lastCandle.close,
             entrySLTargetMap,
             setEntrySLTargetMap,
-            timeframe
+            timeframe,
+            timeframe === (tf || "5m") ? trade : null
           );
 
           candleSeries.createPriceLine({ price: entryPrice, color: "#00bcd4", lineStyle: 3, lineWidth: 1, axisLabelVisible: true, title: `Entry: ₹${entryPrice.toFixed(2)}` });
@@ -111,7 +111,7 @@ const ScanHistory = ({ searchQuery }) => {
                         {isExpanded && (
                           <tr>
                             <td colSpan="5" style={{ padding: 20, background: "#0e1116" }}>
-                              <StockChart symbol={s.symbol} tf={tf} />
+                              <StockChart symbol={s.symbol} tf={tf} trade={s} />
                             </td>
                           </tr>
                         )}
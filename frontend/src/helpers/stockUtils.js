@@ -29,13 +29,19 @@ export const downloadCSV = (stocks, label) => {
 
 // src/helpers/stockUtils.js
 
-export const getEntrySlTarget = (key, lastClose, map, setMap, timeframe) => {
+// Uses the exits the scan stored with the match (close / target / stop_loss); the fixed
+// percentages are only a fallback for documents logged before those fields existed
+export const getEntrySlTarget = (key, lastClose, map, setMap, timeframe, trade) => {
   if (map[key]) return map[key];
 
-  const entryPrice = lastClose;
+  let entryPrice = lastClose;
   let sl, target;
 
-  if (timeframe === "5m") {
+  if (trade && trade.target != null && trade.stop_loss != null) {
+    entryPrice = Number(trade.close ?? lastClose);
+    sl = Number(trade.stop_loss);
+    target = Number(trade.target);
+  } else if (timeframe === "5m") {
     sl = entryPrice * 0.995;
     target = entryPrice * 1.01;
   } else if (timeframe === "1d") {